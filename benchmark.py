@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+from typing import List, Dict
+
+# The benchmark runs without a window or sound output. This must be configured before pygame is initialized.
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+# Only the results should be printed to stdout
+os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+
+import pygame
+
+from pythongame.core.common import HeroId, NpcType, Direction
+from pythongame.core.entity_creation import create_player_state_as_initial, create_hero_world_entity, create_npc
+from pythongame.core.fixed_timestep import SIMULATION_STEP
+from pythongame.core.frame_timings import FrameTimings
+from pythongame.core.game_data import NON_PLAYER_CHARACTERS, NpcCategory, ENTITY_SPRITE_INITIALIZERS
+from pythongame.core.game_state import GameState
+from pythongame.core.global_path_finder import init_global_path_finder
+from pythongame.core.sound_player import init_sound_player
+from pythongame.core.view.game_world_view import GameWorldView
+from pythongame.core.view.image_loading import LazyImagesBySprite
+from pythongame.leveled_dungeons import create_dungeon_game_state
+from pythongame.main import CAMERA_SIZE, SCREEN_SIZE
+from pythongame.map_file import load_map_from_file
+from pythongame.register_game_data import register_all_game_data
+from pythongame.scenes.scenes_game.game_engine import GameEngine
+from pythongame.scenes.scenes_game.game_ui_view import InfoMessage
+
+# Every frame simulates the same amount of time (one step of the game's fixed timestep), so that runs with the same seed
+# are identical. Nothing waits for real time to pass, so the simulation runs as fast as it can.
+FRAME_TIME = SIMULATION_STEP
+# Enemies are spawned within this distance from the player, so that they are close enough to be active
+ENEMY_SPAWN_DISTANCE = 600
+
+parser = argparse.ArgumentParser(description="Runs the game headless with scripted input, and reports how much time "
+                                             "is spent in different parts of each frame (as JSON)")
+parser.add_argument('--map', default='resources/maps/map1.json')
+parser.add_argument('--dungeon', type=int, help="Generate a dungeon of this difficulty level instead of using --map")
+parser.add_argument('--hero', default=HeroId.MAGE.name)
+parser.add_argument('--enemies', type=int, default=0, help="Number of extra enemies to spawn around the player")
+parser.add_argument('--frames', type=int, default=1000)
+parser.add_argument('--seed', type=int, default=0)
+parser.add_argument('--render', action='store_true', help="Also render the game world every frame")
+parser.add_argument('--no-ai-lod', action='store_true',
+                    help="Run the AI of all NPCs close to the camera every frame, regardless of distance to the player")
+parser.add_argument('--output', help="Write the results to this file instead of printing them")
+args = parser.parse_args()
+
+
+def main():
+    # Some parts of the game log to stdout (like the dungeon generator). That output is sent to stderr instead, so that
+    # stdout only contains the results.
+    with contextlib.redirect_stdout(sys.stderr):
+        results = _run_benchmark()
+    results_json = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(results_json)
+    else:
+        print(results_json)
+
+
+def _run_benchmark() -> Dict:
+    pygame.init()
+    # A display mode must be set for images to be loaded, even when nothing is shown
+    screen = pygame.display.set_mode(SCREEN_SIZE)
+    init_sound_player()
+    register_all_game_data()
+    random.seed(args.seed)
+
+    # NPC's share a "global path finder" that needs to be initialized before we start creating NPCs.
+    path_finder = init_global_path_finder()
+    hero_id = HeroId[args.hero]
+    if args.dungeon is not None:
+        # Pre-generated dungeons aren't used, so that the dungeon only depends on the seed
+        game_state = create_dungeon_game_state(create_player_state_as_initial(hero_id, {}), CAMERA_SIZE, args.dungeon,
+                                               use_dungeon_pool=False)
+    else:
+        game_state = _load_map(args.map, hero_id)
+    path_finder.set_grid(game_state.pathfinder_wall_grid)
+    game_state.center_camera_on_player()
+    _spawn_enemies(game_state, args.enemies)
+
+    game_engine = GameEngine(game_state, InfoMessage())
+    game_engine.on_abilities_updated()
+    game_engine.npc_ai_scheduler.is_level_of_detail_enabled = not args.no_ai_lod
+    timings = FrameTimings()
+    game_engine.frame_timings = timings
+
+    world_view = None
+    if args.render:
+        images_by_sprite = LazyImagesBySprite(ENTITY_SPRITE_INITIALIZERS)
+        world_view = GameWorldView(screen, CAMERA_SIZE, SCREEN_SIZE, images_by_sprite)
+        world_view.preload_sprites(game_state.game_world.get_sprites_in_use())
+
+    frame_times = []
+    for frame in range(args.frames):
+        _simulate_player_input(game_engine, game_state, frame)
+        frame_start_time = time.perf_counter()
+        timings.start_frame()
+        game_engine.run_one_frame(FRAME_TIME)
+        if world_view:
+            timings.start_section()
+            _render(world_view, game_state)
+            timings.end_section("render")
+        timings.end_frame()
+        frame_times.append(time.perf_counter() - frame_start_time)
+
+    return {
+        "map": "dungeon (level %i)" % args.dungeon if args.dungeon is not None else args.map,
+        "hero": hero_id.name,
+        "seed": args.seed,
+        "num_frames": args.frames,
+        "num_enemies": len(game_state.game_world.enemies),
+        "render": args.render,
+        # These are in milliseconds
+        "frame": _get_statistics(frame_times),
+        "subsystems": {subsystem: _get_statistics(samples)
+                       for subsystem, samples in timings.samples_by_subsystem.items()},
+        # Runs with the same arguments should end up in the same state. If they don't, the game isn't deterministic.
+        "final_state": {
+            "player_position": game_state.game_world.player_entity.get_position(),
+            "player_health": game_state.player_state.health_resource.value,
+            "player_exp": game_state.player_state.exp,
+            "num_npcs": len(game_state.game_world.non_player_characters),
+        }
+    }
+
+
+def _load_map(map_file_path: str, hero_id: HeroId) -> GameState:
+    map_data = load_map_from_file(map_file_path)
+    game_world = map_data.game_world
+    game_world.player_entity = create_hero_world_entity(hero_id, map_data.player_position)
+    return GameState(game_world=game_world,
+                     camera_size=CAMERA_SIZE,
+                     player_state=create_player_state_as_initial(hero_id, {}),
+                     is_dungeon=False,
+                     player_spawn_position=map_data.player_position)
+
+
+def _spawn_enemies(game_state: GameState, num_enemies: int):
+    game_world = game_state.game_world
+    enemy_types = [npc_type for npc_type in NpcType
+                   if NON_PLAYER_CHARACTERS[npc_type].npc_category == NpcCategory.ENEMY
+                   and npc_type != NpcType.DARK_REAPER]
+    player_x, player_y = game_world.player_entity.get_center_position()
+    num_spawned = 0
+    # Give up eventually, in case the area around the player is too crowded
+    for _ in range(num_enemies * 20):
+        if num_spawned == num_enemies:
+            break
+        position = (player_x + random.randint(-ENEMY_SPAWN_DISTANCE, ENEMY_SPAWN_DISTANCE),
+                    player_y + random.randint(-ENEMY_SPAWN_DISTANCE, ENEMY_SPAWN_DISTANCE))
+        npc = create_npc(random.choice(enemy_types), position)
+        is_within_world = game_world.get_within_world(position, npc.world_entity.pygame_collision_rect.size) == position
+        if is_within_world and not game_world.would_entity_collide_if_new_pos(npc.world_entity, position):
+            game_world.add_non_player_character(npc)
+            num_spawned += 1
+
+
+def _simulate_player_input(game_engine: GameEngine, game_state: GameState, frame: int):
+    if frame % 30 == 0:
+        game_engine.move_in_direction(random.choice([Direction.LEFT, Direction.RIGHT, Direction.UP, Direction.DOWN]))
+    if frame % 20 == 0:
+        game_engine.try_use_ability(random.choice(game_state.player_state.abilities))
+
+
+def _render(world_view: GameWorldView, game_state: GameState):
+    game_world = game_state.game_world
+    player_state = game_state.player_state
+    world_view.render_world(
+        entities_to_render=game_world.get_renderable_non_wall_entities(),
+        walls_state=game_world.walls_state,
+        decorations_state=game_world.decorations_state,
+        player_entity=game_world.player_entity,
+        is_player_invisible=player_state.is_invisible,
+        player_active_buffs=player_state.active_buffs,
+        camera_world_area=game_state.get_camera_world_area_including_camera_shake(),
+        non_player_characters=game_world.non_player_characters,
+        visual_effects=game_world.visual_effects,
+        render_hit_and_collision_boxes=False,
+        player_health=player_state.health_resource.value,
+        player_max_health=player_state.health_resource.max_value,
+        entire_world_area=game_world.entire_world_area,
+        entity_action_text=None)
+
+
+def _get_statistics(samples_in_seconds: List[float]) -> Dict[str, float]:
+    samples = sorted(s * 1000 for s in samples_in_seconds)
+    return {
+        "p50": round(_percentile(samples, 50), 3),
+        "p95": round(_percentile(samples, 95), 3),
+        "p99": round(_percentile(samples, 99), 3),
+        "mean": round(sum(samples) / len(samples), 3),
+        "max": round(samples[-1], 3),
+    }
+
+
+# Nearest-rank percentile of already sorted samples
+def _percentile(sorted_samples: List[float], percent: int) -> float:
+    index = max(0, -(-len(sorted_samples) * percent // 100) - 1)
+    return sorted_samples[index]
+
+
+if __name__ == "__main__":
+    main()
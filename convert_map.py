@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+
+from pythongame.map_file import write_json_to_file
+from pythongame.map_file_binary import BinaryMapFile, is_binary_map_file, write_binary_map_to_file, \
+    BINARY_MAP_FILE_EXTENSION
+
+parser = argparse.ArgumentParser(description="Converts a map file between the JSON format and the binary format. "
+                                             "The formats are determined by the file extensions (binary map files "
+                                             "end with '%s')." % BINARY_MAP_FILE_EXTENSION)
+parser.add_argument('source')
+parser.add_argument('destination')
+args = parser.parse_args()
+
+
+def main():
+    if is_binary_map_file(args.source):
+        with BinaryMapFile(args.source) as binary_map_file:
+            json_data = binary_map_file.to_json()
+    else:
+        with open(args.source) as map_file:
+            json_data = json.loads(map_file.read())
+
+    if is_binary_map_file(args.destination):
+        write_binary_map_to_file(json_data, args.destination)
+    else:
+        write_json_to_file(json_data, args.destination)
+    print("Converted %s to %s" % (args.source, args.destination))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,50 @@
 #!/usr/bin/env python3
+import argparse
+import json
+import os
 import random
-from typing import Optional
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, List, Dict, Any
 
 from pythongame.core.common import NpcType
 from pythongame.core.entity_creation import create_npc
 from pythongame.core.game_data import NON_PLAYER_CHARACTERS, NpcCategory
 from pythongame.core.game_state import NonPlayerCharacter
-from pythongame.dungeon_generator import DungeonGenerator
+from pythongame.dungeon_generator import DungeonGenerator, CellType
+from pythongame.leveled_dungeons import create_dungeon_generator, get_dungeon_pool_dir, save_dungeon_to_file
 from pythongame.map_file import write_json_to_file
+from pythongame.map_file_binary import BINARY_MAP_FILE_EXTENSION
 from pythongame.register_game_data import register_all_game_data
 
 register_all_game_data()
 
+parser = argparse.ArgumentParser(
+    description="Generates random dungeon maps. By default, one large map is generated and written to "
+                "resources/maps/dudmap.json, so that it can be edited in the map editor. With --level, a batch of "
+                "in-game dungeons of that difficulty level is generated instead (one per seed, in parallel), and "
+                "written to the dungeon pool that the game picks dungeons from.")
+parser.add_argument('--seed', type=int, help="Generate the single map from this seed")
+parser.add_argument('--level', type=int, help="Generate a batch of dungeons of this difficulty level")
+parser.add_argument('--seeds', default="0:100",
+                    help="The seeds to generate dungeons from, as START:END (END not included). Used with --level")
+parser.add_argument('--output-dir', help="Where to write the batch of dungeons (defaults to the dungeon pool)")
+parser.add_argument('--processes', type=int, help="Number of worker processes (defaults to the number of CPUs)")
+args = parser.parse_args()
+
 
 def main():
+    if args.level is not None:
+        generate_batch(args.level, _parse_seed_range(args.seeds), args.output_dir or get_dungeon_pool_dir(args.level),
+                       args.processes)
+    else:
+        generate_single_map(args.seed)
+
+
+def generate_single_map(seed: Optional[int]):
+    rng = random.Random(seed) if seed is not None else random
     # Prefer maps that are longer on the horizontal axis, due to the aspect ratio of the in-game camera
-    w = random.randint(100, 130)
+    w = rng.randint(100, 130)
     world_size = (w, 200 - w)
     dungeon_generator = DungeonGenerator(
         world_size=world_size,
@@ -23,21 +52,81 @@ def main():
         room_allowed_width=(8, 25),
         room_allowed_height=(8, 25),
         corridor_allowed_width=(2, 6),
-        generate_npc=generate_npc, )
+        generate_npc=lambda x, y: generate_npc(rng, x, y),
+        rng=rng)
     grid, rooms = dungeon_generator.generate_random_grid()
-    json = dungeon_generator.generate_random_map_as_json_from_grid(grid, rooms)
-    write_json_to_file(json, "resources/maps/dudmap.json")
+    map_json = dungeon_generator.generate_random_map_as_json_from_grid(grid, rooms)
+    write_json_to_file(map_json, "resources/maps/dudmap.json")
 
 
-def generate_npc(x: int, y: int) -> Optional[NonPlayerCharacter]:
+def generate_npc(rng, x: int, y: int) -> Optional[NonPlayerCharacter]:
     npc_types = list(NpcType.__members__.values())
     valid_enemy_types = [npc_type for npc_type in npc_types
                          if NON_PLAYER_CHARACTERS[npc_type].npc_category == NpcCategory.ENEMY
                          and npc_type != NpcType.DARK_REAPER]
-    if random.random() < 0.2:
-        npc_type = random.choice(valid_enemy_types)
+    if rng.random() < 0.2:
+        npc_type = rng.choice(valid_enemy_types)
         return create_npc(npc_type, (x, y))
 
 
+def generate_batch(difficulty_level: int, seeds: List[int], output_dir: str, num_processes: Optional[int]):
+    os.makedirs(output_dir, exist_ok=True)
+    print("Generating %i dungeons (level %i) into %s ..." % (len(seeds), difficulty_level, output_dir))
+    start_time = time.perf_counter()
+    tasks = [(difficulty_level, seed, os.path.join(output_dir, str(seed) + BINARY_MAP_FILE_EXTENSION))
+             for seed in seeds]
+    with ProcessPoolExecutor(max_workers=num_processes) as executor:
+        stats = list(executor.map(_generate_and_save_dungeon, tasks, chunksize=max(1, len(tasks) // 32)))
+    total_time = time.perf_counter() - start_time
+
+    results = {
+        "level": difficulty_level,
+        "num_dungeons": len(stats),
+        "total_time_s": round(total_time, 3),
+        # How long it took to generate a single dungeon (in milliseconds), within a worker process
+        "generation_time_ms": _get_statistics([s["generation_time_ms"] for s in stats]),
+        "rooms": _get_statistics([s["rooms"] for s in stats]),
+        "room_cells": _get_statistics([s["room_cells"] for s in stats]),
+        # Floor that isn't part of any room (i.e. corridors)
+        "corridor_cells": _get_statistics([s["corridor_cells"] for s in stats]),
+        "walls": _get_statistics([s["walls"] for s in stats]),
+        "npcs": _get_statistics([s["npcs"] for s in stats]),
+    }
+    print(json.dumps(results, indent=2))
+
+
+# Runs in a worker process. Only the stats are sent back, as the dungeon itself is written to file.
+def _generate_and_save_dungeon(task) -> Dict[str, Any]:
+    difficulty_level, seed, file_path = task
+    start_time = time.perf_counter()
+    dungeon_generator = create_dungeon_generator(difficulty_level, seed)
+    grid, rooms = dungeon_generator.generate_random_grid()
+    dungeon = dungeon_generator.generate_random_dungeon_from_grid(grid, rooms)
+    generation_time = time.perf_counter() - start_time
+    save_dungeon_to_file(dungeon, file_path)
+    room_cells = sum(room.w * room.h for room in rooms)
+    return {
+        "generation_time_ms": generation_time * 1000,
+        "rooms": len(rooms),
+        "room_cells": room_cells,
+        "corridor_cells": grid.get_num_cells(CellType.FLOOR) - room_cells,
+        "walls": len(dungeon.walls),
+        "npcs": len(dungeon.npcs),
+    }
+
+
+def _parse_seed_range(seed_range: str) -> List[int]:
+    start, end = seed_range.split(":")
+    return list(range(int(start), int(end)))
+
+
+def _get_statistics(samples: List[float]) -> Dict[str, float]:
+    return {
+        "min": round(min(samples), 3),
+        "mean": round(sum(samples) / len(samples), 3),
+        "max": round(max(samples), 3),
+    }
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,35 @@
+import threading
+from typing import Callable, Generic, TypeVar, Optional
+
+T = TypeVar('T')
+
+
+# Runs a function on a worker thread, so that slow work (like parsing a map file or generating a dungeon) doesn't
+# block the main loop. The main thread polls is_done() once per frame and keeps rendering in the meantime.
+#
+# The function must not touch pygame's display or any state that the main thread is using while the task is running.
+# Anything that depends on that has to be done on the main thread, after get_result() has returned.
+class BackgroundTask(Generic[T]):
+    def __init__(self, function: Callable[[], T]):
+        self._function = function
+        self._result: Optional[T] = None
+        self._error: Optional[BaseException] = None
+        # Daemon thread, so that quitting the game isn't held up by a task that is still running
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self._result = self._function()
+        except BaseException as e:
+            self._error = e
+
+    def is_done(self) -> bool:
+        return not self._thread.is_alive()
+
+    # Blocks until the task is done. If the function raised an exception, it's re-raised here (on the calling thread)
+    def get_result(self) -> T:
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
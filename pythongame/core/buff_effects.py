@@ -6,6 +6,9 @@ from pythongame.core.world_entity import WorldEntity
 
 
 class AbstractBuffEffect:
+    # The types of events that buff_handle_event() is called with (see EventSubscriptions)
+    handled_events: Tuple[Type[Event], ...] = ()
+
     def apply_start_effect(self, game_state: GameState, buffed_entity: WorldEntity, buffed_npc: NonPlayerCharacter):
         pass
 
@@ -1,6 +1,6 @@
 import random
 from enum import Enum
-from typing import NewType, Optional, Any, List, Callable, Union, Tuple
+from typing import NewType, Optional, Any, List, Callable, Union, Tuple, Type
 
 Millis = NewType('Millis', int)
 
@@ -14,6 +14,10 @@ class Observable:
     def register_observer(self, observer: Callable[[Any], Any]):
         self._observers.append(observer)
 
+    def unregister_observer(self, observer: Callable[[Any], Any]):
+        if observer in self._observers:
+            self._observers.remove(observer)
+
     def notify(self, event):
         for observer in self._observers:
             # print("DEBUG Notifying observer " + str(observer) + ": " + str(event))
@@ -1147,6 +1151,10 @@ class AbstractScene:
     def run_one_frame(self, _time_passed: Millis) -> Optional[SceneTransition]:
         pass
 
+    # Called before render() when the game runs with a fixed timestep (see FixedTimestep.get_interpolation)
+    def set_render_interpolation(self, _interpolation: float):
+        pass
+
     def render(self):
         pass
 
@@ -1158,6 +1166,8 @@ class Event:
 
 
 class HeroUpgrade:
+    # The types of events that handle_event() is called with
+    handled_events: Tuple[Type[Event], ...] = ()
 
     def __init__(self, hero_upgrade_id: HeroUpgradeId):
         self._hero_upgrade_id = hero_upgrade_id
@@ -1,6 +1,5 @@
 from typing import Optional
 
-from pythongame.core.game_data import NpcCategory
 from pythongame.core.game_state import GameState, NonPlayerCharacter
 from pythongame.core.math import get_manhattan_distance
 from pythongame.core.world_entity import WorldEntity
@@ -26,8 +25,7 @@ class EnemyTarget:
 
 def get_target(agent_entity: WorldEntity, game_state: GameState) -> EnemyTarget:
     # Enemies should prioritize attacking a summon over attacking the player
-    player_summons = [npc for npc in game_state.game_world.non_player_characters
-                      if npc.npc_category == NpcCategory.PLAYER_SUMMON]
+    player_summons = game_state.game_world.player_summons
     if player_summons:
         player_summon = player_summons[0]
         agent_position = agent_entity.get_position()
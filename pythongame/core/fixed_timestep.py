@@ -0,0 +1,35 @@
+from pythongame.core.common import Millis
+
+# How much game time each simulation step covers (i.e. the simulation runs at 62.5 Hz)
+SIMULATION_STEP = Millis(16)
+# If a frame takes longer than this many steps, the game slows down instead of trying to catch up
+MAX_STEPS_PER_FRAME = 5
+
+
+# Decouples the simulation from rendering. Time that passes in the real world is accumulated, and the simulation is
+# advanced in steps of exactly the same length, however long the frames are. This makes the simulation the same
+# regardless of frame rate, and it means that a slow frame doesn't produce one huge step (where fast projectiles
+# could pass through walls without hitting them).
+#
+# The time that is left over after the last step (less than a step) is carried over to the next frame, so a frame is
+# usually rendered in between two steps. See get_interpolation().
+class FixedTimestep:
+    def __init__(self, step: Millis = SIMULATION_STEP, max_steps_per_frame: int = MAX_STEPS_PER_FRAME):
+        self.step = step
+        self.max_steps_per_frame = max_steps_per_frame
+        self._accumulated_time = Millis(0)
+
+    # Returns the number of simulation steps to run this frame
+    def add_frame_time(self, time_passed: Millis) -> int:
+        # After a long stall (like loading a new world) there would be too many steps to catch up on. Running them all
+        # would make the next frame slow too, and so on, so the time beyond max_steps_per_frame is dropped.
+        self._accumulated_time = min(self._accumulated_time + time_passed, self.max_steps_per_frame * self.step)
+        num_steps = self._accumulated_time // self.step
+        self._accumulated_time -= num_steps * self.step
+        return num_steps
+
+    # How much of the next step has already passed in the real world (between 0 and 1). Moving things can be rendered
+    # this far between where they were before and after the last step, so that they move smoothly even though the
+    # simulation and the rendering don't run at the same rate.
+    def get_interpolation(self) -> float:
+        return self._accumulated_time / self.step
@@ -0,0 +1,28 @@
+import time
+from typing import Dict, List
+
+
+# Measures how much time is spent in the different parts ("subsystems") of each frame. It's used for benchmarking,
+# see benchmark.py. Within a frame, the time from the start of a section until it's ended is attributed to the
+# subsystem that is named when ending it.
+class FrameTimings:
+    def __init__(self):
+        # Times are expressed in seconds, with one entry per frame
+        self.samples_by_subsystem: Dict[str, List[float]] = {}
+        self._current_frame: Dict[str, float] = {}
+        self._section_start_time = 0.0
+
+    def start_frame(self):
+        self._current_frame = {}
+
+    def start_section(self):
+        self._section_start_time = time.perf_counter()
+
+    def end_section(self, subsystem: str):
+        now = time.perf_counter()
+        self._current_frame[subsystem] = self._current_frame.get(subsystem, 0) + now - self._section_start_time
+        self._section_start_time = now
+
+    def end_frame(self):
+        for subsystem, duration in self._current_frame.items():
+            self.samples_by_subsystem.setdefault(subsystem, []).append(duration)
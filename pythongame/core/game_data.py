@@ -1,4 +1,4 @@
-from typing import Set, Dict
+from typing import Set, Dict, Iterable
 
 from pythongame.core.common import *
 from pythongame.core.common import UiIconSprite, PortraitIconSprite
@@ -152,6 +152,12 @@ PORTALS: Dict[PortalId, PortalData] = {}
 
 HEROES: Dict[HeroId, HeroData] = {}
 
+# The sprites of entities that abilities and NPCs can bring into the world while playing (projectiles, visual effects,
+# summoned NPCs), so that they can be loaded along with the world rather than the first time that they show up
+SPRITES_SPAWNED_BY_ABILITY: Dict[AbilityType, List[Sprite]] = {}
+SPRITES_SPAWNED_BY_NPC: Dict[NpcType, List[Sprite]] = {}
+NPCS_SUMMONED_BY_NPC: Dict[NpcType, List[NpcType]] = {}
+
 
 def register_npc_data(npc_type: NpcType, npc_data: NpcData):
     NON_PLAYER_CHARACTERS[npc_type] = npc_data
@@ -230,3 +236,34 @@ def register_portal_data(portal_id: PortalId, portal_data: PortalData):
 
 def register_hero_data(hero_id: HeroId, hero_data: HeroData):
     HEROES[hero_id] = hero_data
+
+
+def register_sprites_spawned_by_ability(ability_type: AbilityType, sprites: List[Sprite]):
+    SPRITES_SPAWNED_BY_ABILITY[ability_type] = sprites
+
+
+def register_sprites_spawned_by_npc(npc_type: NpcType, sprites: List[Sprite]):
+    SPRITES_SPAWNED_BY_NPC[npc_type] = sprites
+
+
+def register_npcs_summoned_by_npc(npc_type: NpcType, summoned_npc_types: List[NpcType]):
+    NPCS_SUMMONED_BY_NPC[npc_type] = summoned_npc_types
+
+
+# Returns the sprites of the given NPCs, and of everything that they (and the given abilities) can spawn
+def get_sprites_that_can_be_spawned(ability_types: Iterable[AbilityType], npc_types: Iterable[NpcType]) -> Set[Sprite]:
+    sprites = set()
+    for ability_type in ability_types:
+        sprites.update(SPRITES_SPAWNED_BY_ABILITY.get(ability_type, []))
+    npc_types_to_visit = list(npc_types)
+    visited_npc_types = set()
+    while npc_types_to_visit:
+        npc_type = npc_types_to_visit.pop()
+        if npc_type in visited_npc_types:
+            continue
+        visited_npc_types.add(npc_type)
+        sprites.add(NON_PLAYER_CHARACTERS[npc_type].sprite)
+        sprites.update(SPRITES_SPAWNED_BY_NPC.get(npc_type, []))
+        # Summoned NPCs can in turn spawn things of their own
+        npc_types_to_visit += NPCS_SUMMONED_BY_NPC.get(npc_type, [])
+    return sprites
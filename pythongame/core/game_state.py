@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Dict, Set, Sequence, Type
 
 from pygame.rect import Rect
 
@@ -6,9 +6,10 @@ from pythongame.core.common import *
 from pythongame.core.consumable_inventory import ConsumableInventory
 from pythongame.core.game_data import NpcCategory, PlayerLevelBonus
 from pythongame.core.health_and_mana import HealthOrManaResource
-from pythongame.core.item_inventory import ItemInventory
+from pythongame.core.item_inventory import ItemInventory, ItemInventorySlot
 from pythongame.core.math import boxes_intersect, rects_intersect, get_position_from_center_position, \
-    is_x_and_y_within_distance
+    is_x_and_y_within_distance, get_time_of_impact, get_swept_rect
+from pythongame.core.pathfinding.wall_grid import WallGrid
 from pythongame.core.quests import QuestId, Quest
 from pythongame.core.talents import TalentsConfig, TalentsState
 from pythongame.core.world_entity import WorldEntity
@@ -217,6 +218,33 @@ class AgentBuffsUpdate:
         self.buffs_that_ended = buffs_that_ended
 
 
+# Keeps track of which listeners (buffs, item effects or hero upgrades) handle which types of events, so that an event
+# is only passed to the listeners that are interested in it, rather than to every active buff, item and upgrade.
+# Listeners are looked up by the exact type of the event, and are called in the order that they subscribed.
+class EventSubscriptions:
+    def __init__(self):
+        self._listeners_by_event_type: Dict[Type[Event], List[Any]] = {}
+
+    def subscribe(self, listener: Any, event_types: Tuple[Type[Event], ...]):
+        for event_type in event_types:
+            self._listeners_by_event_type.setdefault(event_type, []).append(listener)
+
+    def unsubscribe(self, listener: Any, event_types: Tuple[Type[Event], ...]):
+        for event_type in event_types:
+            listeners = self._listeners_by_event_type.get(event_type)
+            if listeners and listener in listeners:
+                listeners.remove(listener)
+                if not listeners:
+                    del self._listeners_by_event_type[event_type]
+
+    # The lists are replaced rather than emptied, so that an event that is being dispatched is unaffected
+    def clear(self):
+        self._listeners_by_event_type = {}
+
+    def get_listeners(self, event_type: Type[Event]) -> Sequence[Any]:
+        return self._listeners_by_event_type.get(event_type, ())
+
+
 class PlayerState:
     def __init__(self,
                  health_resource: HealthOrManaResource,
@@ -283,6 +311,12 @@ class PlayerState:
         self.mana_on_kill: int = 0  # affected by items/buffs. [Change it additively]
         self.dungeon_difficulty_level = 1
         self.enabled_portals = enabled_portals  # Part of playerState so that we can save it in save file easily
+        # Which active buffs, equipped items and upgrades handle which events. See notify_about_event()
+        self._buff_event_subscriptions = EventSubscriptions()
+        self._item_event_subscriptions = EventSubscriptions()
+        self._upgrade_event_subscriptions = EventSubscriptions()
+        self.item_inventory.was_updated.register_observer(self._on_item_inventory_updated)
+        self._on_item_inventory_updated(self.item_inventory.slots)
 
     def start_quest(self, quest: Quest):
         if [q for q in self.active_quests if q.quest_id == quest.quest_id]:
@@ -391,7 +425,9 @@ class PlayerState:
         if existing_buffs_with_this_type:
             existing_buffs_with_this_type[0].set_remaining_duration(duration)
         else:
-            self.active_buffs.append(BuffWithDuration(buff, duration))
+            buff_with_duration = BuffWithDuration(buff, duration)
+            self.active_buffs.append(buff_with_duration)
+            self._buff_event_subscriptions.subscribe(buff_with_duration, buff.handled_events)
         self.notify_buff_observers()
 
     def notify_buff_observers(self):
@@ -426,6 +462,7 @@ class PlayerState:
                 buff.has_applied_start_effect = True
             elif buff.has_expired():
                 self.active_buffs.remove(buff)
+                self._buff_event_subscriptions.unsubscribe(buff, buff.buff_effect.handled_events)
                 buffs_that_ended.append(buff)
         self.notify_buff_observers()
         return AgentBuffsUpdate(buffs_that_started, buffs_that_were_active, buffs_that_ended)
@@ -518,8 +555,11 @@ class PlayerState:
         if ability_type:
             self.gain_ability(ability_type)
 
+    # Only the buffs, items and upgrades that handle this type of event are notified. They are notified in the order
+    # that they were gained (buffs), are placed in the inventory (items) and were picked (upgrades).
     def notify_about_event(self, event: Event, game_state):
-        for buff in self.active_buffs:
+        event_type = type(event)
+        for buff in self._buff_event_subscriptions.get_listeners(event_type):
             outcome: Optional[BuffEventOutcome] = buff.buff_effect.buff_handle_event(event)
             if outcome:
                 if outcome.change_remaining_duration:
@@ -527,9 +567,9 @@ class PlayerState:
                 if outcome.cancel_effect:
                     buff.force_cancel()
                 self.notify_buff_observers()
-        for item_effect in self.item_inventory.get_all_active_item_effects():
+        for item_effect in self._item_event_subscriptions.get_listeners(event_type):
             item_effect.item_handle_event(event, game_state)
-        for upgrade in self._upgrades:
+        for upgrade in self._upgrade_event_subscriptions.get_listeners(event_type):
             upgrade.handle_event(event, game_state)
         if isinstance(event, EnemyDiedEvent):
             self.mana_resource.gain(self.mana_on_kill)
@@ -538,18 +578,28 @@ class PlayerState:
     def choose_talent(self, tier_index: int, option_index: int) -> Tuple[str, HeroUpgradeId]:
         option = self._talents_state.pick(tier_index, option_index)
         self._upgrades.append(option.upgrade)
+        self._upgrade_event_subscriptions.subscribe(option.upgrade, option.upgrade.handled_events)
         self.notify_talent_observers()
         return option.name, option.upgrade.get_upgrade_id()
 
     def reset_talents(self) -> List[HeroUpgradeId]:
         reset_upgrades = list(self._talents_state.reset())
         self._upgrades = [u for u in self._upgrades if u not in reset_upgrades]
+        self._upgrade_event_subscriptions.clear()
+        for upgrade in self._upgrades:
+            self._upgrade_event_subscriptions.subscribe(upgrade, upgrade.handled_events)
         self.notify_talent_observers()
         return [u.get_upgrade_id() for u in reset_upgrades]
 
     def notify_talent_observers(self):
         self.talents_were_updated.notify(self._talents_state)
 
+    # Items are equipped and unequipped by moving them in the inventory, so the subscriptions are simply rebuilt
+    def _on_item_inventory_updated(self, _slots: List[ItemInventorySlot]):
+        self._item_event_subscriptions.clear()
+        for item_effect in self.item_inventory.get_all_active_item_effects():
+            self._item_event_subscriptions.subscribe(item_effect, item_effect.handled_events)
+
     def has_unpicked_talents(self):
         return self._talents_state.has_unpicked_talents()
 
@@ -635,6 +685,16 @@ class CameraShake:
         return self._time_left > 0
 
 
+class ProjectileCollisions:
+    def __init__(self, enemy_collisions: List[Tuple[NonPlayerCharacter, Projectile]],
+                 player_summon_collisions: List[Tuple[NonPlayerCharacter, Projectile]],
+                 player_collisions: List[Projectile], wall_collisions: List[Projectile]):
+        self.enemy_collisions = enemy_collisions
+        self.player_summon_collisions = player_summon_collisions
+        self.player_collisions = player_collisions
+        self.wall_collisions = wall_collisions
+
+
 class GameWorldState:
     def __init__(self,
                  player_entity: Optional[WorldEntity],  # sometimes we want to model a map without caring about the hero
@@ -650,7 +710,6 @@ class GameWorldState:
                  shrines: List[Shrine],
                  dungeon_entrances: List[DungeonEntrance],
                  ):
-        self.player_entity = player_entity
         self.projectile_entities: List[Projectile] = []
         # TODO: unify code for picking up stuff from the ground. The way they are rendered and picked up are similar,
         # and only the effect of picking them up is different.
@@ -658,16 +717,61 @@ class GameWorldState:
         self.items_on_ground: List[ItemOnGround] = items_on_ground
         self.money_piles_on_ground: List[MoneyPileOnGround] = money_piles_on_ground
         self.non_player_characters: List[NonPlayerCharacter] = non_player_characters
+        # The NPCs by category, so that code that only cares about (for instance) enemies doesn't need to go through
+        # all NPCs. These are kept in the same order as non_player_characters. Don't modify them directly, but use
+        # add_non_player_character etc.
+        self.enemies: List[NonPlayerCharacter] = [npc for npc in non_player_characters if npc.is_enemy]
+        self.player_summons: List[NonPlayerCharacter] = [npc for npc in non_player_characters
+                                                         if npc.npc_category == NpcCategory.PLAYER_SUMMON]
+        self.neutral_npcs: List[NonPlayerCharacter] = [npc for npc in non_player_characters if npc.is_neutral]
+        self.bosses: List[NonPlayerCharacter] = [npc for npc in non_player_characters if npc.is_boss]
         self.entire_world_area = entire_world_area
         self.walls_state = WallsState(walls, entire_world_area)
         self.visual_effects = []
         self.decorations_state = DecorationsState(decoration_entities, entire_world_area)
         self.portals: List[Portal] = portals
         self.shrines: List[Shrine] = shrines
-        self.warp_points: List[WarpPoint] = []
+        self._warp_points: List[WarpPoint] = []
         self.chests: List[Chest] = chests
         self.dungeon_entrances = dungeon_entrances
         self.player_movement_speed_was_updated = Observable()
+        # Everything that blocks movement, except for walls (they are handled by WallsState)
+        self._blocking_entities = SpatialHash(
+            [e.world_entity for e in non_player_characters] + [p.world_entity for p in portals] +
+            [c.world_entity for c in chests] + [s.world_entity for s in shrines] +
+            [e.world_entity for e in dungeon_entrances])
+        self._npcs_by_entity: Dict[WorldEntity, NonPlayerCharacter] = {npc.world_entity: npc for npc in
+                                                                      non_player_characters}
+        self._projectiles_hash = SpatialHash([])
+        self._projectiles_by_entity: Dict[WorldEntity, Projectile] = {}
+        # Where the projectiles were before they were last moved (see move_projectiles)
+        self._projectile_start_rects: Dict[WorldEntity, Rect] = {}
+        self._player_entity = None
+        self.player_entity = player_entity
+
+    @property
+    def player_entity(self) -> Optional[WorldEntity]:
+        return self._player_entity
+
+    @player_entity.setter
+    def player_entity(self, player_entity: Optional[WorldEntity]):
+        if self._player_entity is not None:
+            self._blocking_entities.remove_entity(self._player_entity)
+        self._player_entity = player_entity
+        if player_entity is not None:
+            self._blocking_entities.add_entity(player_entity)
+
+    @property
+    def warp_points(self) -> List[WarpPoint]:
+        return self._warp_points
+
+    @warp_points.setter
+    def warp_points(self, warp_points: List[WarpPoint]):
+        for warp_point in self._warp_points:
+            self._blocking_entities.remove_entity(warp_point.world_entity)
+        self._warp_points = warp_points
+        for warp_point in warp_points:
+            self._blocking_entities.add_entity(warp_point.world_entity)
 
     def get_portal_with_id(self, portal_id: PortalId) -> Portal:
         return [p for p in self.portals if p.portal_id == portal_id][0]
@@ -686,42 +790,155 @@ class GameWorldState:
 
     def add_non_player_character(self, npc: NonPlayerCharacter):
         self.non_player_characters.append(npc)
+        self._get_npcs_in_same_category(npc).append(npc)
+        if npc.is_boss:
+            self.bosses.append(npc)
+        self._blocking_entities.add_entity(npc.world_entity)
+        self._npcs_by_entity[npc.world_entity] = npc
+
+    def remove_non_player_character(self, npc: NonPlayerCharacter):
+        self.non_player_characters.remove(npc)
+        self._get_npcs_in_same_category(npc).remove(npc)
+        if npc.is_boss:
+            self.bosses.remove(npc)
+        self._blocking_entities.remove_entity(npc.world_entity)
+        del self._npcs_by_entity[npc.world_entity]
 
     def remove_all_player_summons(self):
+        if not self.player_summons:
+            return
+        for npc in self.player_summons:
+            self._blocking_entities.remove_entity(npc.world_entity)
+            del self._npcs_by_entity[npc.world_entity]
+        self.player_summons = []
         self.non_player_characters = [npc for npc in self.non_player_characters
                                       if npc.npc_category != NpcCategory.PLAYER_SUMMON]
 
+    # Whether the NPC is still in the world (i.e. it hasn't died or been removed)
+    def contains_non_player_character(self, npc: NonPlayerCharacter) -> bool:
+        return self._npcs_by_entity.get(npc.world_entity) is npc
+
+    def _get_npcs_in_same_category(self, npc: NonPlayerCharacter) -> List[NonPlayerCharacter]:
+        if npc.is_enemy:
+            return self.enemies
+        if npc.is_neutral:
+            return self.neutral_npcs
+        return self.player_summons
+
+    def add_projectile(self, projectile: Projectile):
+        self.projectile_entities.append(projectile)
+        self._projectiles_hash.add_entity(projectile.world_entity)
+        self._projectiles_by_entity[projectile.world_entity] = projectile
+
+    def add_portal(self, portal: Portal):
+        self.portals.append(portal)
+        self._blocking_entities.add_entity(portal.world_entity)
+
+    def remove_portal(self, portal: Portal):
+        self.portals.remove(portal)
+        self._blocking_entities.remove_entity(portal.world_entity)
+
+    def add_chest(self, chest: Chest):
+        self.chests.append(chest)
+        self._blocking_entities.add_entity(chest.world_entity)
+
+    def add_shrine(self, shrine: Shrine):
+        self.shrines.append(shrine)
+        self._blocking_entities.add_entity(shrine.world_entity)
+
+    def remove_shrine(self, shrine: Shrine):
+        self.shrines.remove(shrine)
+        self._blocking_entities.remove_entity(shrine.world_entity)
+
+    def add_dungeon_entrance(self, dungeon_entrance: DungeonEntrance):
+        self.dungeon_entrances.append(dungeon_entrance)
+        self._blocking_entities.add_entity(dungeon_entrance.world_entity)
+
+    def remove_dungeon_entrance(self, dungeon_entrance: DungeonEntrance):
+        self.dungeon_entrances.remove(dungeon_entrance)
+        self._blocking_entities.remove_entity(dungeon_entrance.world_entity)
+
     def get_walls_in_sight_of_player(self, camera_world_area: Rect) -> List[WorldEntity]:
         return self.walls_state.get_walls_in_camera(camera_world_area)
 
-    def get_decorations_to_render(self, camera_world_area: Rect) -> List[DecorationEntity]:
-        return self.decorations_state.get_decorations_in_camera(camera_world_area)
-
     def get_projectiles_intersecting_with(self, entity: WorldEntity) -> List[Projectile]:
-        return [p for p in self.projectile_entities if boxes_intersect(entity.rect(), p.world_entity.rect())]
+        if not self.projectile_entities:
+            return []
+        projectile_entities = self._projectiles_hash.get_entities_intersecting_rect(entity.rect())
+        return [self._projectiles_by_entity[e] for e in projectile_entities]
+
+    # Moves all projectiles according to their direction and speed. Where they started out is remembered, so that
+    # get_projectile_collisions() can find everything that they passed on the way.
+    def move_projectiles(self, time_passed: Millis):
+        start_rects = {}
+        for projectile in self.projectile_entities:
+            entity = projectile.world_entity
+            new_position = entity.get_new_position_according_to_dir_and_speed(time_passed)
+            if new_position:
+                start_rects[entity] = Rect(entity.pygame_collision_rect)
+                entity.set_position(new_position)
+        self._projectile_start_rects = start_rects
+
+    # Collision detection for all projectiles: a single pass over the projectiles, where each one is checked only
+    # against the NPCs/player and walls that are close to the path it moved along in the last frame. This way, fast
+    # projectiles (or slow frames) don't skip past anything. Nothing is hit beyond the first wall on the path.
+    def get_projectile_collisions(self) -> ProjectileCollisions:
+        enemy_collisions: List[Tuple[float, NonPlayerCharacter, Projectile]] = []
+        player_summon_collisions: List[Tuple[float, NonPlayerCharacter, Projectile]] = []
+        player_collisions: List[Projectile] = []
+        wall_collisions: List[Projectile] = []
+        for projectile in self.projectile_entities:
+            if projectile.has_collided_and_should_be_removed:
+                continue
+            end_rect = projectile.world_entity.pygame_collision_rect
+            start_rect = self._projectile_start_rects.get(projectile.world_entity, end_rect)
+            movement = (end_rect.x - start_rect.x, end_rect.y - start_rect.y)
+            swept_rect = start_rect.union(end_rect)
+            wall_time_of_impact = self.get_time_of_impact(start_rect, movement, include_blocking_entities=False)
+            for entity in self._blocking_entities.get_entities_intersecting_rect(swept_rect):
+                if entity is not self._player_entity and entity not in self._npcs_by_entity:
+                    continue
+                time_of_impact = get_time_of_impact(start_rect, movement, entity.pygame_collision_rect)
+                if time_of_impact is None or (wall_time_of_impact is not None
+                                              and time_of_impact > wall_time_of_impact):
+                    continue
+                if entity is self._player_entity:
+                    player_collisions.append(projectile)
+                else:
+                    npc = self._npcs_by_entity[entity]
+                    if npc.is_enemy:
+                        enemy_collisions.append((time_of_impact, npc, projectile))
+                    elif npc.npc_category == NpcCategory.PLAYER_SUMMON:
+                        player_summon_collisions.append((time_of_impact, npc, projectile))
+            if wall_time_of_impact is not None:
+                wall_collisions.append(projectile)
+
+        # Collisions are handled in the order that they happened. Collisions that happened at the same time are handled
+        # NPC by NPC, in the same order as the NPCs are stored.
+        if len(enemy_collisions) + len(player_summon_collisions) > 1:
+            npc_indices = {npc.world_entity: i for i, npc in enumerate(self.non_player_characters)}
+            enemy_collisions.sort(key=lambda collision: (collision[0], npc_indices[collision[1].world_entity]))
+            player_summon_collisions.sort(key=lambda collision: (collision[0], npc_indices[collision[1].world_entity]))
+        return ProjectileCollisions([(npc, projectile) for _, npc, projectile in enemy_collisions],
+                                    [(npc, projectile) for _, npc, projectile in player_summon_collisions],
+                                    player_collisions, wall_collisions)
 
     def get_enemy_intersecting_with(self, entity: WorldEntity) -> List[NonPlayerCharacter]:
-        return [e for e in self.non_player_characters if
-                e.is_enemy and boxes_intersect(e.world_entity.rect(), entity.rect())]
+        entity_rect = entity.rect()
+        return [e for e in self.enemies if boxes_intersect(e.world_entity.rect(), entity_rect)]
 
     def get_enemy_intersecting_rect(self, rect: Rect) -> List[NonPlayerCharacter]:
-        return [e for e in self.non_player_characters if e.is_enemy and rects_intersect(e.world_entity.rect(), rect)]
+        return [e for e in self.enemies if rects_intersect(e.world_entity.rect(), rect)]
 
     def get_enemies_within_x_y_distance_of(self, distance: int, position: Tuple[int, int]):
-        return [e for e in self.non_player_characters
-                if e.is_enemy
-                and is_x_and_y_within_distance(e.world_entity.get_center_position(), position, distance)]
+        return [e for e in self.enemies
+                if is_x_and_y_within_distance(e.world_entity.get_center_position(), position, distance)]
 
-    # NOTE: Very naive brute-force collision checking
     def update_world_entity_position_within_game_world(self, entity: WorldEntity, time_passed: Millis):
         new_position = entity.get_new_position_according_to_dir_and_speed(time_passed)
         if new_position:
-            new_pos_within_world = self.get_within_world(
-                new_position, (entity.pygame_collision_rect.w, entity.pygame_collision_rect.h))
-            if not self.would_entity_collide_if_new_pos(entity, new_pos_within_world):
-                entity.set_position(new_pos_within_world)
+            self._move_entity_until_collision(entity, new_position)
 
-    # NOTE: Very naive brute-force collision checking
     def update_npc_position_within_game_world(self, npc: NonPlayerCharacter, time_passed: Millis):
         entity = npc.world_entity
         new_position = entity.get_new_position_according_to_dir_and_speed(time_passed)
@@ -731,27 +948,64 @@ class GameWorldState:
                     npc.start_position, new_position, npc.max_distance_allowed_from_start_position)
                 if not is_close_to_start_position:
                     return
-            new_pos_within_world = self.get_within_world(
-                new_position, (entity.pygame_collision_rect.w, entity.pygame_collision_rect.h))
-            if not self.would_entity_collide_if_new_pos(entity, new_pos_within_world):
-                entity.set_position(new_pos_within_world)
+            self._move_entity_until_collision(entity, new_position)
+
+    # Moves the entity towards the new position. If there's something in the way, the entity stops when it touches it,
+    # rather than not moving at all.
+    def _move_entity_until_collision(self, entity: WorldEntity, new_position: Tuple[int, int]):
+        rect = entity.pygame_collision_rect
+        new_pos_within_world = self.get_within_world(new_position, (rect.w, rect.h))
+        movement = (new_pos_within_world[0] - entity.x, new_pos_within_world[1] - entity.y)
+        time_of_impact = self.get_time_of_impact(rect, movement, entity)
+        if time_of_impact is None:
+            entity.set_position(new_pos_within_world)
+        elif time_of_impact > 0:
+            contact_position = (entity.x + movement[0] * time_of_impact, entity.y + movement[1] * time_of_impact)
+            # The collision rect is placed on whole pixels, so the entity could end up overlapping slightly with what
+            # it hit because of rounding
+            if not self.would_entity_collide_if_new_pos(entity, contact_position):
+                entity.set_position(contact_position)
+
+    # Swept collision detection: if the rect moved by the given amount, how far along the movement (between 0 and 1)
+    # would it first hit a wall or anything else that blocks movement? Returns None if nothing is in the way.
+    #
+    # Anything that the rect is already overlapping with is only considered to be in the way if the rect would still
+    # overlap with it after moving, so that entities can always move out of something they're stuck in.
+    def get_time_of_impact(self, rect: Rect, movement: Tuple[float, float], ignored_entity: Optional[WorldEntity] = None,
+                           include_walls: bool = True, include_blocking_entities: bool = True) -> Optional[float]:
+        swept_rect = get_swept_rect(rect, movement)
+        end_rect = None
+        earliest_time_of_impact = None
+        obstacles = []
+        if include_walls:
+            obstacles += self.walls_state.get_walls_close_to_area(swept_rect)
+        if include_blocking_entities:
+            obstacles += self._blocking_entities.get_entities_intersecting_rect(swept_rect)
+        for obstacle in obstacles:
+            obstacle_rect = obstacle.pygame_collision_rect
+            if obstacle is ignored_entity or not swept_rect.colliderect(obstacle_rect):
+                continue
+            if rect.colliderect(obstacle_rect):
+                if end_rect is None:
+                    end_rect = rect.move(round(movement[0]), round(movement[1]))
+                if not end_rect.colliderect(obstacle_rect):
+                    continue
+            time_of_impact = get_time_of_impact(rect, movement, obstacle_rect)
+            if time_of_impact is not None and (earliest_time_of_impact is None
+                                               or time_of_impact < earliest_time_of_impact):
+                earliest_time_of_impact = time_of_impact
+        return earliest_time_of_impact
 
     # TODO Improve the interaction between functions in here
     def would_entity_collide_if_new_pos(self, entity, new_pos_within_world):
         if not self.is_position_within_game_world(new_pos_within_world):
             raise Exception("not within game-world: " + str(new_pos_within_world))
-        old_pos = entity.x, entity.y
-        entity.set_position(new_pos_within_world)
-        walls = self.walls_state.get_walls_close_to_position(entity.get_position())
-        other_entities = [e.world_entity for e in self.non_player_characters] + \
-                         [self.player_entity] + walls + [p.world_entity for p in self.portals] + \
-                         [s.world_entity for s in self.shrines] + \
-                         [w.world_entity for w in self.warp_points] + [c.world_entity for c in self.chests] + \
-                         [e.world_entity for e in self.dungeon_entrances]
-        collision = any([other for other in other_entities if self._entities_collide(entity, other)
-                         and entity is not other])
-        entity.set_position(old_pos)
-        return collision
+        new_rect = entity.pygame_collision_rect.copy()
+        new_rect.x = new_pos_within_world[0]
+        new_rect.y = new_pos_within_world[1]
+        if self.walls_state.does_rect_intersect_with_wall(new_rect):
+            return True
+        return any(other is not entity for other in self._blocking_entities.get_entities_intersecting_rect(new_rect))
 
     def get_within_world(self, pos: Tuple[int, int], size: Tuple[int, int]):
         # TODO extract world area arithmetic
@@ -764,21 +1018,41 @@ class GameWorldState:
         return self.entire_world_area.collidepoint(position[0], position[1])
 
     def remove_expired_projectiles(self):
+        for projectile in self.projectile_entities:
+            if projectile.has_expired:
+                self._projectiles_hash.remove_entity(projectile.world_entity)
+                del self._projectiles_by_entity[projectile.world_entity]
         self.projectile_entities = [p for p in self.projectile_entities if not p.has_expired]
 
     def remove_dead_npcs(self) -> List[NonPlayerCharacter]:
         npcs_that_died = [npc for npc in self.non_player_characters if npc.health_resource.is_at_or_below_zero()]
+        if not npcs_that_died:
+            return npcs_that_died
+        for npc in npcs_that_died:
+            self._blocking_entities.remove_entity(npc.world_entity)
+            del self._npcs_by_entity[npc.world_entity]
         self.non_player_characters = [npc for npc in self.non_player_characters if
                                       not npc.health_resource.is_at_or_below_zero()]
+        self.enemies = [npc for npc in self.enemies if not npc.health_resource.is_at_or_below_zero()]
+        self.player_summons = [npc for npc in self.player_summons if not npc.health_resource.is_at_or_below_zero()]
+        self.neutral_npcs = [npc for npc in self.neutral_npcs if not npc.health_resource.is_at_or_below_zero()]
+        self.bosses = [npc for npc in self.bosses if not npc.health_resource.is_at_or_below_zero()]
         return npcs_that_died
 
     def remove_expired_visual_effects(self):
         self.visual_effects = [v for v in self.visual_effects if not v.has_expired]
 
     def remove_opened_chests(self):
+        for chest in self.chests:
+            if chest.has_been_opened:
+                self._blocking_entities.remove_entity(chest.world_entity)
         self.chests: List[Chest] = [c for c in self.chests if not c.has_been_opened]
 
     def remove_projectiles_that_have_been_destroyed(self):
+        for projectile in self.projectile_entities:
+            if projectile.has_collided_and_should_be_removed:
+                self._projectiles_hash.remove_entity(projectile.world_entity)
+                del self._projectiles_by_entity[projectile.world_entity]
         self.projectile_entities: List[Projectile] = [p for p in self.projectile_entities
                                                       if not p.has_collided_and_should_be_removed]
 
@@ -786,10 +1060,12 @@ class GameWorldState:
         self.money_piles_on_ground: List[MoneyPileOnGround] = [m for m in self.money_piles_on_ground
                                                                if not m.has_been_picked_up_and_should_be_removed]
 
-    @staticmethod
-    def _entities_collide(a: WorldEntity, b: WorldEntity):
-        # Optimization: collision checking done with C-code from Pygame
-        return a.pygame_collision_rect.colliderect(b.pygame_collision_rect)
+    # The sprites that are needed to render this world as it is now. Used for loading images ahead of time.
+    def get_sprites_in_use(self) -> Set[Sprite]:
+        sprites = {entity.sprite for entity in self.get_renderable_non_wall_entities() if entity is not None}
+        sprites.update(wall.world_entity.sprite for wall in self.walls_state.walls)
+        sprites.update(decoration.sprite for decoration in self.decorations_state.decoration_entities)
+        return sprites
 
     def get_renderable_non_wall_entities(self) -> List[WorldEntity]:
         return [self.player_entity] + \
@@ -825,17 +1101,17 @@ class GameState:
         self.player_state: PlayerState = player_state
 
     @staticmethod
-    def _setup_pathfinder_wall_grid(entire_world_area: Rect, walls: List[WorldEntity]):
+    def _setup_pathfinder_wall_grid(entire_world_area: Rect, walls: List[WorldEntity]) -> WallGrid:
         # TODO extract world area arithmetic
         grid_width = entire_world_area.w // GRID_CELL_WIDTH
         grid_height = entire_world_area.h // GRID_CELL_WIDTH
-        grid = []
-        for x in range(grid_width + 1):
-            grid.append((grid_height + 1) * [0])
+        grid = WallGrid(grid_width + 1, grid_height + 1)
         for w in walls:
             cell_x = (w.x - entire_world_area.x) // GRID_CELL_WIDTH
             cell_y = (w.y - entire_world_area.y) // GRID_CELL_WIDTH
-            grid[cell_x][cell_y] = 1
+            grid.set_wall((cell_x, cell_y))
+        # Done up front, so that the first path-finding query doesn't have to pay for it
+        grid.update_clearance()
         return grid
 
     def modify_hero_stat(self, hero_stat: HeroStat, stat_delta: Union[int, float]):
@@ -844,15 +1120,9 @@ class GameState:
         else:
             self.player_state.modify_stat(hero_stat, stat_delta)
 
-    def get_all_entities_to_render(self) -> List[WorldEntity]:
-        return self.get_walls_in_sight_of_player() + self.game_world.get_renderable_non_wall_entities()
-
     def get_walls_in_sight_of_player(self) -> List[WorldEntity]:
         return self.game_world.get_walls_in_sight_of_player(self.camera_world_area)
 
-    def get_decorations_to_render(self) -> List[DecorationEntity]:
-        return self.game_world.get_decorations_to_render(self.camera_world_area)
-
     def handle_camera_shake(self, time_passed: Millis):
         if self.camera_shake is not None:
             self.camera_shake.notify_time_passed(time_passed)
@@ -899,30 +1169,46 @@ class WallsState:
     def __init__(self, walls: List[Wall], entire_world_area: Rect):
         self.walls: List[Wall] = walls
         self._buckets = Buckets([w.world_entity for w in walls], entire_world_area)
+        self._walls_by_position: Dict[Tuple[int, int], List[Wall]] = {}
+        for wall in walls:
+            self._walls_by_position.setdefault(wall.world_entity.get_position(), []).append(wall)
         self._entire_world_area = entire_world_area
+        # Notified with the position of any wall that is added or removed, so that the view can re-render that part of
+        # the world
+        self.wall_was_changed = Observable()
 
     def add_wall(self, wall: Wall):
         self.walls.append(wall)
         self._buckets.add_entity(wall.world_entity)
+        self._walls_by_position.setdefault(wall.world_entity.get_position(), []).append(wall)
+        self.wall_was_changed.notify(wall.world_entity.get_position())
 
     def remove_wall(self, wall: Wall):
         self.walls.remove(wall)
         self._buckets.remove_entity(wall.world_entity)
+        position = wall.world_entity.get_position()
+        walls_at_position = self._walls_by_position[position]
+        walls_at_position.remove(wall)
+        if not walls_at_position:
+            del self._walls_by_position[position]
+        self.wall_was_changed.notify(position)
 
     def remove_all_from_position(self, position: Tuple[int, int]):
         for wall in self.get_walls_at_position(position):
             self.remove_wall(wall)
 
     def clear(self):
+        removed_walls = list(self.walls)
         self.walls.clear()
         self._buckets = Buckets([], self._entire_world_area)
+        self._walls_by_position.clear()
+        for wall in removed_walls:
+            self.wall_was_changed.notify(wall.world_entity.get_position())
 
-    # TODO Use _entities_collide?
     def does_entity_intersect_with_wall(self, entity: WorldEntity):
         nearby_walls = self.get_walls_close_to_position(entity.get_position())
         return any([w for w in nearby_walls if boxes_intersect(w.rect(), entity.rect())])
 
-    # TODO Use _entities_collide?
     def does_rect_intersect_with_wall(self, rect: Rect):
         nearby_walls = self.get_walls_close_to_position((rect[0], rect[1]))
         return any([w for w in nearby_walls if rects_intersect(w.rect(), rect)])
@@ -933,38 +1219,59 @@ class WallsState:
     def get_walls_in_camera(self, camera_world_area: Rect) -> List[WorldEntity]:
         return self._buckets.get_entitites_close_to_world_area(camera_world_area)
 
+    # Includes all walls that could intersect with the area (as well as some that don't)
+    def get_walls_close_to_area(self, world_area: Rect) -> List[WorldEntity]:
+        return self._buckets.get_entitites_close_to_world_area(world_area)
+
     def get_walls_at_position(self, position: Tuple[int, int]) -> List[Wall]:
-        return [w for w in self.walls if w.world_entity.get_position() == position]
+        return list(self._walls_by_position.get(position, []))
 
 
 class DecorationsState:
     def __init__(self, decoration_entities: List[DecorationEntity], entire_world_area: Rect):
         self.decoration_entities: List[DecorationEntity] = decoration_entities
         self._buckets = Buckets(decoration_entities, entire_world_area)
+        self._decorations_by_position: Dict[Tuple[int, int], List[DecorationEntity]] = {}
+        for decoration in decoration_entities:
+            self._decorations_by_position.setdefault(decoration.get_position(), []).append(decoration)
         self._entire_world_area = entire_world_area
+        # Notified with the position of any decoration that is added or removed (see WallsState)
+        self.decoration_was_changed = Observable()
 
     def clear(self):
+        removed_decorations = list(self.decoration_entities)
         self.decoration_entities.clear()
         self._buckets = Buckets([], self._entire_world_area)
+        self._decorations_by_position.clear()
+        for decoration in removed_decorations:
+            self.decoration_was_changed.notify(decoration.get_position())
 
     def add_decoration(self, decoration: DecorationEntity):
         self.decoration_entities.append(decoration)
         self._buckets.add_entity(decoration)
+        self._decorations_by_position.setdefault(decoration.get_position(), []).append(decoration)
+        self.decoration_was_changed.notify(decoration.get_position())
 
     def remove_decoration(self, decoration: DecorationEntity):
         self.decoration_entities.remove(decoration)
         self._buckets.remove_entity(decoration)
+        position = decoration.get_position()
+        decorations_at_position = self._decorations_by_position[position]
+        decorations_at_position.remove(decoration)
+        if not decorations_at_position:
+            del self._decorations_by_position[position]
+        self.decoration_was_changed.notify(position)
 
     def get_decorations_in_camera(self, camera_world_area: Rect) -> List[DecorationEntity]:
         return self._buckets.get_entitites_close_to_world_area(camera_world_area)
 
     def get_decorations_at_position(self, position: Tuple[int, int]) -> List[DecorationEntity]:
-        return [d for d in self.decoration_entities if d.get_position() == position]
+        return list(self._decorations_by_position.get(position, []))
 
 
 # This class provides a way to store entities based on their location in the world,
 # which improves performance mainly for collision checking and rendering
-# NOTE: it should only be used for immovable objects (such as walls and floor tiles)
+# NOTE: it should only be used for immovable objects (such as walls and floor tiles). See SpatialHash for moving ones.
 class Buckets:
     _BUCKET_WIDTH = 100
     _BUCKET_HEIGHT = 100
@@ -1011,3 +1318,98 @@ class Buckets:
         x_bucket = int(world_position[0] - self.entire_world_area.x) // Buckets._BUCKET_WIDTH
         y_bucket = int(world_position[1] - self.entire_world_area.y) // Buckets._BUCKET_HEIGHT
         return x_bucket, y_bucket
+
+
+# Unlike Buckets, this class is meant for entities that move around (NPCs, the player, projectiles) and for
+# interactable objects that block movement. An entity is stored in every cell that its collision rect overlaps, and
+# it's moved between cells whenever its position changes (see WorldEntity.set_position). That way, collision checks
+# only need to look at entities that are close by, rather than at every entity in the world.
+class SpatialHash:
+    _CELL_SIZE = 100
+
+    def __init__(self, entities: List[WorldEntity]):
+        self._cells: Dict[Tuple[int, int], List[WorldEntity]] = {}
+        self._cell_ranges_by_entity: Dict[WorldEntity, Tuple[int, int, int, int]] = {}
+        for entity in entities:
+            self.add_entity(entity)
+
+    def __len__(self):
+        return len(self._cell_ranges_by_entity)
+
+    def __contains__(self, entity: WorldEntity):
+        return entity in self._cell_ranges_by_entity
+
+    def add_entity(self, entity: WorldEntity):
+        if entity in self._cell_ranges_by_entity:
+            return
+        cell_range = self._cell_range_for_rect(entity.pygame_collision_rect)
+        self._cell_ranges_by_entity[entity] = cell_range
+        self._add_to_cells(entity, cell_range)
+        entity.spatial_hash = self
+
+    def remove_entity(self, entity: WorldEntity):
+        cell_range = self._cell_ranges_by_entity.pop(entity, None)
+        if cell_range is None:
+            return
+        self._remove_from_cells(entity, cell_range)
+        if entity.spatial_hash is self:
+            entity.spatial_hash = None
+
+    def update_entity(self, entity: WorldEntity):
+        old_cell_range = self._cell_ranges_by_entity.get(entity)
+        if old_cell_range is None:
+            return
+        new_cell_range = self._cell_range_for_rect(entity.pygame_collision_rect)
+        # Optimization: most movement happens within a cell, in which case there's nothing to do
+        if new_cell_range != old_cell_range:
+            self._remove_from_cells(entity, old_cell_range)
+            self._add_to_cells(entity, new_cell_range)
+            self._cell_ranges_by_entity[entity] = new_cell_range
+
+    def clear(self):
+        for entity in self._cell_ranges_by_entity:
+            if entity.spatial_hash is self:
+                entity.spatial_hash = None
+        self._cells.clear()
+        self._cell_ranges_by_entity.clear()
+
+    def get_entities_intersecting_rect(self, rect: Rect) -> List[WorldEntity]:
+        x0, y0, x1, y1 = self._cell_range_for_rect(rect)
+        if x0 == x1 and y0 == y1:
+            return [e for e in self._cells.get((x0, y0), ()) if e.pygame_collision_rect.colliderect(rect)]
+        entities = []
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                for entity in self._cells.get((x, y), ()):
+                    # An entity that spans several cells is only included from the first of those that we look in
+                    cell_range = self._cell_ranges_by_entity[entity]
+                    if max(x0, cell_range[0]) == x and max(y0, cell_range[1]) == y \
+                            and entity.pygame_collision_rect.colliderect(rect):
+                        entities.append(entity)
+        return entities
+
+    def _add_to_cells(self, entity: WorldEntity, cell_range: Tuple[int, int, int, int]):
+        for x in range(cell_range[0], cell_range[2] + 1):
+            for y in range(cell_range[1], cell_range[3] + 1):
+                cell = (x, y)
+                if cell in self._cells:
+                    self._cells[cell].append(entity)
+                else:
+                    self._cells[cell] = [entity]
+
+    def _remove_from_cells(self, entity: WorldEntity, cell_range: Tuple[int, int, int, int]):
+        for x in range(cell_range[0], cell_range[2] + 1):
+            for y in range(cell_range[1], cell_range[3] + 1):
+                cell = (x, y)
+                entities_in_cell = self._cells[cell]
+                entities_in_cell.remove(entity)
+                if not entities_in_cell:
+                    del self._cells[cell]
+
+    @staticmethod
+    def _cell_range_for_rect(rect: Rect) -> Tuple[int, int, int, int]:
+        x0 = rect.x // SpatialHash._CELL_SIZE
+        y0 = rect.y // SpatialHash._CELL_SIZE
+        x1 = max(x0, (rect.x + rect.w - 1) // SpatialHash._CELL_SIZE)
+        y1 = max(y0, (rect.y + rect.h - 1) // SpatialHash._CELL_SIZE)
+        return x0, y0, x1, y1
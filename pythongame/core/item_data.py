@@ -263,8 +263,10 @@ def register_item_level(item_type: ItemType, item_level: int):
     _item_levels[item_type] = item_level
 
 
+# The items are sorted, as the order of a set of enums varies between runs (string hashing is randomized). Otherwise,
+# picking a random item from the list wouldn't be reproducible from the random seed.
 def get_items_with_level(item_level: int) -> List[ItemType]:
-    return list(_item_types_grouped_by_level.get(item_level, set()))
+    return sorted(_item_types_grouped_by_level.get(item_level, set()), key=lambda item_type: item_type.value)
 
 
 def get_items_within_levels(min_level: int, max_level: int) -> List[ItemType]:
@@ -1,10 +1,12 @@
-from typing import Dict
+from typing import Dict, Type
 
 from pythongame.core.common import *
 from pythongame.core.game_state import GameState, Event
 
 
 class AbstractItemEffect:
+    # The types of events that item_handle_event() is called with (see EventSubscriptions)
+    handled_events: Tuple[Type[Event], ...] = ()
 
     def apply_start_effect(self, game_state: GameState):
         pass
@@ -22,6 +24,7 @@ class AbstractItemEffect:
 class CompositeItemEffect(AbstractItemEffect):
     def __init__(self, effects: List[AbstractItemEffect]):
         self.effects = effects
+        self.handled_events = tuple(dict.fromkeys(t for e in effects for t in e.handled_events))
 
     def apply_start_effect(self, game_state: GameState):
         for e in self.effects:
@@ -1,5 +1,6 @@
+import math
 import random
-from typing import Tuple, List
+from typing import Tuple, List, Optional
 
 from pygame.rect import Rect
 
@@ -29,6 +30,49 @@ def rects_intersect(r1: Rect, r2: Rect):
     return r1.colliderect(r2)
 
 
+# Swept AABB collision ("continuous" collision detection): if rect is moved by the given amount, how far along the
+# movement (between 0 and 1) does it first touch the obstacle? Returns None if it doesn't hit the obstacle at all, and
+# 0 if it's already overlapping it. Just like for Rect.colliderect, rects that only share an edge don't collide.
+def get_time_of_impact(rect: Rect, movement: Tuple[float, float], obstacle: Rect) -> Optional[float]:
+    dx, dy = movement
+    if dx > 0:
+        x_entry = (obstacle.left - rect.right) / dx
+        x_exit = (obstacle.right - rect.left) / dx
+    elif dx < 0:
+        x_entry = (obstacle.right - rect.left) / dx
+        x_exit = (obstacle.left - rect.right) / dx
+    elif rect.right <= obstacle.left or rect.left >= obstacle.right:
+        return None
+    else:
+        x_entry = float("-inf")
+        x_exit = float("inf")
+    if dy > 0:
+        y_entry = (obstacle.top - rect.bottom) / dy
+        y_exit = (obstacle.bottom - rect.top) / dy
+    elif dy < 0:
+        y_entry = (obstacle.bottom - rect.top) / dy
+        y_exit = (obstacle.top - rect.bottom) / dy
+    elif rect.bottom <= obstacle.top or rect.top >= obstacle.bottom:
+        return None
+    else:
+        y_entry = float("-inf")
+        y_exit = float("inf")
+    entry_time = max(x_entry, y_entry)
+    exit_time = min(x_exit, y_exit)
+    if entry_time >= exit_time or entry_time >= 1 or exit_time <= 0:
+        return None
+    return max(0.0, entry_time)
+
+
+# The area that rect passes through when it's moved by the given amount
+def get_swept_rect(rect: Rect, movement: Tuple[float, float]) -> Rect:
+    x0 = math.floor(min(rect.x, rect.x + movement[0]))
+    y0 = math.floor(min(rect.y, rect.y + movement[1]))
+    x1 = math.ceil(max(rect.right, rect.right + movement[0]))
+    y1 = math.ceil(max(rect.bottom, rect.bottom + movement[1]))
+    return Rect(x0, y0, x1 - x0, y1 - y0)
+
+
 def random_direction():
     return random.choice([Direction.LEFT, Direction.RIGHT, Direction.UP, Direction.DOWN])
 
@@ -47,7 +47,7 @@ class MeleeEnemyNpcMind(AbstractNpcMind):
         self._time_since_attack = self._attack_interval
         self._update_path_interval = update_path_interval
         self._time_since_updated_path = self._update_path_interval
-        self.pathfinder = NpcPathfinder(global_path_finder)
+        self.pathfinder = NpcPathfinder(global_path_finder, use_flow_field=True)
         self.next_waypoint = None
         self._reevaluate_next_waypoint_direction_interval = 1000
         self._time_since_reevaluated = self._reevaluate_next_waypoint_direction_interval
@@ -133,7 +133,7 @@ class EnemySummonTrait(EnemyTrait):
             necro_center_pos = npc.world_entity.get_center_position()
             self._time_since_summoning = 0
             self._alive_summons = [summon for summon in self._alive_summons
-                                   if summon in game_state.game_world.non_player_characters]
+                                   if game_state.game_world.contains_non_player_character(summon)]
             if len(self._alive_summons) < self._max_summons:
                 relative_pos_from_summoner = (random.randint(-150, 150), random.randint(-150, 150))
                 summon_center_pos = sum_of_vectors(necro_center_pos, relative_pos_from_summoner)
@@ -208,7 +208,7 @@ class EnemyShootProjectileTrait(EnemyTrait):
                 get_position_from_center_position(center_position, self._projectile_size),
                 npc.world_entity.direction, distance_from_enemy)
             projectile = self._create_projectile(projectile_pos, npc.world_entity.direction)
-            game_state.game_world.projectile_entities.append(projectile)
+            game_state.game_world.add_projectile(projectile)
             play_sound(self._sound_id)
 
     def _update_attack_interval(self):
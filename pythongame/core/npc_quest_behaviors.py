@@ -73,7 +73,7 @@ class CompleteQuestNpcAction(AbstractNpcAction):
 
 
 def _quest_on_hover(game_state: GameState, ui_view: GameUiView, boss_npc_type: NpcType, quest_item_id: ItemId):
-    bosses = [npc for npc in game_state.game_world.non_player_characters if npc.npc_type == boss_npc_type]
+    bosses = [npc for npc in game_state.game_world.bosses if npc.npc_type == boss_npc_type]
     if bosses:
         position = bosses[0].world_entity.get_center_position()
         world_area = game_state.game_world.entire_world_area
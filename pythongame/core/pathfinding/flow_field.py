@@ -0,0 +1,74 @@
+from collections import deque
+from typing import Tuple, List, Optional
+
+from pythongame.core.pathfinding.wall_grid import WallGrid
+
+_UNREACHABLE = -1
+
+
+# A "Dijkstra map" that is computed once from a target, and can then be used by any number of agents to find their
+# way towards that target. Every cell within a square region around the target stores the number of steps that an
+# agent (of a given size) needs to take to reach the target. An agent finds its path by repeatedly stepping to
+# a neighbouring cell that is closer to the target.
+class FlowField:
+
+    def __init__(self, grid: WallGrid, agent_size: Tuple[int, int], target_cells: List[Tuple[int, int]],
+                 radius: int):
+        # The first target cell is the "real" one. The others are fallbacks that are used (in order) in case an agent
+        # of this size doesn't fit at the target (for instance if the target is standing right next to a wall).
+        center = target_cells[0]
+        self.min_x = center[0] - radius
+        self.min_y = center[1] - radius
+        self.max_x = center[0] + radius
+        self.max_y = center[1] + radius
+        self._side = 2 * radius + 1
+        self._distances: List[int] = [_UNREACHABLE] * (self._side * self._side)
+        self._compute(grid, agent_size, target_cells)
+
+    def _compute(self, grid: WallGrid, agent_size: Tuple[int, int], target_cells: List[Tuple[int, int]]):
+        w, h = agent_size
+        queue = deque()
+        for cell in target_cells:
+            if self._is_within_bounds(cell) and grid.is_area_free(cell[0], cell[1], w, h):
+                self._distances[self._index(cell)] = 0
+                queue.append(cell)
+                break
+        while queue:
+            cell = queue.popleft()
+            next_distance = self._distances[self._index(cell)] + 1
+            x, y = cell
+            for neighbor in ((x, y - 1), (x - 1, y), (x + 1, y), (x, y + 1)):
+                if not self._is_within_bounds(neighbor):
+                    continue
+                i = self._index(neighbor)
+                if self._distances[i] == _UNREACHABLE and grid.is_area_free(neighbor[0], neighbor[1], w, h):
+                    self._distances[i] = next_distance
+                    queue.append(neighbor)
+
+    def get_distance(self, cell: Tuple[int, int]) -> Optional[int]:
+        if not self._is_within_bounds(cell):
+            return None
+        distance = self._distances[self._index(cell)]
+        return distance if distance != _UNREACHABLE else None
+
+    # Returns the cells from the given cell to the target (both included), in the same format as GlobalPathFinder.run
+    def get_path_from(self, cell: Tuple[int, int]) -> Optional[List[Tuple[int, int]]]:
+        distance = self.get_distance(cell)
+        if distance is None:
+            return None
+        path = [cell]
+        while distance > 0:
+            x, y = cell
+            for neighbor in ((x, y - 1), (x - 1, y), (x + 1, y), (x, y + 1)):
+                if self.get_distance(neighbor) == distance - 1:
+                    cell = neighbor
+                    break
+            distance -= 1
+            path.append(cell)
+        return path
+
+    def _is_within_bounds(self, cell: Tuple[int, int]) -> bool:
+        return self.min_x <= cell[0] <= self.max_x and self.min_y <= cell[1] <= self.max_y
+
+    def _index(self, cell: Tuple[int, int]) -> int:
+        return (cell[0] - self.min_x) * self._side + cell[1] - self.min_y
@@ -1,19 +1,24 @@
-from typing import Tuple, Dict, List, Any, Optional
+from array import array
+from collections import OrderedDict
+from heapq import heappush, heappop
+from typing import Tuple, Dict, List, Any, Optional, Callable, Set
 
-from pythongame.core.pathfinding.astar import AStar
+from pythongame.core.pathfinding.flow_field import FlowField
+from pythongame.core.pathfinding.wall_grid import WallGrid
 
 
-class GridBasedAStar(AStar):
+# A* search on the wall grid, specialized for 4-connected grids with unit step costs. All per-cell search state is
+# kept in flat arrays that cover the pathfinding bounds, and is reused between searches: instead of clearing the
+# arrays, every search gets a new "generation" number, and a cell's state is only valid if its generation matches.
+# The open set is a binary heap of plain ints, that each pack a cell's f-score, g-score and index.
+class GridBasedAStar:
 
-    def __init__(self, grid, agent_size: Tuple[int, int]):
-        # Grid is a 2d vector with 1s or 0s.
-        # 1 == cell is blocked
-        # 0 == cell is free
+    def __init__(self, grid: WallGrid, agent_size: Tuple[int, int]):
         # We can create the grid based on wall positions
         # Wall size is (50, 50) and all walls are placed on the (50, 50) grid
         self.grid = grid
         self.agent_size = agent_size
-        self._cache_is_cell_free: Dict[Tuple[int, int], bool] = {}
+        self.num_expanded_nodes = 0  # Keeps increasing. Used for measuring how much work the searches have done
 
         # Need to be initialized before running pathfinder
         self.min_x = 0
@@ -21,70 +26,220 @@ class GridBasedAStar(AStar):
         self.max_x = 0
         self.max_y = 0
 
+        self._generation = 0
+        self._visited_generation = array('L')
+        self._closed_generation = array('L')
+        self._g_scores = array('l')
+        self._parents = array('l')
+
     def set_pathfinding_bounds(self, min_x, min_y, max_x, max_y):
         self.min_x = min_x
         self.min_y = min_y
         self.max_x = max_x
         self.max_y = max_y
 
-    def heuristic_cost_estimate(self, current, goal):
-        return abs(current[0] - goal[0]) + abs(current[1] - goal[1])
+    def astar(self, start: Tuple[int, int], goal: Tuple[int, int]) -> Optional[List[Tuple[int, int]]]:
+        if start == goal:
+            return [start]
+        # Ignore cells that are too far out, to save resources. If agent strays too far, the path is aborted.
+        min_x = self.min_x
+        min_y = self.min_y
+        width = self.max_x - min_x + 1
+        height = self.max_y - min_y + 1
+        if not self._is_cell_free(goal[0], goal[1]):
+            # The goal can never be reached, so there's no point in searching through all the reachable cells
+            return None
+        num_cells = width * height
+        if len(self._g_scores) < num_cells:
+            self._allocate_search_state(num_cells)
+        self._generation += 1
+        generation = self._generation
+        visited_generation = self._visited_generation
+        closed_generation = self._closed_generation
+        g_scores = self._g_scores
+        parents = self._parents
+        is_cell_free = self._is_cell_free
 
-    def distance_between(self, n1, n2):
-        return 1
+        # Heap entries are packed as ((f * max_g) + (max_g - 1 - g)) * num_cells + index. When f-scores are equal,
+        # cells with a higher g-score (i.e. cells that are closer to the goal) are expanded first.
+        max_g = num_cells + 1
+        goal_x = goal[0] - min_x
+        goal_y = goal[1] - min_y
+        goal_index = goal_x * height + goal_y
+        start_x = start[0] - min_x
+        start_y = start[1] - min_y
+        start_index = start_x * height + start_y
+        visited_generation[start_index] = generation
+        g_scores[start_index] = 0
+        parents[start_index] = -1
+        start_f = abs(start_x - goal_x) + abs(start_y - goal_y)
+        open_set = [(start_f * max_g + max_g - 1) * num_cells + start_index]
+        num_expanded_nodes = 0
+        while open_set:
+            index = heappop(open_set) % num_cells
+            if closed_generation[index] == generation:
+                continue
+            if index == goal_index:
+                self.num_expanded_nodes += num_expanded_nodes
+                return self._reconstruct_path(index, height)
+            closed_generation[index] = generation
+            num_expanded_nodes += 1
+            x, y = divmod(index, height)
+            neighbor_g = g_scores[index] + 1
+            for neighbor_x, neighbor_y, neighbor_index in (
+                    (x, y - 1, index - 1),  # up
+                    (x - 1, y, index - height),  # left
+                    (x + 1, y, index + height),  # right
+                    (x, y + 1, index + 1)):  # down
+                if neighbor_x < 0 or neighbor_y < 0 or neighbor_x >= width or neighbor_y >= height:
+                    continue
+                if visited_generation[neighbor_index] == generation:
+                    if closed_generation[neighbor_index] == generation or neighbor_g >= g_scores[neighbor_index]:
+                        continue
+                elif not is_cell_free(neighbor_x + min_x, neighbor_y + min_y):
+                    continue
+                visited_generation[neighbor_index] = generation
+                g_scores[neighbor_index] = neighbor_g
+                parents[neighbor_index] = index
+                neighbor_f = neighbor_g + abs(neighbor_x - goal_x) + abs(neighbor_y - goal_y)
+                heappush(open_set, (neighbor_f * max_g + max_g - 1 - neighbor_g) * num_cells + neighbor_index)
+        self.num_expanded_nodes += num_expanded_nodes
+        return None
 
-    def neighbors(self, node):
-        x, y = node
-        adjacent_cells = [
-            (x, y - 1),  # up
-            (x - 1, y),  # left
-            (x + 1, y),  # right
-            (x, y + 1),  # down
-        ]
-        return [cell for cell in adjacent_cells if self._is_cell_free(cell[0], cell[1])]
+    def _reconstruct_path(self, index: int, height: int) -> List[Tuple[int, int]]:
+        path = []
+        while index != -1:
+            x, y = divmod(index, height)
+            path.append((x + self.min_x, y + self.min_y))
+            index = self._parents[index]
+        path.reverse()
+        return path
+
+    def _allocate_search_state(self, num_cells: int):
+        # The generation counter starts over, since all the old state is discarded
+        self._generation = 0
+        self._visited_generation = array('L', bytes(num_cells * array('L').itemsize))
+        self._closed_generation = array('L', bytes(num_cells * array('L').itemsize))
+        self._g_scores = array('l', bytes(num_cells * array('l').itemsize))
+        self._parents = array('l', bytes(num_cells * array('l').itemsize))
 
     def _is_cell_free(self, x, y):
         # Ignore cells that are too far out, to save resources. If agent strays too far, the path is aborted.
         if not (self.min_x <= x <= self.max_x and self.min_y <= y <= self.max_y):
             return False
+        return self.grid.is_area_free(x, y, self.agent_size[0], self.agent_size[1])
 
-        if (x, y) in self._cache_is_cell_free:
-            return self._cache_is_cell_free[(x, y)]
-        else:
-            is_free = self._compute_is_cell_free(x, y)
-            self._cache_is_cell_free[(x, y)] = is_free
-            return is_free
 
-    def _compute_is_cell_free(self, x, y):
-        # Check that all relevant cells are within the map
-        if x < 0 or y < 0 or x + self.agent_size[0] >= len(self.grid) or y + self.agent_size[1] >= len(self.grid[x]):
-            return False
-        for _x in range(x, x + self.agent_size[0]):
-            for _y in range(y, y + self.agent_size[1]):
-                # Check if there is a wall at cell: if so, it's not free
-                if self.grid[_x][_y] == 1:
-                    return False
-        return True
+PathRequestKey = Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]  # (entity size, start cell, goal cell)
+PathCallback = Callable[[Optional[List[Tuple[int, int]]]], Any]
 
 
 # One instance of this class is shared by all enemies. This should allow for better caching of computations
 class GlobalPathFinder:
+    # Agents don't look for paths further away than this (in cells, in any direction) from where they are
+    PATH_MAX_DISTANCE_FROM_START = 20
+    # Searches are queued up and run in batches, so that a lot of enemies requesting paths at the same time doesn't
+    # cause a spike in frame time. Any requests that don't fit within this budget are handled in later frames.
+    MAX_EXPANDED_NODES_PER_FRAME = 2500
+    # Flow fields cover this many cells in every direction from the target. Agents that are further away than this
+    # (they are typically far outside of the camera) need to use regular A* searches instead.
+    FLOW_FIELD_RADIUS = 30
+    # Enough to cover the player and a couple of summons, for a few different agent sizes
+    MAX_CACHED_FLOW_FIELDS = 12
+    # Paths are short (a few dozen cells) so we can afford to keep a lot of them. Most entries become useless as soon
+    # as the target moves, and are evicted over time.
+    MAX_CACHED_PATHS = 500
+
     def __init__(self):
-        self.grid = None  # grid must be set before you can use the pathfinder
+        self.grid: WallGrid = None  # grid must be set before you can use the pathfinder
         self.astars_by_entity_size: Dict[Tuple[int, int], GridBasedAStar] = {}
+        # Insertion-ordered, so that the oldest requests are handled first
+        self._queued_requests: Dict[PathRequestKey, List[PathCallback]] = {}
+        self._flow_fields: Dict[Tuple[Tuple[int, int], Tuple[int, int]], FlowField] = OrderedDict()
+        # Results of earlier searches, including failed ones, in least-recently-used order
+        self._cached_paths: Dict[PathRequestKey, Optional[List[Tuple[int, int]]]] = OrderedDict()
+        # For each (entity size, goal cell): the start cells of the cached paths that lead all the way to the goal. Any
+        # cell along such a path can reuse the rest of the path, instead of running a new search.
+        self._cached_path_starts_by_goal: Dict[Tuple[Tuple[int, int], Tuple[int, int]], Set[Tuple[int, int]]] = {}
+        self._cached_grid_version = None
 
-    def set_grid(self, grid):
+    def set_grid(self, grid: WallGrid):
         self.grid = grid
+        for astar in self.astars_by_entity_size.values():
+            astar.grid = grid
+        self.invalidate_cache()
+
+    # Must be called if the grid is modified in a way that's not tracked by its version (i.e. not through set_wall)
+    def invalidate_cache(self):
+        self._cached_paths.clear()
+        self._cached_path_starts_by_goal.clear()
+        self._flow_fields.clear()
+        self._cached_grid_version = self.grid.version if self.grid else None
 
     def register_entity_size(self, size: Tuple[int, int]):
         if not size in self.astars_by_entity_size:
             self.astars_by_entity_size[size] = GridBasedAStar(self.grid, size)
 
+    def request_path(self, entity_size: Tuple[int, int], start_cell: Tuple[int, int], goal_cell: Tuple[int, int],
+                     callback: PathCallback):
+        # Identical requests (typically from a group of enemies of the same kind) share a single search
+        key = (entity_size, start_cell, goal_cell)
+        if key in self._queued_requests:
+            self._queued_requests[key].append(callback)
+        else:
+            self._queued_requests[key] = [callback]
+
+    def has_queued_requests(self) -> bool:
+        return len(self._queued_requests) > 0
+
+    def run_queued_requests(self):
+        num_expanded_nodes = 0
+        # At least one request is handled every frame, regardless of how expensive it is
+        while self._queued_requests and num_expanded_nodes < GlobalPathFinder.MAX_EXPANDED_NODES_PER_FRAME:
+            key = next(iter(self._queued_requests))
+            callbacks = self._queued_requests.pop(key)
+            entity_size, start_cell, goal_cell = key
+            astar = self.astars_by_entity_size[entity_size]
+            num_expanded_nodes_before = astar.num_expanded_nodes
+            path = self.run(entity_size, start_cell, goal_cell)
+            num_expanded_nodes += astar.num_expanded_nodes - num_expanded_nodes_before
+            for callback in callbacks:
+                callback(path)
+
+    # All agents of the same size that are heading for the same target share one flow field. It's only recomputed when
+    # the target moves to a new cell.
+    def get_flow_field(self, entity_size: Tuple[int, int], target_cell: Tuple[int, int]) -> FlowField:
+        self._invalidate_cache_if_grid_changed()
+        key = (entity_size, target_cell)
+        if key in self._flow_fields:
+            self._flow_fields.move_to_end(key)
+            return self._flow_fields[key]
+        target_cells = [target_cell] + _get_fallback_goal_cells(target_cell)
+        flow_field = FlowField(self.grid, entity_size, target_cells, GlobalPathFinder.FLOW_FIELD_RADIUS)
+        self._flow_fields[key] = flow_field
+        if len(self._flow_fields) > GlobalPathFinder.MAX_CACHED_FLOW_FIELDS:
+            self._flow_fields.popitem(last=False)
+        return flow_field
+
     def run(self, entity_size: Tuple[int, int], start_cell: Tuple[int, int], goal_cell: Tuple[int, int]) \
-            -> Optional[List[Any]]:
+            -> Optional[List[Tuple[int, int]]]:
+        self._invalidate_cache_if_grid_changed()
+        key = (entity_size, start_cell, goal_cell)
+        if key in self._cached_paths:
+            self._cached_paths.move_to_end(key)
+            path = self._cached_paths[key]
+        else:
+            path = self._get_cached_path_suffix(entity_size, start_cell, goal_cell)
+            if path is None:
+                path = self._search(entity_size, start_cell, goal_cell)
+            self._cache_path(key, path)
+        # Callers are free to modify the returned path, so they must not be handed the cached one
+        return list(path) if path is not None else None
 
+    def _search(self, entity_size: Tuple[int, int], start_cell: Tuple[int, int], goal_cell: Tuple[int, int]) \
+            -> Optional[List[Tuple[int, int]]]:
         astar = self.astars_by_entity_size[entity_size]
-        path_max_distance_from_start = 20
+        path_max_distance_from_start = GlobalPathFinder.PATH_MAX_DISTANCE_FROM_START
         astar.set_pathfinding_bounds(start_cell[0] - path_max_distance_from_start,
                                      start_cell[1] - path_max_distance_from_start,
                                      start_cell[0] + path_max_distance_from_start,
@@ -95,17 +250,55 @@ class GlobalPathFinder:
         # HACK:
         if result is None:
             # print("Couldn't find path. Trying with position right above player instead.")
-            goal_cell_2 = (goal_cell[0], goal_cell[1] - 1)
-            result = astar.astar(start_cell, goal_cell_2)
-            if result is None:
-                goal_cell_3 = (goal_cell[0] - 1, goal_cell[1])
-                result = astar.astar(start_cell, goal_cell_3)
+            for fallback_goal_cell in _get_fallback_goal_cells(goal_cell):
+                result = astar.astar(start_cell, fallback_goal_cell)
+                if result is not None:
+                    break
 
-        if result is None:
+        return result
+
+    # If the start cell lies along a cached path to the same goal, the rest of that path is also a valid path from
+    # the start cell. It isn't necessarily the shortest one (the original search had different bounds) but it's close
+    # enough to be worth skipping a search for.
+    def _get_cached_path_suffix(self, entity_size: Tuple[int, int], start_cell: Tuple[int, int],
+                                goal_cell: Tuple[int, int]) -> Optional[List[Tuple[int, int]]]:
+        path_starts = self._cached_path_starts_by_goal.get((entity_size, goal_cell))
+        if not path_starts:
             return None
+        path_max_distance_from_start = GlobalPathFinder.PATH_MAX_DISTANCE_FROM_START
+        for path_start in path_starts:
+            path = self._cached_paths[(entity_size, path_start, goal_cell)]
+            try:
+                suffix = path[path.index(start_cell):]
+            except ValueError:
+                continue
+            # A regular search from the start cell wouldn't be allowed to use cells that are this far away
+            if all(abs(x - start_cell[0]) <= path_max_distance_from_start
+                   and abs(y - start_cell[1]) <= path_max_distance_from_start for (x, y) in suffix):
+                return suffix
+        return None
+
+    def _cache_path(self, key: PathRequestKey, path: Optional[List[Tuple[int, int]]]):
+        self._cached_paths[key] = path
+        entity_size, start_cell, goal_cell = key
+        # Paths that end up at one of the fallback goals can't be reused by other start cells, since the real goal
+        # might be reachable from them
+        if path is not None and path[-1] == goal_cell:
+            self._cached_path_starts_by_goal.setdefault((entity_size, goal_cell), set()).add(start_cell)
+        if len(self._cached_paths) > GlobalPathFinder.MAX_CACHED_PATHS:
+            (evicted_size, evicted_start, evicted_goal), _ = self._cached_paths.popitem(last=False)
+            path_starts = self._cached_path_starts_by_goal.get((evicted_size, evicted_goal))
+            if path_starts is not None:
+                path_starts.discard(evicted_start)
+                if not path_starts:
+                    del self._cached_path_starts_by_goal[(evicted_size, evicted_goal)]
+
+    def _invalidate_cache_if_grid_changed(self):
+        if self.grid.version != self._cached_grid_version:
+            self.invalidate_cache()
 
-        path_list = []
-        for x in result:
-            path_list.append(x)
 
-        return path_list
+# If the agent doesn't fit at the goal (for instance if the target is standing right next to a wall) we try these
+# neighbouring cells instead
+def _get_fallback_goal_cells(goal_cell: Tuple[int, int]) -> List[Tuple[int, int]]:
+    return [(goal_cell[0], goal_cell[1] - 1), (goal_cell[0] - 1, goal_cell[1])]
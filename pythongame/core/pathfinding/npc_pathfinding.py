@@ -15,10 +15,16 @@ DEBUG_PATHFINDER_INTERVAL = 900
 
 class NpcPathfinder:
 
-    def __init__(self, global_path_finder: GlobalPathFinder):
+    def __init__(self, global_path_finder: GlobalPathFinder, use_flow_field: bool = False):
         self.path: List[Tuple[int, int]] = None  # This is expressed in game world coordinates (can be negative)
         self.global_path_finder: GlobalPathFinder = global_path_finder
+        # With flow fields, agents that chase the same target share the path-finding work. This only makes sense for
+        # agents that chase the player (or the player's summons), since that's where many agents share a target.
+        self._use_flow_field = use_flow_field
+        self._num_path_requests = 0
 
+    # The path is read from a shared flow field if possible. Otherwise it's computed asynchronously by the global path
+    # finder, and until it's ready, the agent keeps following its old path.
     def update_path_towards_target(self, agent_entity: WorldEntity, game_state: GameState, target_entity: WorldEntity):
         agent_cell = _translate_world_position_to_cell(agent_entity.get_position(),
                                                        game_state.game_world.entire_world_area)
@@ -28,7 +34,24 @@ class NpcPathfinder:
         agent_cell_size = (agent_entity.pygame_collision_rect.w // GRID_CELL_WIDTH + 1,
                            agent_entity.pygame_collision_rect.h // GRID_CELL_WIDTH + 1)
         self.global_path_finder.register_entity_size(agent_cell_size)
-        path_with_cells = self.global_path_finder.run(agent_cell_size, agent_cell, target_cell)
+        self._num_path_requests += 1
+        request_number = self._num_path_requests
+
+        if self._use_flow_field:
+            flow_field = self.global_path_finder.get_flow_field(agent_cell_size, target_cell)
+            path_with_cells = flow_field.get_path_from(agent_cell)
+            if path_with_cells is not None:
+                self._set_path(path_with_cells, game_state)
+                return
+
+        def on_path_found(path_with_cells: Optional[List[Tuple[int, int]]]):
+            # A newer request has been made since this one, so its result is outdated
+            if request_number == self._num_path_requests:
+                self._set_path(path_with_cells, game_state)
+
+        self.global_path_finder.request_path(agent_cell_size, agent_cell, target_cell, on_path_found)
+
+    def _set_path(self, path_with_cells: Optional[List[Tuple[int, int]]], game_state: GameState):
         if path_with_cells:
             # Note: Cells are expressed in non-negative values (and need to be translated to game world coordinates)
             path = [_translate_cell_to_world_position(cell, game_state.game_world.entire_world_area) for cell in
@@ -0,0 +1,71 @@
+from typing import Tuple
+
+# Clearance values are stored in single bytes, so larger open areas are capped at this value. Agents are never
+# anywhere near this big (in cells), so the cap doesn't affect any results.
+_MAX_CLEARANCE = 255
+
+
+# A compact representation of which pathfinding cells contain walls. Cells are stored in a flat bytearray, indexed
+# column by column (i.e. the cell (x, y) is at index x * height + y).
+#
+# Alongside the walls, we maintain a "clearance map": for every cell, the size of the largest square that has the
+# cell as its top-left corner and that doesn't contain any walls. That lets us answer "Is there room for an agent
+# of size (w, h) at this cell?" with a single lookup (or a couple of lookups for non-square agents), rather than
+# having to scan all the cells that the agent would cover.
+class WallGrid:
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self._walls = bytearray(width * height)
+        self._clearance = bytearray(width * height)
+        self._is_clearance_up_to_date = False
+        # Increased whenever a wall is added or removed, so that anything derived from the grid (like cached paths) can
+        # tell whether it's outdated
+        self.version = 0
+
+    def set_wall(self, cell: Tuple[int, int], is_wall: bool = True):
+        self._walls[cell[0] * self.height + cell[1]] = 1 if is_wall else 0
+        self._is_clearance_up_to_date = False
+        self.version += 1
+
+    def is_wall(self, cell: Tuple[int, int]) -> bool:
+        return self._walls[cell[0] * self.height + cell[1]] == 1
+
+    def is_area_free(self, x: int, y: int, w: int, h: int) -> bool:
+        if not self._is_clearance_up_to_date:
+            self.update_clearance()
+        if x < 0 or y < 0 or x >= self.width or y >= self.height:
+            return False
+        clearance = self._clearance
+        height = self.height
+        if w == h:
+            return clearance[x * height + y] >= w
+        # Non-square areas are covered exactly by a row (or column) of overlapping squares
+        if w > h:
+            for square_x in range(x, x + w - h, h):
+                if square_x >= self.width or clearance[square_x * height + y] < h:
+                    return False
+            return x + w - h < self.width and clearance[(x + w - h) * height + y] >= h
+        else:
+            for square_y in range(y, y + h - w, w):
+                if square_y >= height or clearance[x * height + square_y] < w:
+                    return False
+            return y + h - w < height and clearance[x * height + y + h - w] >= w
+
+    def update_clearance(self):
+        width = self.width
+        height = self.height
+        walls = self._walls
+        clearance = self._clearance
+        # The last column and row are treated as blocked, so that an area is only considered free if it's fully
+        # contained within the map, with some margin on the right and bottom sides.
+        for x in range(width - 1, -1, -1):
+            column_start = x * height
+            for y in range(height - 1, -1, -1):
+                i = column_start + y
+                if walls[i] or x == width - 1 or y == height - 1:
+                    clearance[i] = 0
+                else:
+                    c = 1 + min(clearance[i + height], clearance[i + 1], clearance[i + height + 1])
+                    clearance[i] = c if c < _MAX_CLEARANCE else _MAX_CLEARANCE
+        self._is_clearance_up_to_date = True
@@ -1,5 +1,6 @@
+from collections import OrderedDict
 from enum import Enum
-from typing import Dict, List, Tuple, Optional, Union
+from typing import Dict, List, Tuple, Optional, Union, Any, Iterable
 
 import pygame
 from pygame.rect import Rect
@@ -7,8 +8,9 @@ from pygame.rect import Rect
 from pythongame.core.common import Direction, Sprite
 from pythongame.core.game_data import ENTITY_SPRITE_INITIALIZERS, CHANNELING_BUFFS
 from pythongame.core.game_state import DecorationEntity, NonPlayerCharacter, BuffWithDuration, \
-    QuestGiverState
-from pythongame.core.view.image_loading import ImageWithRelativePosition
+    QuestGiverState, WallsState, DecorationsState
+from pythongame.core.math import sum_of_vectors
+from pythongame.core.view.image_loading import ImageWithRelativePosition, LazyImagesBySprite
 from pythongame.core.view.render_util import DrawableArea, split_text_into_lines
 from pythongame.core.visual_effects import VisualLine, VisualCircle, VisualRect, VisualText, VisualSprite, VisualCross, \
     VisualParticleSystem
@@ -20,6 +22,17 @@ COLOR_RED = (250, 0, 0)
 RENDER_WORLD_COORDINATES = False
 DIR_FONTS = './resources/fonts/'
 
+# The ground, decorations and walls don't change while the game is running, so instead of rendering them piece by
+# piece every frame, they are pre-rendered onto square "chunk" surfaces that are reused for as long as they're in view.
+# With an 800x430 camera, a frame only needs between 2 and 6 chunks.
+STATIC_LAYER_CHUNK_SIZE = 512
+# Each chunk holds two surfaces (see _get_static_layer_chunk), i.e. 2 MB with 32-bit pixels. This allows for 32 chunks.
+MAX_STATIC_LAYER_MEMORY = 64 * 1024 * 1024
+# When a wall or decoration is added or removed, we need to re-render all chunks that could contain it. Chunks are
+# rendered with all entities that WallsState and DecorationsState consider to be "in camera", which includes entities
+# that are up to two buckets (2 * 100 pixels) outside of the chunk.
+STATIC_ENTITY_MARGIN = 200
+
 
 class EntityActionTextStyle(Enum):
     PLAIN = 1
@@ -41,7 +54,7 @@ class EntityActionText:
 class GameWorldView:
 
     def __init__(self, pygame_screen, camera_size: Tuple[int, int], screen_size: Tuple[int, int],
-                 images_by_sprite: Dict[Sprite, Dict[Direction, List[ImageWithRelativePosition]]]):
+                 images_by_sprite: LazyImagesBySprite):
         pygame.font.init()
         self.screen_render = DrawableArea(pygame_screen)
         self.ui_render = DrawableArea(pygame_screen, self._translate_ui_position_to_screen)
@@ -58,11 +71,20 @@ class GameWorldView:
         self.font_visual_text_large = pygame.font.Font(DIR_FONTS + 'Courier New Bold.ttf', 16)
         self.font_quest_giver_mark = pygame.font.Font(DIR_FONTS + 'Courier New Bold.ttf', 28)
 
-        self.images_by_sprite: Dict[Sprite, Dict[Direction, List[ImageWithRelativePosition]]] = images_by_sprite
+        self.images_by_sprite: LazyImagesBySprite = images_by_sprite
 
         # This is updated every time the view is called
         self.camera_world_area = None
 
+        # Pre-rendered parts of the static layer, by world position, in least-recently-used order
+        self._static_layer_chunks: Dict[Tuple[int, int], Tuple[Any, Any]] = OrderedDict()
+        self._static_layer_memory = 0
+        self._static_layer_source = None
+        self._walls_state: WallsState = None
+        self._decorations_state: DecorationsState = None
+        self._entire_world_area: Rect = None
+        self._wall_image_rects: Dict[WorldEntity, Rect] = {}
+
     # ------------------------------------
     #         TRANSLATING COORDINATES
     # ------------------------------------
@@ -90,43 +112,135 @@ class GameWorldView:
     #       DRAWING THE GAME WORLD
     # ------------------------------------
 
-    def _world_ground(self, entire_world_area: Rect):
+    # Loads the images that are known to be needed ahead of time, so that they don't need to be loaded in the middle of
+    # the game. Any other images are loaded when they're first rendered.
+    def preload_sprites(self, sprites: Iterable[Sprite]):
+        self.images_by_sprite.preload(sprites)
+
+    # Renders the static layer around the camera ahead of time, so that it doesn't need to be done during the first
+    # frames in a new world (which would cause a noticeable stutter)
+    def prepare_static_layer(self, walls_state: WallsState, decorations_state: DecorationsState,
+                             entire_world_area: Rect, camera_world_area: Rect):
+        self._update_static_layer_source(walls_state, decorations_state, entire_world_area)
+        chunk_size = STATIC_LAYER_CHUNK_SIZE
+        area = camera_world_area.inflate(chunk_size, chunk_size)
+        for chunk_x in range(area.x // chunk_size, (area.right - 1) // chunk_size + 1):
+            for chunk_y in range(area.y // chunk_size, (area.bottom - 1) // chunk_size + 1):
+                self._get_static_layer_chunk(Rect(chunk_x * chunk_size, chunk_y * chunk_size, chunk_size, chunk_size))
+
+    def _update_static_layer_source(self, walls_state: WallsState, decorations_state: DecorationsState,
+                                    entire_world_area: Rect):
+        static_layer_source = (walls_state, decorations_state, tuple(entire_world_area))
+        if static_layer_source == self._static_layer_source:
+            return
+        self._clear_static_layer()
+        # The previous world may be returned to later (like when leaving a dungeon), so the view must stop observing it
+        if walls_state is not self._walls_state:
+            if self._walls_state is not None:
+                self._walls_state.wall_was_changed.unregister_observer(self._on_static_entity_changed)
+            walls_state.wall_was_changed.register_observer(self._on_static_entity_changed)
+        if decorations_state is not self._decorations_state:
+            if self._decorations_state is not None:
+                self._decorations_state.decoration_was_changed.unregister_observer(self._on_static_entity_changed)
+            decorations_state.decoration_was_changed.register_observer(self._on_static_entity_changed)
+        self._static_layer_source = static_layer_source
+        self._walls_state = walls_state
+        self._decorations_state = decorations_state
+        self._entire_world_area = entire_world_area
+
+    def _on_static_entity_changed(self, position: Tuple[int, int]):
+        self._wall_image_rects.clear()
+        affected_area = Rect(position[0] - STATIC_ENTITY_MARGIN, position[1] - STATIC_ENTITY_MARGIN,
+                             2 * STATIC_ENTITY_MARGIN + 1, 2 * STATIC_ENTITY_MARGIN + 1)
+        chunk_size = STATIC_LAYER_CHUNK_SIZE
+        for key in [k for k in self._static_layer_chunks
+                    if affected_area.colliderect(Rect(k[0], k[1], chunk_size, chunk_size))]:
+            self._remove_static_layer_chunk(key)
+
+    def _clear_static_layer(self):
+        self._static_layer_chunks.clear()
+        self._static_layer_memory = 0
+        self._wall_image_rects.clear()
+
+    # Renders the part of the static layer that's within the given world area
+    def _static_layer(self, world_area: Rect, include_walls: bool):
+        chunk_size = STATIC_LAYER_CHUNK_SIZE
+        for chunk_x in range(world_area.x // chunk_size, (world_area.right - 1) // chunk_size + 1):
+            for chunk_y in range(world_area.y // chunk_size, (world_area.bottom - 1) // chunk_size + 1):
+                chunk_world_area = Rect(chunk_x * chunk_size, chunk_y * chunk_size, chunk_size, chunk_size)
+                ground, ground_and_walls = self._get_static_layer_chunk(chunk_world_area)
+                visible_world_area = chunk_world_area.clip(world_area)
+                area_within_chunk = visible_world_area.move(-chunk_world_area.x, -chunk_world_area.y)
+                self.screen_render.screen.blit(ground_and_walls if include_walls else ground,
+                                               self._translate_world_position_to_screen(visible_world_area.topleft),
+                                               area_within_chunk)
+
+    def _get_static_layer_chunk(self, chunk_world_area: Rect) -> Tuple[Any, Any]:
+        key = chunk_world_area.topleft
+        if key in self._static_layer_chunks:
+            self._static_layer_chunks.move_to_end(key)
+            return self._static_layer_chunks[key]
+
+        # Using the same pixel format as the screen makes blitting the chunk much faster
+        ground = pygame.Surface(chunk_world_area.size, 0, self.screen_render.screen)
+        ground_render = DrawableArea(ground, lambda pos: (pos[0] - chunk_world_area.x, pos[1] - chunk_world_area.y))
+        ground_render.fill(COLOR_BACKGROUND)
+        self._world_ground(ground_render, chunk_world_area, self._entire_world_area)
+        for decoration_entity in self._decorations_state.get_decorations_in_camera(chunk_world_area):
+            self._world_entity(decoration_entity, ground_render)
+
+        ground_and_walls = ground.copy()
+        walls_render = DrawableArea(ground_and_walls, ground_render.translate_coordinates)
+        walls = self._walls_state.get_walls_in_camera(chunk_world_area)
+        walls.sort(key=_render_order)
+        for wall in walls:
+            self._world_entity(wall, walls_render)
+
+        self._static_layer_chunks[key] = (ground, ground_and_walls)
+        self._static_layer_memory += _get_surface_memory(ground) + _get_surface_memory(ground_and_walls)
+        while self._static_layer_memory > MAX_STATIC_LAYER_MEMORY and len(self._static_layer_chunks) > 1:
+            self._remove_static_layer_chunk(next(iter(self._static_layer_chunks)))
+        return ground, ground_and_walls
+
+    def _remove_static_layer_chunk(self, key: Tuple[int, int]):
+        ground, ground_and_walls = self._static_layer_chunks.pop(key)
+        self._static_layer_memory -= _get_surface_memory(ground) + _get_surface_memory(ground_and_walls)
+
+    @staticmethod
+    def _world_ground(drawable_area: DrawableArea, world_area: Rect, entire_world_area: Rect):
         grid_width = 35
         # TODO num squares should depend on map size. Ideally this dumb looping logic should change.
         num_squares = 200
-        column_screen_y_0 = self._translate_world_y_to_screen(self.camera_world_area.y)
-        column_screen_y_1 = self._translate_world_y_to_screen(
-            min(entire_world_area.y + entire_world_area.h, self.camera_world_area.y + self.camera_world_area.h))
+        column_y_0 = world_area.y
+        column_y_1 = min(entire_world_area.y + entire_world_area.h, world_area.y + world_area.h)
         for i_col in range(num_squares):
             world_x = entire_world_area.x + i_col * grid_width
-            if entire_world_area.x < world_x < entire_world_area.x + entire_world_area.w:
-                screen_x = self._translate_world_x_to_screen(world_x)
-                self.screen_render.line(COLOR_BACKGROUND_LINES, (screen_x, column_screen_y_0),
-                                        (screen_x, column_screen_y_1),
-                                        1)
-        row_screen_x_0 = self._translate_world_x_to_screen(self.camera_world_area.x)
-        row_screen_x_1 = self._translate_world_x_to_screen(
-            min(entire_world_area.x + entire_world_area.w, self.camera_world_area.x + self.camera_world_area.w))
+            if entire_world_area.x < world_x < entire_world_area.x + entire_world_area.w \
+                    and world_area.x <= world_x < world_area.x + world_area.w:
+                drawable_area.line(COLOR_BACKGROUND_LINES, (world_x, column_y_0), (world_x, column_y_1), 1)
+        row_x_0 = world_area.x
+        row_x_1 = min(entire_world_area.x + entire_world_area.w, world_area.x + world_area.w)
         for i_row in range(num_squares):
             world_y = entire_world_area.y + i_row * grid_width
-            if entire_world_area.y < world_y < entire_world_area.y + entire_world_area.h:
-                screen_y = self._translate_world_y_to_screen(world_y)
-                self.screen_render.line(COLOR_BACKGROUND_LINES, (row_screen_x_0, screen_y), (row_screen_x_1, screen_y),
-                                        1)
+            if entire_world_area.y < world_y < entire_world_area.y + entire_world_area.h \
+                    and world_area.y <= world_y < world_area.y + world_area.h:
+                drawable_area.line(COLOR_BACKGROUND_LINES, (row_x_0, world_y), (row_x_1, world_y), 1)
 
-        if RENDER_WORLD_COORDINATES:
-            for i_col in range(num_squares):
-                for i_row in range(num_squares):
-                    if i_col % 4 == 0 and i_row % 4 == 0:
-                        world_x = entire_world_area.x + i_col * grid_width
-                        screen_x = self._translate_world_x_to_screen(world_x)
-                        world_y = entire_world_area.y + i_row * grid_width
-                        screen_y = self._translate_world_y_to_screen(world_y)
-                        self.screen_render.text(self.font_debug_info, str(world_x) + "," + str(world_y),
-                                                (screen_x, screen_y),
-                                                (250, 250, 250))
-
-    def _world_entity(self, entity: Union[WorldEntity, DecorationEntity]):
+    def _world_coordinates(self, entire_world_area: Rect):
+        grid_width = 35
+        num_squares = 200
+        for i_col in range(num_squares):
+            for i_row in range(num_squares):
+                if i_col % 4 == 0 and i_row % 4 == 0:
+                    world_x = entire_world_area.x + i_col * grid_width
+                    screen_x = self._translate_world_x_to_screen(world_x)
+                    world_y = entire_world_area.y + i_row * grid_width
+                    screen_y = self._translate_world_y_to_screen(world_y)
+                    self.screen_render.text(self.font_debug_info, str(world_x) + "," + str(world_y),
+                                            (screen_x, screen_y),
+                                            (250, 250, 250))
+
+    def _world_entity(self, entity: Union[WorldEntity, DecorationEntity], drawable_area: DrawableArea = None):
         if not entity.visible:
             return
         if entity.sprite is None:
@@ -134,13 +248,53 @@ class GameWorldView:
         elif entity.sprite in self.images_by_sprite:
             image_with_relative_position = self._get_image_for_sprite(
                 entity.sprite, entity.direction, entity.movement_animation_progress)
-            self.world_render.image_with_relative_pos(image_with_relative_position, entity.get_position())
+            (drawable_area or self.world_render).image_with_relative_pos(image_with_relative_position,
+                                                                         entity.get_position())
         elif entity.sprite == Sprite.NONE:
             # This value is used by entities that don't use sprites. They might have other graphics (like VisualEffects)
             pass
         else:
             raise Exception("Unhandled sprite: " + str(entity.sprite))
 
+    # Returns the entities that are (at least partly) within the camera, along with the areas that they will be
+    # rendered onto (in world coordinates). Overlapping areas are merged, so that nothing in the static layer is
+    # rendered twice onto the same pixel.
+    def _get_entities_in_camera(self, entities: List[WorldEntity], player_entity: WorldEntity) \
+            -> Tuple[List[WorldEntity], List[Rect]]:
+        entities_in_camera = []
+        dirty_areas = []
+        for entity in entities:
+            if not entity.visible or entity.sprite == Sprite.NONE:
+                # Nothing is rendered for these, except possibly an outline around the player
+                if entity == player_entity:
+                    entities_in_camera.append(entity)
+                continue
+            area = self._get_entity_image_rect(entity).clip(self.camera_world_area)
+            if area.w == 0 or area.h == 0:
+                continue
+            entities_in_camera.append(entity)
+            i = area.collidelist(dirty_areas)
+            while i != -1:
+                area.union_ip(dirty_areas.pop(i))
+                i = area.collidelist(dirty_areas)
+            dirty_areas.append(area)
+        return entities_in_camera, dirty_areas
+
+    def _get_wall_image_rect(self, wall: WorldEntity) -> Rect:
+        if wall not in self._wall_image_rects:
+            self._wall_image_rects[wall] = self._get_entity_image_rect(wall)
+        return self._wall_image_rects[wall]
+
+    def _get_entity_image_rect(self, entity: WorldEntity) -> Rect:
+        # Includes the collision rect, since that's also rendered for the player in some cases
+        rect = Rect(entity.pygame_collision_rect)
+        if entity.sprite in self.images_by_sprite:
+            image_with_relative_position = self._get_image_for_sprite(
+                entity.sprite, entity.direction, entity.movement_animation_progress)
+            image_pos = sum_of_vectors(entity.get_position(), image_with_relative_position.position_relative_to_entity)
+            rect.union_ip(Rect(image_pos, image_with_relative_position.image.get_size()))
+        return rect
+
     def _get_image_for_sprite(self, sprite: Sprite, direction: Direction,
                               animation_progress: float) -> ImageWithRelativePosition:
 
@@ -261,22 +415,44 @@ class GameWorldView:
         self.world_render.text(self.font_quest_giver_mark, mark, (entity_pos[0] - 8, entity_pos[1] - 64), (0, 0, 0))
         self.world_render.text(self.font_quest_giver_mark, mark, (entity_pos[0] - 9, entity_pos[1] - 65), color)
 
-    def render_world(self, all_entities_to_render: List[WorldEntity], decorations_to_render: List[DecorationEntity],
-                     camera_world_area, non_player_characters: List[NonPlayerCharacter], is_player_invisible: bool,
+    def render_world(self, entities_to_render: List[WorldEntity], walls_state: WallsState,
+                     decorations_state: DecorationsState, camera_world_area,
+                     non_player_characters: List[NonPlayerCharacter], is_player_invisible: bool,
                      player_active_buffs: List[BuffWithDuration],
                      player_entity: WorldEntity, visual_effects, render_hit_and_collision_boxes, player_health,
                      player_max_health, entire_world_area: Rect, entity_action_text: Optional[EntityActionText]):
         self.camera_world_area = camera_world_area
 
-        self.screen_render.fill(COLOR_BACKGROUND)
-        self._world_ground(entire_world_area)
-
-        all_entities_to_render.sort(key=lambda entry: (-entry.view_z, entry.y))
-
-        for decoration_entity in decorations_to_render:
-            self._world_entity(decoration_entity)
+        self._update_static_layer_source(walls_state, decorations_state, entire_world_area)
+        self._static_layer(camera_world_area, include_walls=True)
+        if RENDER_WORLD_COORDINATES:
+            self._world_coordinates(entire_world_area)
+
+        # Entities are rendered on top of the static layer. Where they are, the static layer is restored to just the
+        # ground, and walls are rendered again along with the entities, so that a wall that is in front of an entity
+        # still covers it.
+        entities_in_camera, dirty_areas = self._get_entities_in_camera(entities_to_render, player_entity)
+        for area in dirty_areas:
+            self._static_layer(area, include_walls=False)
+        walls_in_camera = walls_state.get_walls_in_camera(camera_world_area)
+        dirty_areas_by_wall: Dict[WorldEntity, List[Rect]] = {}
+        for wall in walls_in_camera:
+            indices = self._get_wall_image_rect(wall).collidelistall(dirty_areas)
+            if indices:
+                dirty_areas_by_wall[wall] = [dirty_areas[i] for i in indices]
+
+        all_entities_to_render = list(dirty_areas_by_wall.keys()) + entities_in_camera
+        all_entities_to_render.sort(key=_render_order)
 
         for entity in all_entities_to_render:
+            if entity in dirty_areas_by_wall:
+                # The rest of the wall is already there, from the static layer
+                for area in dirty_areas_by_wall[entity]:
+                    self.screen_render.screen.set_clip(
+                        Rect(self._translate_world_position_to_screen(area.topleft), area.size))
+                    self._world_entity(entity)
+                self.screen_render.screen.set_clip(None)
+                continue
             self._world_entity(entity)
             if entity == player_entity and is_player_invisible:
                 self.world_render.rect((200, 100, 250), player_entity.rect(), 2)
@@ -295,10 +471,14 @@ class GameWorldView:
                                                 (150, 150, 250))
 
         if render_hit_and_collision_boxes:
-            for entity in all_entities_to_render:
+            for entity in walls_in_camera + entities_to_render:
                 self.world_render.rect((250, 250, 250), entity.rect(), 1)
 
+        # Health bars and quest marks are rendered close to the NPC, so we can skip the ones that are far outside of view
+        camera_with_margin = camera_world_area.inflate(200, 200)
         for npc in non_player_characters:
+            if not camera_with_margin.colliderect(npc.world_entity.pygame_collision_rect):
+                continue
             if npc.is_enemy:
                 if npc.is_boss:
                     healthbar_color = (255, 215, 0)
@@ -327,3 +507,11 @@ class GameWorldView:
 
         if entity_action_text:
             self._entity_action_text(entity_action_text)
+
+
+def _render_order(entity: WorldEntity) -> Tuple[int, int]:
+    return -entity.view_z, entity.y
+
+
+def _get_surface_memory(surface) -> int:
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
@@ -1,10 +1,31 @@
-from typing import Tuple, Optional, List, Any, Dict
+import json
+import os
+import struct
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, Optional, List, Any, Dict, Iterable, Iterator
 
 import pygame
 from pygame.rect import Rect
 
 from pythongame.core.common import Direction, Sprite, UiIconSprite, PortraitIconSprite
 
+# Decoding PNG files is by far the most expensive part of loading images. To make startup faster, all images are
+# stored in this file after they have been cropped and scaled, as raw RGBA pixels. An image is only decoded again
+# if its source file has been modified (or if it's needed in a different size). The cache file can safely be deleted.
+IMAGE_CACHE_FILE_PATH = "asset_cache/images.cache"
+
+_IMAGE_CACHE_MAGIC = b"WIMG"
+_IMAGE_CACHE_VERSION = 2
+# magic, version, offset of the index, length of the index
+_IMAGE_CACHE_HEADER = struct.Struct("<4sHQI")
+# When more than this share of the cache file is taken up by outdated images and indices, it's compacted
+_IMAGE_CACHE_MAX_WASTED_SHARE = 0.5
+
+# Images from sprite sheets are rendered with black as the transparent color
+_SPRITE_SHEET_TRANSPARENT_COLOR = (0, 0, 0)
+
 
 class SpriteInitializer:
     def __init__(self, image_file_path: str, scaling_size: Tuple[int, int]):
@@ -15,22 +36,6 @@ class SpriteInitializer:
 class SpriteSheet(object):
     def __init__(self, file_path: str):
         self.file_path = file_path
-        self.sheet = None
-
-    def _load_sheet(self):
-        self.sheet = pygame.image.load(self.file_path).convert_alpha()
-
-    def image_at(self, rect: Rect):
-        if self.sheet is None:
-            self._load_sheet()
-
-        # noinspection PyArgumentList
-        image = pygame.Surface(rect.size, pygame.SRCALPHA)
-        destination_in_image = (0, 0)
-        image.blit(self.sheet, destination_in_image, rect)
-        transparent_color_in_image = (0, 0, 0)
-        image.set_colorkey(transparent_color_in_image, pygame.RLEACCEL)
-        return image
 
 
 class SpriteMapInitializer:
@@ -59,54 +64,332 @@ class ImageWithRelativePosition:
         self.position_relative_to_entity = position_relative_to_entity
 
 
-def load_and_scale_sprite(sprite_initializer: SpriteInitializer):
-    return _load_and_scale_sprite(sprite_initializer.image_file_path, sprite_initializer.scaling_size)
-
-
-def load_and_scale_directional_sprites(
-        animations_by_dir: Dict[Direction, Animation]) -> Dict[Direction, List[ImageWithRelativePosition]]:
-    images: Dict[Direction, List[ImageWithRelativePosition]] = {}
-    for direction in animations_by_dir:
-        animation = animations_by_dir[direction]
-        images_for_dir: List[ImageWithRelativePosition] = []
-        if animation.sprite_initializers:
-            for sprite_init in animation.sprite_initializers:
-                scaled_image = load_and_scale_sprite(sprite_init)
-                images_for_dir.append(ImageWithRelativePosition(scaled_image, animation.position_relative_to_entity))
-        elif animation.sprite_map_initializers:
-            for sprite_map_init in animation.sprite_map_initializers:
-                sprite_sheet = sprite_map_init.sprite_sheet
-                index_position_within_map = sprite_map_init.index_position_within_map
-                original_sprite_size = sprite_map_init.original_sprite_size
-                rectangle = Rect(index_position_within_map[0] * original_sprite_size[0],
-                                 index_position_within_map[1] * original_sprite_size[1],
-                                 original_sprite_size[0],
-                                 original_sprite_size[1])
-                image = sprite_sheet.image_at(rectangle)
-                scaled_image = pygame.transform.scale(image, sprite_map_init.scaling_size)
-                images_for_dir.append(ImageWithRelativePosition(scaled_image, animation.position_relative_to_entity))
-        else:
-            raise Exception("Invalid animation: " + str(animation))
-        images[direction] = images_for_dir
+# Describes one image that should be loaded: a (part of a) file, scaled to a given size
+class _ImageRequest:
+    def __init__(self, file_path: str, rect_in_file: Optional[Rect], scaling_size: Tuple[int, int]):
+        self.file_path = file_path
+        self.rect_in_file = rect_in_file
+        self.scaling_size = scaling_size
+
+    def cache_key(self) -> str:
+        rect = tuple(self.rect_in_file) if self.rect_in_file else None
+        return "%s %s %s" % (self.file_path, rect, tuple(self.scaling_size))
+
+
+# Scaled images as raw RGBA pixels, stored in a single file (see IMAGE_CACHE_FILE_PATH). Every entry remembers the
+# modification time of its source file, so that outdated entries are ignored. Only the index is read up front; the
+# pixels of an image are read from the file when they're asked for, so that images that are never used don't take up
+# any memory.
+#
+# The file consists of a header, the pixels of all images, and last the index. New images are appended to the end of
+# the file along with a new index, and then the header is changed to point to the new index. The file is therefore
+# never broken, even if the game is closed in the middle of writing to it. The space taken up by old indices and
+# outdated images is reclaimed by rewriting the whole file, once there is enough of it.
+class _ImageCache:
+    def __init__(self, file_path: str):
+        self._file_path = file_path
+        self._file = None
+        self._file_size = 0
+        # cache key -> (source file modification time, offset in file, length)
+        self._entries_in_file: Dict[str, Tuple[float, int, int]] = {}
+        # cache key -> (source file modification time, pixels), for images that haven't been written to the file yet
+        self._new_entries: Dict[str, Tuple[float, bytes]] = {}
+        self._open()
+
+    def _open(self):
+        try:
+            self._file = open(self._file_path, "rb")
+        except OSError:
+            return
+        self._file_size = os.fstat(self._file.fileno()).st_size
+        header = self._file.read(_IMAGE_CACHE_HEADER.size)
+        if len(header) == _IMAGE_CACHE_HEADER.size:
+            magic, version, index_offset, index_length = _IMAGE_CACHE_HEADER.unpack(header)
+            if magic == _IMAGE_CACHE_MAGIC and version == _IMAGE_CACHE_VERSION:
+                try:
+                    self._file.seek(index_offset)
+                    index = json.loads(self._file.read(index_length).decode("utf-8"))
+                    for key, modification_time, offset, length in index:
+                        self._entries_in_file[key] = (modification_time, offset, length)
+                    return
+                except ValueError:
+                    print("Ignoring corrupt image cache: " + self._file_path)
+        self._close()
+
+    def _close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+        self._file_size = 0
+        self._entries_in_file = {}
+
+    def get(self, request: _ImageRequest, modification_time: float) -> Optional[bytes]:
+        key = request.cache_key()
+        if key in self._new_entries:
+            entry_modification_time, pixels = self._new_entries[key]
+            return pixels if entry_modification_time == modification_time else None
+        if key in self._entries_in_file:
+            entry_modification_time, offset, length = self._entries_in_file[key]
+            if entry_modification_time == modification_time:
+                return self._read(offset, length)
+        return None
+
+    def _read(self, offset: int, length: int) -> bytes:
+        self._file.seek(offset)
+        return self._file.read(length)
+
+    def put(self, request: _ImageRequest, modification_time: float, pixels: bytes):
+        self._new_entries[request.cache_key()] = (modification_time, pixels)
+
+    def save_if_changed(self):
+        if not self._new_entries:
+            return
+        entries_in_file = {key: entry for key, entry in self._entries_in_file.items() if key not in self._new_entries}
+        size_in_use = sum(length for _, _, length in entries_in_file.values()) + \
+            sum(len(pixels) for _, pixels in self._new_entries.values())
+        try:
+            if self._file is not None and self._file_size - size_in_use <= _IMAGE_CACHE_MAX_WASTED_SHARE * size_in_use:
+                self._append_new_entries(entries_in_file)
+            else:
+                self._rewrite()
+            self._new_entries = {}
+        except OSError as e:
+            print("Failed to write image cache: %s" % e)
+            self._close()
+            self._open()
+
+    def _append_new_entries(self, entries_in_file: Dict[str, Tuple[float, int, int]]):
+        index = [[key, modification_time, offset, length]
+                 for key, (modification_time, offset, length) in entries_in_file.items()]
+        with open(self._file_path, "r+b") as file:
+            offset = file.seek(0, os.SEEK_END)
+            for key, (modification_time, pixels) in self._new_entries.items():
+                file.write(pixels)
+                index.append([key, modification_time, offset, len(pixels)])
+                entries_in_file[key] = (modification_time, offset, len(pixels))
+                offset += len(pixels)
+            index_data = json.dumps(index).encode("utf-8")
+            file.write(index_data)
+            file.flush()
+            # Only now that the new index has been written, can the header point to it
+            file.seek(0)
+            file.write(_IMAGE_CACHE_HEADER.pack(_IMAGE_CACHE_MAGIC, _IMAGE_CACHE_VERSION, offset, len(index_data)))
+            self._file_size = offset + len(index_data)
+        self._entries_in_file = entries_in_file
+
+    # Writes all images that are still in use to a new file, which replaces the old one
+    def _rewrite(self):
+        entries: Dict[str, Tuple[float, bytes]] = {
+            key: (modification_time, self._read(offset, length))
+            for key, (modification_time, offset, length) in self._entries_in_file.items()
+            if key not in self._new_entries}
+        entries.update(self._new_entries)
+        index = []
+        offset = _IMAGE_CACHE_HEADER.size
+        for key, (modification_time, pixels) in entries.items():
+            index.append([key, modification_time, offset, len(pixels)])
+            offset += len(pixels)
+        index_data = json.dumps(index).encode("utf-8")
+        # The file must be closed before it can be replaced (on some platforms)
+        self._close()
+        try:
+            os.makedirs(os.path.dirname(self._file_path), exist_ok=True)
+            # Write to a temporary file first, so that an interrupted write can't leave a broken cache behind
+            temp_file_path = self._file_path + ".tmp"
+            with open(temp_file_path, "wb") as file:
+                file.write(_IMAGE_CACHE_HEADER.pack(_IMAGE_CACHE_MAGIC, _IMAGE_CACHE_VERSION, offset, len(index_data)))
+                for _, pixels in entries.values():
+                    file.write(pixels)
+                file.write(index_data)
+            os.replace(temp_file_path, self._file_path)
+        except OSError:
+            # The images that were read from the old file are kept in memory, so that nothing is lost
+            self._new_entries = entries
+            raise
+        finally:
+            self._open()
+
+
+_image_cache: Optional[_ImageCache] = None
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_image_cache() -> _ImageCache:
+    global _image_cache
+    if _image_cache is None:
+        _image_cache = _ImageCache(IMAGE_CACHE_FILE_PATH)
+    return _image_cache
+
+
+# Writes the images that have been loaded since the cache was last saved. Images that are loaded one sprite at a time
+# while playing aren't saved right away (see LazyImagesBySprite), so this should be called before the game exits.
+def save_image_cache():
+    if _image_cache is not None:
+        _image_cache.save_if_changed()
+
+
+# The worker threads are kept around, as images are loaded in many small batches while playing
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+    return _executor
+
+
+# Returns the requested images (converted to the display's pixel format), in the same order as the requests. Images
+# that aren't cached are decoded and scaled in a thread pool. Only the final conversion (convert_alpha) is done on
+# the calling thread, as it depends on the display. Unless save_cache is False, newly decoded images are written to the
+# image cache right away.
+def _load_images(requests: List[_ImageRequest], save_cache: bool = True) -> List[Any]:
+    cache = _get_image_cache()
+    modification_times = {path: os.path.getmtime(path) for path in {request.file_path for request in requests}}
+    pixels_per_request = [cache.get(request, modification_times[request.file_path]) for request in requests]
+    missing_indices = [i for i, pixels in enumerate(pixels_per_request) if pixels is None]
+
+    if missing_indices:
+        # Every file is only decoded once, even if several images are cut out from it (like in a sprite sheet)
+        file_paths = list({requests[i].file_path for i in missing_indices})
+        executor = _get_executor()
+        source_images = dict(zip(file_paths, executor.map(pygame.image.load, file_paths)))
+        missing_pixels = executor.map(
+            lambda i: _crop_and_scale(source_images[requests[i].file_path], requests[i]), missing_indices)
+        for i, pixels in zip(missing_indices, missing_pixels):
+            pixels_per_request[i] = pixels
+            cache.put(requests[i], modification_times[requests[i].file_path], pixels)
+        if save_cache:
+            cache.save_if_changed()
+
+    images = []
+    for request, pixels in zip(requests, pixels_per_request):
+        image = pygame.image.frombuffer(pixels, request.scaling_size, "RGBA").convert_alpha()
+        if request.rect_in_file:
+            image.set_colorkey(_SPRITE_SHEET_TRANSPARENT_COLOR, pygame.RLEACCEL)
+        images.append(image)
     return images
 
 
-def _load_and_scale_sprite(image_file_path: str, scaling_size: Tuple[int, int]):
-    image = pygame.image.load(image_file_path).convert_alpha()
-    return pygame.transform.scale(image, scaling_size)
+# This is run on worker threads, so it mustn't depend on the display
+def _crop_and_scale(source_image: Any, request: _ImageRequest) -> bytes:
+    if request.rect_in_file:
+        # noinspection PyArgumentList
+        image = pygame.Surface(request.rect_in_file.size, pygame.SRCALPHA)
+        image.blit(source_image, (0, 0), request.rect_in_file)
+    else:
+        image = source_image
+    scaled_image = pygame.transform.scale(image, request.scaling_size)
+    return pygame.image.tostring(scaled_image, "RGBA")
+
+
+def _get_image_requests(animation: Animation) -> List[_ImageRequest]:
+    if animation.sprite_initializers:
+        return [_ImageRequest(sprite_init.image_file_path, None, sprite_init.scaling_size)
+                for sprite_init in animation.sprite_initializers]
+    elif animation.sprite_map_initializers:
+        requests = []
+        for sprite_map_init in animation.sprite_map_initializers:
+            index_position_within_map = sprite_map_init.index_position_within_map
+            original_sprite_size = sprite_map_init.original_sprite_size
+            rectangle = Rect(index_position_within_map[0] * original_sprite_size[0],
+                             index_position_within_map[1] * original_sprite_size[1],
+                             original_sprite_size[0],
+                             original_sprite_size[1])
+            requests.append(_ImageRequest(sprite_map_init.sprite_sheet.file_path, rectangle,
+                                          sprite_map_init.scaling_size))
+        return requests
+    else:
+        raise Exception("Invalid animation: " + str(animation))
 
 
-def load_images_by_sprite(dictionary: Dict[Sprite, Dict[Direction, Animation]]) \
+# All images are loaded as one batch, so that they can be decoded in parallel
+def load_images_by_sprite(dictionary: Dict[Sprite, Dict[Direction, Animation]], save_cache: bool = True) \
         -> Dict[Sprite, Dict[Direction, List[ImageWithRelativePosition]]]:
-    return {sprite: load_and_scale_directional_sprites(dictionary[sprite]) for sprite in dictionary}
+    requests = []
+    for animations_by_dir in dictionary.values():
+        for animation in animations_by_dir.values():
+            requests += _get_image_requests(animation)
+    loaded_images = iter(_load_images(requests, save_cache))
+
+    images_by_sprite = {}
+    for sprite, animations_by_dir in dictionary.items():
+        images: Dict[Direction, List[ImageWithRelativePosition]] = {}
+        for direction, animation in animations_by_dir.items():
+            num_images = len(animation.sprite_initializers or animation.sprite_map_initializers)
+            images[direction] = [ImageWithRelativePosition(next(loaded_images), animation.position_relative_to_entity)
+                                 for _ in range(num_images)]
+        images_by_sprite[sprite] = images
+    return images_by_sprite
+
+
+# The images of every sprite, loaded the first time that they're needed rather than all at once. Use preload() to load
+# the sprites that are known to be needed (for instance by the entities in a map) ahead of time, in one batch.
+#
+# A sprite that is loaded on first use is typically rendered in the middle of the game, so new images aren't written
+# to the image cache right then. They are saved along with the next preload(), or by save_image_cache().
+#
+# If a memory limit is given, the least recently used sprites are unloaded whenever the images take up more memory
+# than that. They are loaded again (typically from the image cache, which is fast) if they're needed later.
+class LazyImagesBySprite(Mapping):
+    def __init__(self, animations_by_sprite: Dict[Sprite, Dict[Direction, Animation]],
+                 max_memory_bytes: Optional[int] = None):
+        self._animations_by_sprite = animations_by_sprite
+        self._max_memory_bytes = max_memory_bytes
+        # In least-recently-used order
+        self._images_by_sprite: Dict[Sprite, Dict[Direction, List[ImageWithRelativePosition]]] = OrderedDict()
+        self._memory_by_sprite: Dict[Sprite, int] = {}
+        self._memory = 0
+
+    def __getitem__(self, sprite: Sprite) -> Dict[Direction, List[ImageWithRelativePosition]]:
+        if sprite in self._images_by_sprite:
+            self._images_by_sprite.move_to_end(sprite)
+        else:
+            self._add(load_images_by_sprite({sprite: self._animations_by_sprite[sprite]}, save_cache=False))
+        return self._images_by_sprite[sprite]
+
+    def __contains__(self, sprite: Sprite) -> bool:
+        return sprite in self._animations_by_sprite
+
+    def __iter__(self) -> Iterator[Sprite]:
+        return iter(self._animations_by_sprite)
+
+    def __len__(self) -> int:
+        return len(self._animations_by_sprite)
+
+    def preload(self, sprites: Iterable[Sprite]):
+        missing_sprites = {sprite for sprite in sprites
+                           if sprite in self._animations_by_sprite and sprite not in self._images_by_sprite}
+        if missing_sprites:
+            self._add(load_images_by_sprite({sprite: self._animations_by_sprite[sprite] for sprite in missing_sprites}))
+        save_image_cache()
+
+    def get_num_loaded_sprites(self) -> int:
+        return len(self._images_by_sprite)
+
+    def get_memory_usage(self) -> int:
+        return self._memory
+
+    def _add(self, images_by_sprite: Dict[Sprite, Dict[Direction, List[ImageWithRelativePosition]]]):
+        for sprite, images in images_by_sprite.items():
+            memory = sum(image.image.get_bytesize() * image.image.get_width() * image.image.get_height()
+                         for images_for_direction in images.values() for image in images_for_direction)
+            self._images_by_sprite[sprite] = images
+            self._memory_by_sprite[sprite] = memory
+            self._memory += memory
+        if self._max_memory_bytes is not None:
+            # The most recently added sprites are kept, even if they don't fit within the limit on their own
+            while self._memory > self._max_memory_bytes and len(self._images_by_sprite) > len(images_by_sprite):
+                evicted_sprite, _ = self._images_by_sprite.popitem(last=False)
+                self._memory -= self._memory_by_sprite.pop(evicted_sprite)
 
 
 def load_images_by_ui_sprite(dictionary: Dict[UiIconSprite, str], icon_size: Tuple[int, int]) \
         -> Dict[UiIconSprite, Any]:
-    return {sprite: load_and_scale_sprite(SpriteInitializer(dictionary[sprite], icon_size)) for sprite in dictionary
-            }
+    sprites = list(dictionary)
+    images = _load_images([_ImageRequest(dictionary[sprite], None, icon_size) for sprite in sprites])
+    return dict(zip(sprites, images))
 
 
 def load_images_by_portrait_sprite(dictionary: Dict[PortraitIconSprite, str], icon_size: Tuple[int, int]) \
         -> Dict[PortraitIconSprite, Any]:
-    return {sprite: load_and_scale_sprite(SpriteInitializer(dictionary[sprite], icon_size)) for sprite in dictionary}
+    sprites = list(dictionary)
+    images = _load_images([_ImageRequest(dictionary[sprite], None, icon_size) for sprite in sprites])
+    return dict(zip(sprites, images))
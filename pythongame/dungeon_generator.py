@@ -1,6 +1,7 @@
 import random
-from ast import literal_eval
 from enum import Enum
+from functools import lru_cache
+from itertools import compress
 from typing import List, Tuple, Callable, Optional
 
 from pygame.rect import Rect
@@ -8,6 +9,7 @@ from pygame.rect import Rect
 from pythongame.core.common import WallType, Sprite
 from pythongame.core.entity_creation import create_wall, create_decoration_entity
 from pythongame.core.game_state import DecorationEntity, Wall, NonPlayerCharacter
+from pythongame.grid_encoding import encode_grid, decode_grid
 from pythongame.map_file import MapJson
 
 MAX_ROOM_ATTEMPTS = 100
@@ -21,29 +23,97 @@ class CellType(Enum):
     WALL = 3
 
 
+# The grid stores the raw values of the cell types, one byte per cell
+_NONE = CellType.NONE.value
+_FLOOR = CellType.FLOOR.value
+_WALL = CellType.WALL.value
+
+# Tables for bytes.translate(), that turn cell values into 1 (if the cell is of the given type) or 0
+_FLOOR_LANES = bytes(1 if value == _FLOOR else 0 for value in range(256))
+_WALL_LANES = bytes(1 if value == _WALL else 0 for value in range(256))
+
+# The 8 neighbours of a cell, as (dx, dy). In a cell's neighbourhood (see _get_neighbourhood), the neighbour at index
+# i is represented by the bit 1 << i.
+_NEIGHBOURS = [(0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1)]
+_N, _NE, _E, _SE, _S, _SW, _W, _NW = [1 << i for i in range(len(_NEIGHBOURS))]
+
+
+# Rather than looping over cells one by one in Python, the grid works on whole rectangular regions at a time. A
+# region is represented as "lanes": a (very large) integer where every cell occupies one byte, and that byte is 0 or
+# 1 depending on whether the cell has some property (like being floor). Moving every cell's neighbour into the
+# cell's own lane is then just a shift, and combining properties of all cells is a single bitwise operation.
+#
+# The cells of a region are stored column by column, just like the grid itself.
+class _RegionLanes:
+    def __init__(self, size: Tuple[int, int]):
+        w, h = size
+        self.size = size
+        self.num_cells = w * h
+        self.all = int.from_bytes(b"\x01" * self.num_cells, "little")
+        self._not_first_row = int.from_bytes((b"\x00" + b"\x01" * (h - 1)) * w, "little")
+        self._not_last_row = int.from_bytes((b"\x01" * (h - 1) + b"\x00") * w, "little")
+        # The cells that aren't on the edge of the region
+        self.inner = int.from_bytes(
+            b"\x00" * h + (b"\x00" + b"\x01" * (h - 2) + b"\x00") * (w - 2) + b"\x00" * h, "little")
+
+    def from_cells(self, cells: bytes, table: bytes) -> int:
+        return int.from_bytes(cells.translate(table), "little")
+
+    def to_bytes(self, lanes: int) -> bytes:
+        return lanes.to_bytes(self.num_cells, "little")
+
+    # Returns lanes where every cell holds the value of its neighbour at (x + dx, y + dy). Cells whose neighbour is
+    # outside of the region get 0.
+    def neighbour(self, lanes: int, dx: int, dy: int) -> int:
+        offset = (dx * self.size[1] + dy) * 8
+        shifted = lanes >> offset if offset >= 0 else lanes << -offset
+        if dy < 0:
+            return shifted & self._not_first_row
+        if dy > 0:
+            return shifted & self._not_last_row
+        return shifted & self.all
+
+    def any_neighbour(self, lanes: int) -> int:
+        result = 0
+        for dx, dy in _NEIGHBOURS:
+            result |= self.neighbour(lanes, dx, dy)
+        return result
+
+    # Returns lanes where every cell holds a bitmask of which of its neighbours are set in the given lanes
+    def neighbourhood(self, lanes: int) -> int:
+        result = 0
+        for i, (dx, dy) in enumerate(_NEIGHBOURS):
+            result |= self.neighbour(lanes, dx, dy) << i
+        return result
+
+
+@lru_cache(maxsize=16)
+def _get_region_lanes(size: Tuple[int, int]) -> _RegionLanes:
+    return _RegionLanes(size)
+
+
+# A grid of cells (see CellType) that is used by the map editor to determine where walls and floor tiles should be
+# placed. Cells are stored in a flat bytearray, column by column (i.e. the cell (x, y) is at index x * height + y).
 class Grid:
-    def __init__(self, grid: List[List[CellType]], size: Tuple[int, int]):
-        self._grid = grid
+    def __init__(self, cells: bytearray, size: Tuple[int, int]):
+        self._cells = cells
         self.size = size
-        self._floor_cells = set()
 
     @staticmethod
     def create_from_rects(map_size: Tuple[int, int], walkable_areas: List[Rect]):
 
         print("Creating grid (%i, %i) from %i rects ..." % (map_size[0], map_size[1], len(walkable_areas)))
-        _grid = []
-        grid = Grid(_grid, map_size)
-        for y in range(map_size[0]):
-            _grid.append([CellType.NONE] * map_size[1])
+        grid = Grid(bytearray(map_size[0] * map_size[1]), map_size)
+        height = map_size[1]
 
         for rect in walkable_areas:
-            for y in range(rect.y, rect.y + rect.h):
-                for x in range(rect.x, rect.x + rect.w):
-                    _grid[x][y] = CellType.FLOOR
-                    grid._floor_cells.add((x, y))
+            ymin, ymax = max(rect.top, 0), min(rect.bottom, height)
+            if ymin < ymax:
+                column = bytes([_FLOOR]) * (ymax - ymin)
+                for x in range(max(rect.left, 0), min(rect.right, map_size[0])):
+                    grid._cells[x * height + ymin: x * height + ymax] = column
 
-        grid._update_wall_cells(range(0, grid.size[0]), range(0, grid.size[1]))
-        grid._prune_bad_walls(range(0, grid.size[0]), range(0, grid.size[1]))
+        grid._update_walls(0, 0, map_size[0], map_size[1])
 
         print("Grid created")
 
@@ -52,115 +122,230 @@ class Grid:
     def add_floor_cells(self, cells: List[Tuple[int, int]]):
         if not cells:
             return
-
-        xmin = min([cell[0] for cell in cells]) - 1
-        xmax = max([cell[0] for cell in cells]) + 2
-        ymin = min([cell[1] for cell in cells]) - 1
-        ymax = max([cell[1] for cell in cells]) + 2
-
         for cell in cells:
-            self._grid[cell[0]][cell[1]] = CellType.FLOOR
-            self._floor_cells.add(cell)
-        self._update_wall_cells(range(xmin, xmax), range(ymin, ymax))
-        self._prune_bad_walls(range(xmin, xmax), range(ymin, ymax))
+            self._cells[cell[0] * self.size[1] + cell[1]] = _FLOOR
+        self._update_walls_around(cells)
 
     def remove_floor_cells(self, cells: List[Tuple[int, int]]):
-        xmin = min([cell[0] for cell in cells]) - 1
-        xmax = max([cell[0] for cell in cells]) + 2
-        ymin = min([cell[1] for cell in cells]) - 1
-        ymax = max([cell[1] for cell in cells]) + 2
-
         for cell in cells:
-            self._grid[cell[0]][cell[1]] = CellType.NONE
-            if cell in self._floor_cells:
-                self._floor_cells.remove(cell)
-        self._update_wall_cells(range(xmin, xmax), range(ymin, ymax))
-        self._prune_bad_walls(range(xmin, xmax), range(ymin, ymax))
+            self._cells[cell[0] * self.size[1] + cell[1]] = _NONE
+        self._update_walls_around(cells)
 
     def print(self):
         for y in range(self.size[1]):
             for x in range(self.size[0]):
-                cell = "* " if self._grid[x][y] == CellType.FLOOR else \
-                    ("x " if self._grid[x][y] == CellType.WALL else "  ")
+                value = self._cells[x * self.size[1] + y]
+                cell = "* " if value == _FLOOR else ("x " if value == _WALL else "  ")
                 print(cell, end='')
             print()
 
-    def cell(self, x: int, y: int):
-        return self._grid[x][y]
+    def cell(self, x: int, y: int) -> CellType:
+        return CellType(self._cells[x * self.size[1] + y])
+
+    def get_num_cells(self, cell_type: CellType) -> int:
+        return self._cells.count(cell_type.value)
 
     # TODO optimization: don't check bounds here. Let caller keep track of it!
-    def _is_cell(self, cell: Tuple[int, int], target: CellType):
+    def _is_cell(self, cell: Tuple[int, int], target: int):
         x, y = cell
         if 0 <= x < self.size[0]:
             if 0 <= y < self.size[1]:
-                return self._grid[x][y] == target
+                return self._cells[x * self.size[1] + y] == target
         return False
 
     def _is_within_grid(self, cell: Tuple[int, int]):
         return 0 <= cell[0] < self.size[0] and 0 <= cell[1] < self.size[1]
 
     def is_wall(self, cell: Tuple[int, int]):
-        return self._is_cell(cell, CellType.WALL)
+        return self._is_cell(cell, _WALL)
 
     def is_floor(self, cell: Tuple[int, int]):
-        return self._is_cell(cell, CellType.FLOOR)
-
-    def _update_wall_cells(self, xrange, yrange):
-        # print("Updating wall cells...")
-
-        cells_that_have_floor_neighbours = set()
-
-        for (x, y) in self._floor_cells:
-            cells_that_have_floor_neighbours.add((x, y - 1))
-            cells_that_have_floor_neighbours.add((x + 1, y - 1))
-            cells_that_have_floor_neighbours.add((x + 1, y))
-            cells_that_have_floor_neighbours.add((x + 1, y + 1))
-            cells_that_have_floor_neighbours.add((x, y + 1))
-            cells_that_have_floor_neighbours.add((x - 1, y + 1))
-            cells_that_have_floor_neighbours.add((x - 1, y))
-            cells_that_have_floor_neighbours.add((x - 1, y - 1))
-
-        xmin = min(xrange)
-        xmax = max(xrange)
-        ymin = min(yrange)
-        ymax = max(yrange)
-
-        for x in range(max(0, xmin), min(xmax + 1, self.size[0])):
-            for y in range(max(0, ymin), min(ymax + 1, self.size[1])):
-                cell = self._grid[x][y]
-                if cell == CellType.FLOOR:
-                    continue
-                has_floor_neighbour = (x, y) in cells_that_have_floor_neighbours
-                if has_floor_neighbour and cell == CellType.NONE:
-                    self._grid[x][y] = CellType.WALL
-                elif not has_floor_neighbour and cell == CellType.WALL:
-                    self._grid[x][y] = CellType.NONE
-        # print("done.")
-
-    def _prune_bad_walls(self, xrange, yrange):
-        # print("Pruning wall cells...")
-        for x in xrange:
-            for y in yrange:
-                # Thin wall segments that are "inside" walkable areas, cannot be rendered in a good way given the
-                # sprites we are using, so we remove any such segments.
-                is_wall = self.is_wall((x, y))
-                if is_wall and (
-                        (self.is_floor((x - 1, y)) and self.is_floor((x + 1, y)))
-                        or
-                        (self.is_floor((x, y - 1)) and self.is_floor((x, y + 1)))
-                ):
-                    self._grid[x][y] = CellType.FLOOR
-        # print("done.")
+        return self._is_cell(cell, _FLOOR)
+
+    # Returns the cells within [xmin, xmax) x [ymin, ymax) (column by column). Cells outside of the grid are NONE.
+    def _read_region(self, xmin: int, ymin: int, xmax: int, ymax: int) -> bytearray:
+        height = self.size[1]
+        region_height = ymax - ymin
+        region = bytearray((xmax - xmin) * region_height)
+        y_from, y_to = max(ymin, 0), min(ymax, height)
+        if y_from < y_to:
+            for x in range(max(xmin, 0), min(xmax, self.size[0])):
+                start = (x - xmin) * region_height + y_from - ymin
+                region[start: start + y_to - y_from] = self._cells[x * height + y_from: x * height + y_to]
+        return region
+
+    def _update_walls_around(self, changed_cells: List[Tuple[int, int]]):
+        xmin = min([cell[0] for cell in changed_cells]) - 1
+        xmax = max([cell[0] for cell in changed_cells]) + 2
+        ymin = min([cell[1] for cell in changed_cells]) - 1
+        ymax = max([cell[1] for cell in changed_cells]) + 2
+        self._update_walls(xmin, ymin, xmax, ymax)
+
+    # Updates the cells within [xmin, xmax) x [ymin, ymax): any cell that isn't floor becomes a wall if it's next to
+    # floor, and is cleared otherwise. Then bad walls are pruned.
+    def _update_walls(self, xmin: int, ymin: int, xmax: int, ymax: int):
+        xmin, ymin = max(xmin, 0), max(ymin, 0)
+        xmax, ymax = min(xmax, self.size[0]), min(ymax, self.size[1])
+        if xmin >= xmax or ymin >= ymax:
+            return
+
+        # The region includes a border of neighbouring cells, that are read but never modified
+        region = self._read_region(xmin - 1, ymin - 1, xmax + 1, ymax + 1)
+        lanes = _get_region_lanes((xmax - xmin + 2, ymax - ymin + 2))
+
+        floor = lanes.from_cells(region, _FLOOR_LANES)
+        walls = lanes.any_neighbour(floor) & ~floor & lanes.inner
+
+        # Thin wall segments that are "inside" walkable areas, cannot be rendered in a good way given the sprites we
+        # are using, so we turn any such segments into floor.
+        #
+        # Cells are pruned one by one in column order, so when a cell is checked, its west and north neighbours may
+        # already have been turned into floor (but its east and south neighbours haven't). To get the same result, we
+        # repeat the check with the pruned cells counting as floor, until nothing more is pruned. (Usually this only
+        # takes one or two rounds.)
+        floor_east = lanes.neighbour(floor, 1, 0)
+        floor_south = lanes.neighbour(floor, 0, 1)
+        pruned = 0
+        while True:
+            floor_so_far = floor | pruned
+            newly_pruned = walls & ((lanes.neighbour(floor_so_far, -1, 0) & floor_east) |
+                                    (lanes.neighbour(floor_so_far, 0, -1) & floor_south))
+            if newly_pruned == pruned:
+                break
+            pruned = newly_pruned
+        floor |= pruned
+        walls &= ~pruned
+
+        updated = lanes.to_bytes(floor * _FLOOR | walls * _WALL)
+        height = self.size[1]
+        region_height = ymax - ymin + 2
+        for x in range(xmin, xmax):
+            start = (x - xmin + 1) * region_height + 1
+            self._cells[x * height + ymin: x * height + ymax] = updated[start: start + ymax - ymin]
+
+    # Returns the even cells that need a floor tile (as the ground sprite covers 4 cells, it's placed on (x, y) if
+    # any of the cells (x, y), (x + 1, y), (x, y + 1), (x + 1, y + 1) is floor), and all the wall cells with their
+    # neighbourhoods. Only cells within [xmin, xmax) x [ymin, ymax) are included, ordered row by row.
+    def get_floor_tiles_and_walls(self, xmin: int, ymin: int, xmax: int, ymax: int) \
+            -> Tuple[List[Tuple[int, int]], List[Tuple[Tuple[int, int], int]]]:
+        if xmin >= xmax or ymin >= ymax:
+            return [], []
+        region = self._read_region(xmin - 1, ymin - 1, xmax + 1, ymax + 1)
+        region_size = (xmax - xmin + 2, ymax - ymin + 2)
+        lanes = _get_region_lanes(region_size)
+        floor = lanes.from_cells(region, _FLOOR_LANES)
+        walls = lanes.from_cells(region, _WALL_LANES)
+
+        region_height = region_size[1]
+        # The region starts at (xmin - 1, ymin - 1), so even cells are on odd region coordinates if xmin (ymin) is even
+        odd_rows = (b"\x00\x01" * region_height)[:region_height]
+        even_rows = (b"\x01\x00" * region_height)[:region_height]
+        empty_column = b"\x00" * region_height
+        even_column = odd_rows if ymin % 2 == 0 else even_rows
+        even_cells = int.from_bytes(b"".join(
+            even_column if (xmin - 1 + x) % 2 == 0 else empty_column for x in range(region_size[0])), "little")
+        has_floor_tile = (floor | lanes.neighbour(floor, 1, 0) | lanes.neighbour(floor, 0, 1) |
+                          lanes.neighbour(floor, 1, 1)) & even_cells & lanes.inner
+
+        # The region is stored column by column, but the cells should be returned row by row
+        def to_rows(lanes_value: int) -> bytes:
+            data = lanes.to_bytes(lanes_value)
+            return b"".join(data[y::region_height] for y in range(region_height))
+
+        region_width = region_size[0]
+        wall_neighbourhoods = to_rows(lanes.neighbourhood(walls))
+        floor_neighbourhoods = to_rows(lanes.neighbourhood(floor))
+        floor_tiles = [(xmin - 1 + i % region_width, ymin - 1 + i // region_width)
+                       for i in compress(range(lanes.num_cells), to_rows(has_floor_tile))]
+        # (see _get_neighbourhood)
+        wall_cells = [((xmin - 1 + i % region_width, ymin - 1 + i // region_width),
+                       floor_neighbourhoods[i] << 8 | wall_neighbourhoods[i])
+                      for i in compress(range(lanes.num_cells), to_rows(walls & lanes.inner))]
+        return floor_tiles, wall_cells
+
+    # The neighbourhood of a single cell. See get_floor_tiles_and_walls()
+    def get_neighbourhood(self, cell: Tuple[int, int]) -> int:
+        x, y = cell
+        neighbouring_walls = 0
+        neighbouring_floor = 0
+        for i, (dx, dy) in enumerate(_NEIGHBOURS):
+            if self.is_wall((x + dx, y + dy)):
+                neighbouring_walls |= 1 << i
+            elif self.is_floor((x + dx, y + dy)):
+                neighbouring_floor |= 1 << i
+        return _get_neighbourhood(neighbouring_walls, neighbouring_floor)
 
     def serialize(self) -> str:
-        return str([[cell.value for cell in row] for row in self._grid])
+        return encode_grid(self._cells, self.size)
 
+    # Supports both the current compact format and the older (much larger) format, see grid_encoding.py
     @staticmethod
     def deserialize(string: str):
-        grid = [[CellType(cell) for cell in row] for row in literal_eval(string)]
-        w = len(grid)
-        h = len(grid[0])
-        return Grid(grid, (w, h))
+        cells, size = decode_grid(string)
+        return Grid(cells, size)
+
+
+# A cell's neighbourhood describes which of its 8 neighbours are walls, and which are floor. The low byte has the bit
+# for each neighbour that is a wall (see _NEIGHBOURS) and the high byte has the bits for neighbours that are floor.
+def _get_neighbourhood(neighbouring_walls: int, neighbouring_floor: int) -> int:
+    return neighbouring_floor << 8 | neighbouring_walls
+
+
+def _determine_wall_type_from_neighbourhood(neighbourhood: int) -> Optional[WallType]:
+    walls = neighbourhood & 0xFF
+    floor = neighbourhood >> 8
+
+    def is_wall(neighbours: int):
+        return walls & neighbours == neighbours
+
+    def is_floor(neighbours: int):
+        return floor & neighbours == neighbours
+
+    # straights:
+    if is_wall(_W | _E) and is_floor(_S):
+        return WallType.WALL_DIRECTIONAL_N
+    if is_wall(_W | _E) and is_floor(_N):
+        return WallType.WALL_DIRECTIONAL_S
+    if is_wall(_N | _S) and is_floor(_E):
+        return WallType.WALL_DIRECTIONAL_W
+    if is_wall(_N | _S) and is_floor(_W):
+        return WallType.WALL_DIRECTIONAL_E
+
+    # diagonals:
+    if is_wall(_W | _N):
+        if is_floor(_SE | _S | _E):
+            return WallType.WALL_DIRECTIONAL_POINTY_NW
+        elif is_floor(_NW):
+            return WallType.WALL_DIRECTIONAL_SE
+    if is_wall(_W | _S):
+        if is_floor(_NE | _N | _E):
+            return WallType.WALL_DIRECTIONAL_POINTY_SW
+        elif is_floor(_SW):
+            return WallType.WALL_DIRECTIONAL_NE
+    if is_wall(_E | _N):
+        if is_floor(_SW | _S | _W):
+            return WallType.WALL_DIRECTIONAL_POINTY_NE
+        elif is_floor(_NE):
+            return WallType.WALL_DIRECTIONAL_SW
+    if is_wall(_E | _S):
+        if is_floor(_NW | _N | _W):
+            return WallType.WALL_DIRECTIONAL_POINTY_SE
+        elif is_floor(_SE):
+            return WallType.WALL_DIRECTIONAL_NW
+
+    return None
+
+
+# Maps neighbourhoods to wall types. Only a small fraction of all possible neighbourhoods ever occur, so each one is
+# looked up the first time it's needed.
+class _WallTypesByNeighbourhood(dict):
+    def __missing__(self, neighbourhood: int) -> Optional[WallType]:
+        wall_type = _determine_wall_type_from_neighbourhood(neighbourhood)
+        self[neighbourhood] = wall_type
+        return wall_type
+
+
+_WALL_TYPES_BY_NEIGHBOURHOOD = _WallTypesByNeighbourhood()
 
 
 class GeneratedDungeon:
@@ -177,13 +362,15 @@ class DungeonGenerator:
 
     def __init__(self, world_size: Tuple[int, int], max_num_rooms: int, room_allowed_width: Tuple[int, int],
                  room_allowed_height: Tuple[int, int], corridor_allowed_width: Tuple[int, int],
-                 generate_npc: Callable[[int, int], Optional[NonPlayerCharacter]]):
+                 generate_npc: Callable[[int, int], Optional[NonPlayerCharacter]], rng: Optional[random.Random] = None):
         self.world_size = world_size
         self.max_num_rooms = max_num_rooms
         self.room_allowed_width = room_allowed_width
         self.room_allowed_height = room_allowed_height
         self.corridor_allowed_width = corridor_allowed_width
         self.generate_npc = generate_npc
+        # Pass in a seeded generator to make the dungeon reproducible. Otherwise the global one is used.
+        self.random = rng if rng is not None else random
 
     def generate_random_grid(self) -> Tuple[Grid, List[Rect]]:
         rooms, corridors = self._generate_rooms_and_corridors(self.world_size)
@@ -200,23 +387,23 @@ class DungeonGenerator:
     def generate_random_dungeon_from_grid(self, grid: Grid, rooms: List[Rect]) -> GeneratedDungeon:
         decorations, walls = self._create_floor_tiles_and_walls_from_grid(grid, (0, grid.size[0]), (0, grid.size[1]))
         world_area = Rect(0, 0, grid.size[0] * CELL_SIZE, grid.size[1] * CELL_SIZE)
-        start_room = random.choice(rooms)
+        start_room = self.random.choice(rooms)
         player_position = self._get_room_center(start_room)
         npcs = self._generate_npcs(rooms, start_room)
         return GeneratedDungeon(decorations, walls, world_area, player_position, npcs)
 
     def _generate_room(self, map_size: Tuple[int, int]) -> Rect:
-        w = random.randint(self.room_allowed_width[0], self.room_allowed_width[1] + 1)
-        h = random.randint(self.room_allowed_height[0], self.room_allowed_height[1] + 1)
-        x = random.randint(1, map_size[0] - w - 3)
-        y = random.randint(1, map_size[1] - h - 3)
+        w = self.random.randint(self.room_allowed_width[0], self.room_allowed_width[1] + 1)
+        h = self.random.randint(self.room_allowed_height[0], self.room_allowed_height[1] + 1)
+        x = self.random.randint(1, map_size[0] - w - 3)
+        y = self.random.randint(1, map_size[1] - h - 3)
         return Rect(x, y, w, h)
 
     def _generate_corridor_between_rooms(self, room1: Rect, room2: Rect) -> List[Rect]:
         x1, y1 = room1.x + room1.w // 2, room1.y + room1.h // 2
         x2, y2 = room2.x + room2.w // 2, room2.y + room2.h // 2
 
-        width = random.randint(self.corridor_allowed_width[0], self.corridor_allowed_width[1] + 1)
+        width = self.random.randint(self.corridor_allowed_width[0], self.corridor_allowed_width[1] + 1)
 
         ver_rect = Rect(x1 - (width - 1) // 2, min(y1, y2) - (width - 1) // 2, width, abs(y1 - y2) + width)
         hor_rect = Rect(min(x1, x2) - (width - 1) // 2, y2 - (width - 1) // 2, abs(x1 - x2) + width, width)
@@ -251,65 +438,24 @@ class DungeonGenerator:
 
     @staticmethod
     def determine_wall_type(grid: Grid, cell: Tuple[int, int]) -> WallType:
-        x, y = cell
-        w = (x - 1, y)
-        e = (x + 1, y)
-        s = (x, y + 1)
-        n = (x, y - 1)
-        se = (x + 1, y + 1)
-        ne = (x + 1, y - 1)
-        sw = (x - 1, y + 1)
-        nw = (x - 1, y - 1)
-
-        # straights:
-        if grid.is_wall(w) and grid.is_wall(e) and grid.is_floor(s):
-            return WallType.WALL_DIRECTIONAL_N
-        if grid.is_wall(w) and grid.is_wall(e) and grid.is_floor(n):
-            return WallType.WALL_DIRECTIONAL_S
-        if grid.is_wall(n) and grid.is_wall(s) and grid.is_floor(e):
-            return WallType.WALL_DIRECTIONAL_W
-        if grid.is_wall(n) and grid.is_wall(s) and grid.is_floor(w):
-            return WallType.WALL_DIRECTIONAL_E
-
-        # diagonals:
-        if grid.is_wall(w) and grid.is_wall(n):
-            if grid.is_floor(se) and grid.is_floor(s) and grid.is_floor(e):
-                return WallType.WALL_DIRECTIONAL_POINTY_NW
-            elif grid.is_floor(nw):
-                return WallType.WALL_DIRECTIONAL_SE
-        if grid.is_wall(w) and grid.is_wall(s):
-            if grid.is_floor(ne) and grid.is_floor(n) and grid.is_floor(e):
-                return WallType.WALL_DIRECTIONAL_POINTY_SW
-            elif grid.is_floor(sw):
-                return WallType.WALL_DIRECTIONAL_NE
-        if grid.is_wall(e) and grid.is_wall(n):
-            if grid.is_floor(sw) and grid.is_floor(s) and grid.is_floor(w):
-                return WallType.WALL_DIRECTIONAL_POINTY_NE
-            elif grid.is_floor(ne):
-                return WallType.WALL_DIRECTIONAL_SW
-        if grid.is_wall(e) and grid.is_wall(s):
-            if grid.is_floor(nw) and grid.is_floor(n) and grid.is_floor(w):
-                return WallType.WALL_DIRECTIONAL_POINTY_SE
-            elif grid.is_floor(se):
-                return WallType.WALL_DIRECTIONAL_NW
-
-        print("WARNING: Couldn't find fitting wall type for cell: " + str(cell))
-        return WallType.WALL
+        return DungeonGenerator.get_wall_type_for_neighbourhood(grid.get_neighbourhood(cell), cell)
+
+    @staticmethod
+    def get_wall_type_for_neighbourhood(neighbourhood: int, cell: Tuple[int, int]) -> WallType:
+        wall_type = _WALL_TYPES_BY_NEIGHBOURHOOD[neighbourhood]
+        if wall_type is None:
+            print("WARNING: Couldn't find fitting wall type for cell: " + str(cell))
+            return WallType.WALL
+        return wall_type
 
     def _create_floor_tiles_and_walls_from_grid(self, grid: Grid, xrange: Tuple[int, int], yrange: Tuple[int, int]) -> \
             Tuple[List[DecorationEntity], List[Wall]]:
-        decorations: List[DecorationEntity] = []
-        walls: List[Wall] = []
-
-        for y in range(yrange[0], yrange[1]):
-            for x in range(xrange[0], xrange[1]):
-                position = (x * CELL_SIZE, y * CELL_SIZE)
-                is_even_cell = x % 2 == 0 and y % 2 == 0  # ground sprite covers 4 cells, so we only need them on even cells
-                if is_even_cell and any([grid.is_floor(c) for c in [(x, y), (x + 1, y), (x, y + 1), (x + 1, y + 1)]]):
-                    decorations.append(create_decoration_entity(position, Sprite.DECORATION_GROUND_STONE))
-                if grid.is_wall((x, y)):
-                    wall_type = self.determine_wall_type(grid, (x, y))
-                    walls.append(create_wall(wall_type, position))
+        floor_tiles, wall_cells = grid.get_floor_tiles_and_walls(xrange[0], yrange[0], xrange[1], yrange[1])
+        decorations = [create_decoration_entity((x * CELL_SIZE, y * CELL_SIZE), Sprite.DECORATION_GROUND_STONE)
+                       for (x, y) in floor_tiles]
+        walls = [create_wall(self.get_wall_type_for_neighbourhood(neighbourhood, (x, y)),
+                             (x * CELL_SIZE, y * CELL_SIZE))
+                 for ((x, y), neighbourhood) in wall_cells]
         return decorations, walls
 
     def _generate_npcs(self, rooms: List[Rect], start_room: Rect) -> List[NonPlayerCharacter]:
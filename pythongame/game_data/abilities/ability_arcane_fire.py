@@ -5,7 +5,7 @@ from pythongame.core.common import BuffType, Millis, AbilityType, Sprite, Projec
     SoundId, HeroUpgradeId
 from pythongame.core.damage_interactions import deal_player_damage_to_enemy, DamageType
 from pythongame.core.game_data import register_ui_icon_sprite_path, \
-    register_entity_sprite_initializer, register_buff_as_channeling
+    register_entity_sprite_initializer, register_buff_as_channeling, register_sprites_spawned_by_ability
 from pythongame.core.game_state import GameState, NonPlayerCharacter, Projectile, CameraShake
 from pythongame.core.hero_upgrades import register_hero_upgrade_effect, AbstractHeroUpgradeEffect
 from pythongame.core.math import get_position_from_center_position
@@ -50,7 +50,7 @@ class Channeling(AbstractBuffEffect):
             entity = WorldEntity(projectile_pos, PROJECTILE_SIZE, Sprite.PROJECTILE_PLAYER_ARCANE_FIRE,
                                  game_state.game_world.player_entity.direction, PROJECTILE_SPEED)
             projectile = Projectile(entity, create_projectile_controller(ProjectileType.PLAYER_ARCANE_FIRE))
-            game_state.game_world.projectile_entities.append(projectile)
+            game_state.game_world.add_projectile(projectile)
             game_state.game_world.visual_effects.append(
                 VisualRect((250, 0, 250), player_center_position, 45, 60, Millis(250), 1))
 
@@ -99,6 +99,7 @@ def register_arcane_fire_ability():
     register_entity_sprite_initializer(
         Sprite.PROJECTILE_PLAYER_ARCANE_FIRE,
         SpriteInitializer("resources/graphics/magic_missile.png", PROJECTILE_SIZE))
+    register_sprites_spawned_by_ability(AbilityType.ARCANE_FIRE, [Sprite.PROJECTILE_PLAYER_ARCANE_FIRE])
     register_projectile_controller(ProjectileType.PLAYER_ARCANE_FIRE, ProjectileController)
     register_buff_as_channeling(BuffType.CHANNELING_ARCANE_FIRE)
     register_hero_upgrade_effect(HeroUpgradeId.ABILITY_ARCANE_FIRE_COOLDOWN,
@@ -33,6 +33,7 @@ def _apply_ability(game_state: GameState) -> AbilityResult:
 
 
 class BloodLust(StatModifyingBuffEffect):
+    handled_events = (EnemyDiedEvent,)
 
     def __init__(self):
         super().__init__(BUFF_TYPE, {HeroStat.LIFE_STEAL: LIFE_STEAL_BONUS_RATIO, HeroStat.MOVEMENT_SPEED: SPEED_BONUS})
@@ -1,7 +1,5 @@
 from typing import Optional
 
-from pygame.rect import Rect
-
 from pythongame.core.abilities import AbilityData, register_ability_data
 from pythongame.core.ability_effects import register_ability_effect, AbilityResult, AbilityWasUsedSuccessfully, \
     AbilityFailedToExecute
@@ -13,7 +11,7 @@ from pythongame.core.damage_interactions import deal_player_damage_to_enemy, Dam
 from pythongame.core.game_data import register_ui_icon_sprite_path, \
     register_buff_text
 from pythongame.core.game_state import GameState, NonPlayerCharacter, CameraShake
-from pythongame.core.math import translate_in_direction
+from pythongame.core.math import translate_in_direction, get_swept_rect, get_time_of_impact
 from pythongame.core.visual_effects import VisualCircle, VisualRect, VisualLine
 from pythongame.core.world_entity import WorldEntity
 
@@ -69,33 +67,26 @@ def _apply_ability(game_state: GameState) -> AbilityResult:
     return AbilityFailedToExecute(reason="No space")
 
 
+# The first enemy that the player passes through on the way
 def _get_enemy_that_was_hit(game_state: GameState, player_entity: WorldEntity, distance_jumped: int) \
         -> Optional[NonPlayerCharacter]:
-    previous_position = (player_entity.x, player_entity.y)
-    partial_distance = 10
-    while partial_distance < distance_jumped:
-        intermediate_position = translate_in_direction(previous_position, player_entity.direction, partial_distance)
-        enemies_hit = game_state.game_world.get_enemy_intersecting_rect(
-            Rect(intermediate_position[0], intermediate_position[1], player_entity.pygame_collision_rect.w,
-                 player_entity.pygame_collision_rect.h))
-        if enemies_hit:
-            return enemies_hit[0]
-        partial_distance += 10
-    return None
+    rect = player_entity.pygame_collision_rect
+    movement = translate_in_direction((0, 0), player_entity.direction, distance_jumped)
+    first_enemy_hit = None
+    first_time_of_impact = None
+    for enemy in game_state.game_world.get_enemy_intersecting_rect(get_swept_rect(rect, movement)):
+        time_of_impact = get_time_of_impact(rect, movement, enemy.world_entity.pygame_collision_rect)
+        if time_of_impact is not None and (first_time_of_impact is None or time_of_impact < first_time_of_impact):
+            first_enemy_hit = enemy
+            first_time_of_impact = time_of_impact
+    return first_enemy_hit
 
 
 def _would_collide_with_wall(game_state: GameState, player_entity: WorldEntity, distance_jumped: int) -> bool:
-    previous_position = (player_entity.x, player_entity.y)
-    partial_distance = 10
-    while partial_distance < distance_jumped:
-        intermediate_position = translate_in_direction(previous_position, player_entity.direction, partial_distance)
-        intersection = game_state.game_world.walls_state.does_rect_intersect_with_wall(
-            (intermediate_position[0], intermediate_position[1], player_entity.pygame_collision_rect.w,
-             player_entity.pygame_collision_rect.h))
-        if intersection:
-            return True
-        partial_distance += 10
-    return False
+    movement = translate_in_direction((0, 0), player_entity.direction, distance_jumped)
+    time_of_impact = game_state.game_world.get_time_of_impact(
+        player_entity.pygame_collision_rect, movement, include_blocking_entities=False)
+    return time_of_impact is not None
 
 
 class FromStealth(StatModifyingBuffEffect):
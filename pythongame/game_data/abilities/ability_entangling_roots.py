@@ -5,7 +5,7 @@ from pythongame.core.common import Sprite, ProjectileType, AbilityType, Millis,
     Direction, BuffType, SoundId, UiIconSprite, PeriodicTimer, HeroUpgradeId
 from pythongame.core.damage_interactions import deal_player_damage_to_enemy, DamageType
 from pythongame.core.game_data import register_ui_icon_sprite_path, \
-    register_entity_sprite_map
+    register_entity_sprite_map, register_sprites_spawned_by_ability
 from pythongame.core.game_state import GameState, Projectile, NonPlayerCharacter
 from pythongame.core.hero_upgrades import register_hero_upgrade_effect, AbstractHeroUpgradeEffect
 from pythongame.core.math import get_position_from_center_position, translate_in_direction
@@ -61,7 +61,7 @@ def _apply_ability(game_state: GameState) -> AbilityResult:
     entity = WorldEntity(projectile_pos, PROJECTILE_SIZE, PROJECTILE_SPRITE, player_entity.direction,
                          projectile_speed)
     projectile = Projectile(entity, create_projectile_controller(PROJECTILE_TYPE))
-    game_state.game_world.projectile_entities.append(projectile)
+    game_state.game_world.add_projectile(projectile)
     effect_position = (projectile_pos[0] + PROJECTILE_SIZE[0] // 2,
                        projectile_pos[1] + PROJECTILE_SIZE[1] // 2)
     game_state.game_world.visual_effects.append(VisualCircle((250, 150, 50), effect_position, 9, 18, Millis(80), 0))
@@ -120,6 +120,7 @@ def register_entangling_roots_ability():
                                (0, 0))
     register_buff_effect(BUFF_TYPE, Rooted)
     _register_engangling_roots_effect_decoration()
+    register_sprites_spawned_by_ability(ABILITY_TYPE, [PROJECTILE_SPRITE, Sprite.DECORATION_ENTANGLING_ROOTS_EFFECT])
     register_hero_upgrade_effect(HeroUpgradeId.ABILITY_ENTANGLING_ROOTS_COOLDOWN, UpgradeEntanglingRootsCooldown())
 
 
@@ -8,7 +8,7 @@ from pythongame.core.common import Sprite, ProjectileType, AbilityType, Millis,
     Direction, SoundId, BuffType, PeriodicTimer, HeroUpgradeId
 from pythongame.core.damage_interactions import deal_player_damage_to_enemy, DamageType
 from pythongame.core.game_data import UiIconSprite, \
-    register_ui_icon_sprite_path, register_entity_sprite_map
+    register_ui_icon_sprite_path, register_entity_sprite_map, register_sprites_spawned_by_ability
 from pythongame.core.game_state import GameState, Projectile, NonPlayerCharacter
 from pythongame.core.hero_upgrades import register_hero_upgrade_effect, AbstractHeroUpgradeEffect
 from pythongame.core.math import get_position_from_center_position, translate_in_direction
@@ -95,7 +95,7 @@ def _apply_ability(game_state: GameState) -> AbilityResult:
     entity = WorldEntity(projectile_pos, PROJECTILE_SIZE, Sprite.PROJECTILE_PLAYER_FIREBALL, player_entity.direction,
                          projectile_speed)
     projectile = Projectile(entity, create_projectile_controller(ProjectileType.PLAYER_FIREBALL))
-    game_state.game_world.projectile_entities.append(projectile)
+    game_state.game_world.add_projectile(projectile)
     effect_position = (projectile_pos[0] + PROJECTILE_SIZE[0] // 2,
                        projectile_pos[1] + PROJECTILE_SIZE[1] // 2)
     game_state.game_world.visual_effects.append(VisualCircle((250, 150, 50), effect_position, 15, 5, Millis(300), 0))
@@ -132,6 +132,7 @@ def register_fireball_ability():
         Direction.DOWN: [(x, 6) for x in range(8)]
     }
     scaled_sprite_size = (48, 48)
+    register_sprites_spawned_by_ability(AbilityType.FIREBALL, [Sprite.PROJECTILE_PLAYER_FIREBALL])
     register_entity_sprite_map(Sprite.PROJECTILE_PLAYER_FIREBALL, sprite_sheet, original_sprite_size,
                                scaled_sprite_size, indices_by_dir, (-9, -9))
     register_buff_effect(BUFF_TYPE, BurntByFireball)
@@ -5,7 +5,7 @@ from pythongame.core.common import AbilityType, Millis, \
     Direction, BuffType, UiIconSprite
 from pythongame.core.damage_interactions import deal_player_damage_to_enemy, DamageType
 from pythongame.core.game_data import register_ui_icon_sprite_path, \
-    register_entity_sprite_map
+    register_entity_sprite_map, register_sprites_spawned_by_ability
 from pythongame.core.game_state import GameState, NonPlayerCharacter
 from pythongame.core.math import get_position_from_center_position
 from pythongame.core.view.image_loading import SpriteSheet
@@ -72,4 +72,5 @@ def register_frost_nova_ability():
     }
     register_entity_sprite_map(Sprite.EFFECT_ABILITY_FROST_NOVA, sprite_sheet, original_sprite_size, EFFECT_SPRITE_SIZE,
                                indices_by_dir, (0, 0))
+    register_sprites_spawned_by_ability(ability_type, [Sprite.EFFECT_ABILITY_FROST_NOVA])
     register_buff_effect(BuffType.REDUCED_MOVEMENT_SPEED, ReducedMovementSpeed)
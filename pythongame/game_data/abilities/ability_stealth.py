@@ -33,6 +33,7 @@ def _apply_ability(game_state: GameState) -> AbilityResult:
 
 
 class Stealthing(StatModifyingBuffEffect):
+    handled_events = (PlayerUsedAbilityEvent, PlayerLostHealthEvent)
 
     def __init__(self, movement_speed_decrease: float):
         super().__init__(BUFF_STEALTH, {HeroStat.MOVEMENT_SPEED: -movement_speed_decrease})
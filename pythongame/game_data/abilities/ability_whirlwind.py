@@ -7,7 +7,7 @@ from pythongame.core.common import AbilityType, Sprite, \
     ProjectileType, Millis, Direction, BuffType, SoundId, PeriodicTimer, HeroUpgradeId
 from pythongame.core.damage_interactions import deal_player_damage_to_enemy, DamageType
 from pythongame.core.game_data import UiIconSprite, \
-    register_ui_icon_sprite_path, register_entity_sprite_map
+    register_ui_icon_sprite_path, register_entity_sprite_map, register_sprites_spawned_by_ability
 from pythongame.core.game_state import GameState, Projectile, NonPlayerCharacter
 from pythongame.core.math import get_position_from_center_position, translate_in_direction
 from pythongame.core.projectile_controllers import create_projectile_controller, AbstractProjectileController, \
@@ -35,7 +35,7 @@ def _apply_ability(game_state: GameState) -> AbilityResult:
     projectile_speed = 0.1
     entity = WorldEntity(aoe_pos, PROJECTILE_SIZE, PROJECTILE_SPRITE, player_entity.direction, projectile_speed)
     projectile = Projectile(entity, create_projectile_controller(PROJECTILE_TYPE))
-    game_state.game_world.projectile_entities.append(projectile)
+    game_state.game_world.add_projectile(projectile)
     has_lightfooted_upgrade = game_state.player_state.has_upgrade(HeroUpgradeId.MAGE_LIGHT_FOOTED)
     if not has_lightfooted_upgrade:
         game_state.player_state.gain_buff_effect(get_buff_effect(BuffType.RECOVERING_AFTER_ABILITY), Millis(300))
@@ -126,5 +126,6 @@ def register_whirlwind_ability():
     }
     register_entity_sprite_map(PROJECTILE_SPRITE, sprite_sheet, original_sprite_size, scaled_sprite_size,
                                indices_by_dir, (-8, -50))
+    register_sprites_spawned_by_ability(ability_type, [PROJECTILE_SPRITE])
     register_projectile_controller(PROJECTILE_TYPE, ProjectileController)
     register_buff_effect(BUFF_TYPE, Stunned)
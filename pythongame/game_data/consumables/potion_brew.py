@@ -27,6 +27,7 @@ def _apply(game_state: GameState):
 
 
 class RestoringHealthFromBrew(AbstractBuffEffect):
+    handled_events = (PlayerLostHealthEvent,)
     def __init__(self):
         self.timer = PeriodicTimer(Millis(600))
 
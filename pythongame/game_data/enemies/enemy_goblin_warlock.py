@@ -6,7 +6,8 @@ from pythongame.core.common import Millis, NpcType, Sprite, \
     ProjectileType, BuffType, Direction, SoundId, LootTableId
 from pythongame.core.damage_interactions import deal_damage_to_player, deal_npc_damage_to_npc, DamageType
 from pythongame.core.enemy_target_selection import EnemyTarget, get_target
-from pythongame.core.game_data import NpcData, register_buff_text, register_entity_sprite_map
+from pythongame.core.game_data import NpcData, register_buff_text, register_entity_sprite_map, \
+    register_sprites_spawned_by_npc
 from pythongame.core.game_state import GameState, NonPlayerCharacter, Projectile
 from pythongame.core.math import get_perpendicular_directions
 from pythongame.core.npc_behaviors import AbstractNpcMind, EnemyShootProjectileTrait
@@ -176,6 +177,7 @@ def register_goblin_warlock_enemy():
     projectile_sprite = Sprite.PROJECTILE_ENEMY_GOBLIN_WARLOCK
     register_entity_sprite_map(projectile_sprite, projectile_sprite_sheet, projectile_original_sprite_size,
                                projectile_scaled_sprite_size, projectile_indices_by_dir, (0, 0))
+    register_sprites_spawned_by_npc(NpcType.GOBLIN_WARLOCK, [projectile_sprite])
 
     register_buff_effect(BUFF_TYPE, Burnt)
     register_buff_text(BUFF_TYPE, "Burnt")
@@ -1,6 +1,6 @@
 from pythongame.core.common import Millis, NpcType, Sprite, Direction, SoundId
 from pythongame.core.entity_creation import create_npc
-from pythongame.core.game_data import NpcData
+from pythongame.core.game_data import NpcData, register_npcs_summoned_by_npc
 from pythongame.core.game_state import GameState, NonPlayerCharacter
 from pythongame.core.npc_behaviors import AbstractNpcMind, EnemySummonTrait, EnemyRandomWalkTrait
 from pythongame.core.pathfinding.grid_astar_pathfinder import GlobalPathFinder
@@ -8,11 +8,12 @@ from pythongame.core.world_entity import WorldEntity
 from pythongame.game_data.enemies.register_enemies_util import register_basic_enemy
 from pythongame.game_data.loot_tables import LootTableId
 
+SUMMONED_NPC_TYPES = [NpcType.FIRE_DEMON]
 
 class NpcMind(AbstractNpcMind):
     def __init__(self, global_path_finder: GlobalPathFinder):
         super().__init__(global_path_finder)
-        self._summon_trait = EnemySummonTrait(2, [NpcType.FIRE_DEMON], (Millis(500), Millis(4000)), create_npc)
+        self._summon_trait = EnemySummonTrait(2, SUMMONED_NPC_TYPES, (Millis(500), Millis(4000)), create_npc)
         self._random_walk_trait = EnemyRandomWalkTrait(Millis(750))
 
     def control_npc(self, game_state: GameState, npc: NonPlayerCharacter, player_entity: WorldEntity,
@@ -48,3 +49,4 @@ def register_human_summoner_enemy():
         spritesheet_indices=indices_by_dir,
         sprite_position_relative_to_entity=(-8, -16)
     )
+    register_npcs_summoned_by_npc(NpcType.HUMAN_SUMMONER, SUMMONED_NPC_TYPES)
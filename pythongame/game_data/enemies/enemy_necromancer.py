@@ -4,7 +4,7 @@ from pythongame.core.common import Millis, NpcType, Sprite, Direction, SoundId,
     LootTableId
 from pythongame.core.damage_interactions import deal_damage_to_player, DamageType, deal_npc_damage_to_npc
 from pythongame.core.entity_creation import create_npc
-from pythongame.core.game_data import NpcData
+from pythongame.core.game_data import NpcData, register_npcs_summoned_by_npc
 from pythongame.core.game_state import GameState, NonPlayerCharacter, Projectile
 from pythongame.core.math import get_position_from_center_position, is_x_and_y_within_distance, \
     get_directions_to_position, translate_in_direction
@@ -19,6 +19,7 @@ from pythongame.game_data.enemies.register_enemies_util import register_basic_en
 
 PROJECTILE_TYPE = ProjectileType.ENEMY_NECROMANCER
 PROJECTILE_SIZE = (30, 30)
+SUMMONED_NPC_TYPES = [NpcType.ZOMBIE, NpcType.MUMMY]
 
 
 class NpcMind(AbstractNpcMind):
@@ -28,8 +29,7 @@ class NpcMind(AbstractNpcMind):
         self._healing_cooldown = self._random_healing_cooldown()
         self._time_since_shoot = 0
         self._shoot_cooldown = self._random_shoot_cooldown()
-        self._summon_trait = EnemySummonTrait(3, [NpcType.ZOMBIE, NpcType.MUMMY], (Millis(500), Millis(5500)),
-                                              create_npc)
+        self._summon_trait = EnemySummonTrait(3, SUMMONED_NPC_TYPES, (Millis(500), Millis(5500)), create_npc)
         self._random_walk_trait = EnemyRandomWalkTrait(Millis(750))
 
     def control_npc(self, game_state: GameState, npc: NonPlayerCharacter, player_entity: WorldEntity,
@@ -48,9 +48,8 @@ class NpcMind(AbstractNpcMind):
             self._healing_cooldown = self._random_healing_cooldown()
             necro_center_pos = npc.world_entity.get_center_position()
             nearby_hurt_enemies = [
-                e for e in game_state.game_world.non_player_characters
-                if e.is_enemy
-                   and is_x_and_y_within_distance(necro_center_pos, e.world_entity.get_center_position(), 200)
+                e for e in game_state.game_world.enemies
+                if is_x_and_y_within_distance(necro_center_pos, e.world_entity.get_center_position(), 200)
                    and e != npc and not e.health_resource.is_at_max()
             ]
             if nearby_hurt_enemies:
@@ -75,7 +74,7 @@ class NpcMind(AbstractNpcMind):
             projectile_entity = WorldEntity(projectile_pos, PROJECTILE_SIZE, Sprite.NONE, npc.world_entity.direction,
                                             projectile_speed)
             projectile = Projectile(projectile_entity, create_projectile_controller(PROJECTILE_TYPE))
-            game_state.game_world.projectile_entities.append(projectile)
+            game_state.game_world.add_projectile(projectile)
             play_sound(SoundId.ENEMY_ATTACK_NECRO)
 
     @staticmethod
@@ -151,5 +150,6 @@ def register_necromancer_enemy():
         spritesheet_indices=indices_by_dir,
         sprite_position_relative_to_entity=(-6, -28)
     )
+    register_npcs_summoned_by_npc(NpcType.NECROMANCER, SUMMONED_NPC_TYPES)
 
     register_projectile_controller(PROJECTILE_TYPE, ProjectileController)
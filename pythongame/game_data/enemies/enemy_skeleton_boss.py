@@ -78,7 +78,7 @@ class NpcMind(MeleeEnemyNpcMind):
                 projectile_entity = WorldEntity(projectile_pos, PROJECTILE_SIZE, Sprite.NONE,
                                                 npc.world_entity.direction, projectile_speed)
                 projectile = Projectile(projectile_entity, create_projectile_controller(PROJECTILE_TYPE))
-                game_state.game_world.projectile_entities.append(projectile)
+                game_state.game_world.add_projectile(projectile)
                 play_sound(SoundId.ENEMY_MAGIC_SKELETON_BOSS)
 
 
@@ -65,6 +65,7 @@ class BuffedFromRetribution(StatModifyingBuffEffect):
 
 
 class RetributionHeroUpgrade(HeroUpgrade):
+    handled_events = (PlayerBlockedEvent,)
 
     def handle_event(self, event: Event, game_state: GameState):
         if isinstance(event, PlayerBlockedEvent):
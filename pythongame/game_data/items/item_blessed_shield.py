@@ -10,6 +10,7 @@ ITEM_TYPE = ItemType.BLESSED_SHIELD
 
 
 class ItemEffect(AbstractItemEffect):
+    handled_events = (PlayerBlockedEvent,)
 
     def item_handle_event(self, event: Event, game_state: GameState):
         if isinstance(event, PlayerBlockedEvent):
@@ -20,6 +20,7 @@ DURATION = Millis(5_000)
 
 
 class ItemEffect(AbstractItemEffect):
+    handled_events = (EnemyDiedEvent,)
 
     def item_handle_event(self, event: Event, game_state: GameState):
         if isinstance(event, EnemyDiedEvent):
@@ -21,6 +21,7 @@ DAMAGE_SOURCE = "cleaver_bleed"
 
 
 class ItemEffect(AbstractItemEffect):
+    handled_events = (PlayerDamagedEnemy,)
 
     def item_handle_event(self, event: Event, game_state: GameState):
         if isinstance(event, PlayerDamagedEnemy):
@@ -16,6 +16,7 @@ BUFF_TYPE = BuffType.DEBUFFED_BY_FREEZING_GAUNTLET
 
 
 class ItemEffect(AbstractItemEffect):
+    handled_events = (PlayerDamagedEnemy,)
 
     def item_handle_event(self, event: Event, game_state: GameState):
         if isinstance(event, PlayerDamagedEnemy):
@@ -22,6 +22,7 @@ DAMAGE_SOURCE = "goats_ring"
 
 
 class ItemEffect(AbstractItemEffect):
+    handled_events = (PlayerDamagedEnemy,)
 
     def __init__(self, proc_chance: float):
         self._proc_chance = proc_chance
@@ -12,6 +12,7 @@ BUFF_DURATION = Millis(5000)
 
 
 class ItemEffect(AbstractItemEffect):
+    handled_events = (PlayerDamagedEnemy,)
 
     def item_handle_event(self, event: Event, game_state: GameState):
         if isinstance(event, PlayerDamagedEnemy):
@@ -16,6 +16,7 @@ ABILITY_DESCRIPTION = f"Restore {ABILITY_MANA_AMOUNT} mana"
 
 
 class ItemEffect(AbstractItemEffect):
+    handled_events = (PlayerLostHealthEvent,)
 
     def item_handle_event(self, event: Event, game_state: GameState):
         if isinstance(event, PlayerLostHealthEvent):
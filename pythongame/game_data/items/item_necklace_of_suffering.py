@@ -13,6 +13,7 @@ ITEM_TYPE = ItemType.NECKLACE_OF_SUFFERING
 
 
 class ItemEffect(AbstractItemEffect):
+    handled_events = (PlayerLostHealthEvent,)
 
     def item_handle_event(self, event: Event, game_state: GameState):
         if isinstance(event, PlayerLostHealthEvent):
@@ -10,6 +10,7 @@ DAMAGE_AMOUNT = 5
 
 
 class ItemEffect(AbstractItemEffect):
+    handled_events = (PlayerBlockedEvent,)
 
     def item_handle_event(self, event: Event, game_state: GameState):
         if isinstance(event, PlayerBlockedEvent):
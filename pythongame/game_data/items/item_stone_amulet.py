@@ -18,6 +18,7 @@ BUFF_DURATION = Millis(3000)
 
 
 class ItemEffect(AbstractItemEffect):
+    handled_events = (EnemyDiedEvent,)
 
     def item_handle_event(self, event: Event, game_state: GameState):
         if isinstance(event, EnemyDiedEvent):
@@ -11,6 +11,7 @@ MANA_ON_DODGE_AMOUNT = 5
 
 
 class ItemEffect(AbstractItemEffect):
+    handled_events = (PlayerDodgedEvent,)
 
     def item_handle_event(self, event: Event, game_state: GameState):
         if isinstance(event, PlayerDodgedEvent):
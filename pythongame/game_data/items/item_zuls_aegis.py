@@ -19,6 +19,7 @@ ABILITY_DESCRIPTION = "Stun nearby enemies for " + "{:.1f}".format(STUN_DURATION
 
 
 class ItemEffect(AbstractItemEffect):
+    handled_events = (PlayerBlockedEvent,)
 
     def item_handle_event(self, event: Event, game_state: GameState):
         if isinstance(event, PlayerBlockedEvent):
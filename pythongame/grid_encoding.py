@@ -0,0 +1,48 @@
+import base64
+import re
+import zlib
+from typing import Tuple
+
+# The map editor's grid (see dungeon_generator.Grid) is stored in map files as a string. Cells are stored column by
+# column (i.e. the cell (x, y) is at index x * height + y), with one byte per cell.
+#
+# The current format is "<width>x<height>:" followed by the zlib-compressed and base64-encoded cells. Maps consist
+# mostly of long runs of identical cells, so this is typically a few kilobytes even for large maps.
+#
+# Older map files contain the grid as a Python literal with one list of cell values per column, like
+# "[[0, 0, 1], [0, 3, 1]]". That format is still supported when reading.
+
+_LEGACY_FORMAT_PREFIX = "["
+_HEADER_PATTERN = re.compile(r"(\d+)x(\d+):")
+_LEGACY_CELL_PATTERN = re.compile(r"\d+")
+
+
+def encode_grid(cells: bytes, size: Tuple[int, int]) -> str:
+    if len(cells) != size[0] * size[1]:
+        raise ValueError("Expected %i cells for grid of size %s, but got %i" % (size[0] * size[1], size, len(cells)))
+    compressed = base64.b64encode(zlib.compress(bytes(cells), 9)).decode("ascii")
+    return "%ix%i:%s" % (size[0], size[1], compressed)
+
+
+def decode_grid(string: str) -> Tuple[bytearray, Tuple[int, int]]:
+    if string.startswith(_LEGACY_FORMAT_PREFIX):
+        return _decode_legacy_grid(string)
+    header = _HEADER_PATTERN.match(string)
+    if not header:
+        raise ValueError("Invalid grid string: '%s...'" % string[:20])
+    size = (int(header.group(1)), int(header.group(2)))
+    cells = bytearray(zlib.decompress(base64.b64decode(string[header.end():])))
+    if len(cells) != size[0] * size[1]:
+        raise ValueError("Expected %i cells for grid of size %s, but got %i" % (size[0] * size[1], size, len(cells)))
+    return cells, size
+
+
+# Parsing the literal with ast.literal_eval is very slow for large grids. As it only contains (non-negative) integers
+# and brackets, we can just pick out the numbers instead.
+def _decode_legacy_grid(string: str) -> Tuple[bytearray, Tuple[int, int]]:
+    cells = bytearray(int(value) for value in _LEGACY_CELL_PATTERN.findall(string))
+    # Every column is a list of its own, within the outer list
+    width = string.count("[") - 1
+    if width <= 0 or len(cells) % width != 0:
+        raise ValueError("Invalid grid string: '%s...'" % string[:20])
+    return cells, (width, len(cells) // width)
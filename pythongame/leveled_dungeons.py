@@ -1,15 +1,25 @@
+import os
 import random
-from typing import Optional, Tuple, Callable
+from typing import Optional, Tuple, Callable, Any
 
 from pythongame.core.common import NpcType
 from pythongame.core.entity_creation import create_hero_world_entity, create_npc
 from pythongame.core.game_state import GameState, NonPlayerCharacter, PlayerState, GameWorldState
 from pythongame.dungeon_generator import GeneratedDungeon, DungeonGenerator
+from pythongame.map_file import load_map_from_file, MapJson
+from pythongame.map_file_binary import BINARY_MAP_FILE_EXTENSION, BinaryMapFormatError, write_binary_map_to_file
+
+# Dungeons can be generated ahead of time (see generate_dungeon.py) and stored here, with one sub-directory per
+# difficulty level. When the player enters a dungeon, one of these is picked if there are any, instead of generating a
+# new one. That way, the set of dungeons that players encounter can be generated (and inspected) beforehand.
+DUNGEON_POOL_DIR = "dungeon_pool/"
 
 
 def create_dungeon_game_state(player_state: PlayerState, camera_size: Tuple[int, int],
-                              difficulty_level: int) -> GameState:
-    dungeon = _generate_dungeon(difficulty_level)
+                              difficulty_level: int, use_dungeon_pool: bool = True) -> GameState:
+    dungeon = _pick_dungeon_from_pool(difficulty_level) if use_dungeon_pool else None
+    if dungeon is None:
+        dungeon = generate_dungeon(difficulty_level)
     player_entity = create_hero_world_entity(player_state.hero_id, dungeon.player_position)
     game_world = GameWorldState(
         player_entity=player_entity,
@@ -34,22 +44,68 @@ def create_dungeon_game_state(player_state: PlayerState, camera_size: Tuple[int,
     )
 
 
-def _generate_dungeon(difficulty_level: int) -> GeneratedDungeon:
+# If a seed is given, the same dungeon is generated every time (for a given difficulty level). Otherwise the global
+# random number generator is used.
+def generate_dungeon(difficulty_level: int, seed: Optional[int] = None) -> GeneratedDungeon:
+    dungeon_generator = create_dungeon_generator(difficulty_level, seed)
+    grid, rooms = dungeon_generator.generate_random_grid()
+    return dungeon_generator.generate_random_dungeon_from_grid(grid, rooms)
+
+
+def create_dungeon_generator(difficulty_level: int, seed: Optional[int] = None) -> DungeonGenerator:
+    rng = random.Random(seed) if seed is not None else random
     # Prefer maps that are longer on the horizontal axis, due to the aspect ratio of the in-game camera
-    w = random.randint(70, 100)
+    w = rng.randint(70, 100)
     world_size = (w, 140 - w)
-    dungeon_generator = DungeonGenerator(
+    generate_npc = _generate_npc_function(difficulty_level)
+    return DungeonGenerator(
         world_size=world_size,
         max_num_rooms=5,
         room_allowed_width=(8, 25),
         room_allowed_height=(8, 25),
         corridor_allowed_width=(3, 5),
-        generate_npc=_generate_npc_function(difficulty_level))
-    grid, rooms = dungeon_generator.generate_random_grid()
-    return dungeon_generator.generate_random_dungeon_from_grid(grid, rooms)
+        generate_npc=lambda x, y: generate_npc(rng, x, y),
+        rng=rng)
+
+
+def get_dungeon_pool_dir(difficulty_level: int) -> str:
+    return os.path.join(DUNGEON_POOL_DIR, "level_%i" % difficulty_level)
+
+
+def get_dungeon_pool_file_path(difficulty_level: int, seed: int) -> str:
+    return os.path.join(get_dungeon_pool_dir(difficulty_level), str(seed) + BINARY_MAP_FILE_EXTENSION)
+
+
+def save_dungeon_to_file(dungeon: GeneratedDungeon, file_path: str):
+    json_data = MapJson.serialize_from_data(dungeon.walls, dungeon.decorations, [], dungeon.world_area,
+                                            dungeon.player_position, dungeon.npcs)
+    write_binary_map_to_file(json_data, file_path)
+
+
+def load_dungeon_from_file(file_path: str) -> GeneratedDungeon:
+    map_data = load_map_from_file(file_path)
+    game_world = map_data.game_world
+    return GeneratedDungeon(game_world.decorations_state.decoration_entities, game_world.walls_state.walls,
+                            game_world.entire_world_area, map_data.player_position, game_world.non_player_characters)
+
+
+def _pick_dungeon_from_pool(difficulty_level: int) -> Optional[GeneratedDungeon]:
+    pool_dir = get_dungeon_pool_dir(difficulty_level)
+    if not os.path.isdir(pool_dir):
+        return None
+    file_names = [f for f in os.listdir(pool_dir) if f.endswith(BINARY_MAP_FILE_EXTENSION)]
+    if not file_names:
+        return None
+    file_path = os.path.join(pool_dir, random.choice(file_names))
+    try:
+        return load_dungeon_from_file(file_path)
+    # The loader reports any kind of broken map file as a BinaryMapFormatError. Other errors are bugs, not bad files.
+    except (OSError, BinaryMapFormatError) as e:
+        print("WARN: Failed to load pre-generated dungeon %s (%s). Generating a new one instead." % (file_path, e))
+        return None
 
 
-def _generate_npc_function(difficulty_level: int) -> Callable[[int, int], Optional[NonPlayerCharacter]]:
+def _generate_npc_function(difficulty_level: int) -> Callable[[Any, int, int], Optional[NonPlayerCharacter]]:
     if difficulty_level == 1:
         return _generate_npc_1
     elif difficulty_level == 2:
@@ -63,29 +119,29 @@ def _generate_npc_function(difficulty_level: int) -> Callable[[int, int], Option
         return _generate_npc_4
 
 
-def _generate_npc_1(x: int, y: int) -> Optional[NonPlayerCharacter]:
+def _generate_npc_1(rng, x: int, y: int) -> Optional[NonPlayerCharacter]:
     valid_enemy_types = [NpcType.GOBLIN_SPEARMAN_ELITE, NpcType.SKELETON_MAGE, NpcType.ZOMBIE_FAST, NpcType.NECROMANCER]
-    if random.random() < 0.3:
-        npc_type = random.choice(valid_enemy_types)
+    if rng.random() < 0.3:
+        npc_type = rng.choice(valid_enemy_types)
         return create_npc(npc_type, (x, y))
 
 
-def _generate_npc_2(x: int, y: int) -> Optional[NonPlayerCharacter]:
+def _generate_npc_2(rng, x: int, y: int) -> Optional[NonPlayerCharacter]:
     valid_enemy_types = [NpcType.WARRIOR, NpcType.VETERAN, NpcType.ICE_WITCH]
-    if random.random() < 0.5:
-        npc_type = random.choice(valid_enemy_types)
+    if rng.random() < 0.5:
+        npc_type = rng.choice(valid_enemy_types)
         return create_npc(npc_type, (x, y))
 
 
-def _generate_npc_3(x: int, y: int) -> Optional[NonPlayerCharacter]:
+def _generate_npc_3(rng, x: int, y: int) -> Optional[NonPlayerCharacter]:
     valid_enemy_types = [NpcType.HUMAN_SUMMONER, NpcType.ICE_WITCH, NpcType.VETERAN]
-    if random.random() < 0.5:
-        npc_type = random.choice(valid_enemy_types)
+    if rng.random() < 0.5:
+        npc_type = rng.choice(valid_enemy_types)
         return create_npc(npc_type, (x, y))
 
 
-def _generate_npc_4(x: int, y: int) -> Optional[NonPlayerCharacter]:
+def _generate_npc_4(rng, x: int, y: int) -> Optional[NonPlayerCharacter]:
     valid_enemy_types = [NpcType.SKELETON_BOSS, NpcType.GOBLIN_WARRIOR, NpcType.WARRIOR_KING]
-    if random.random() < 0.3:
-        npc_type = random.choice(valid_enemy_types)
+    if rng.random() < 0.3:
+        npc_type = rng.choice(valid_enemy_types)
         return create_npc(npc_type, (x, y))
@@ -4,13 +4,14 @@ from typing import Optional, List, Any, Tuple, Callable
 import pygame
 
 from pythongame.core.common import Millis, SceneTransition, AbstractScene, AbstractWorldBehavior
+from pythongame.core.fixed_timestep import FixedTimestep
 from pythongame.core.game_data import ENTITY_SPRITE_INITIALIZERS, \
     UI_ICON_SPRITE_PATHS, PORTRAIT_ICON_SPRITE_PATHS
 from pythongame.core.game_state import GameState
 from pythongame.core.sound_player import init_sound_player
 from pythongame.core.view.game_world_view import GameWorldView
-from pythongame.core.view.image_loading import load_images_by_sprite, \
-    load_images_by_ui_sprite, load_images_by_portrait_sprite
+from pythongame.core.view.image_loading import LazyImagesBySprite, \
+    load_images_by_ui_sprite, load_images_by_portrait_sprite, save_image_cache
 from pythongame.player_file import SaveFileHandler
 from pythongame.register_game_data import register_all_game_data
 from pythongame.scenes.scene_challenge_complete_screen.scene_challenge_complete_screen import \
@@ -31,6 +32,8 @@ from pythongame.scenes.scenes_game.scene_playing import PlayingScene
 ABILITY_KEY_LABELS = ["Q", "W", "E", "R", "T"]
 SCREEN_SIZE = (800, 600)  # If this is not a supported resolution, performance takes a big hit
 CAMERA_SIZE = (800, 430)
+# Rendering more often than this doesn't make the game look any smoother, and only uses more CPU
+DEFAULT_MAX_FPS = 60
 
 register_all_game_data()
 
@@ -86,7 +89,8 @@ class SceneFactory(AbstractSceneFactory):
 
 class Main:
     def __init__(self, map_file_name: Optional[str], chosen_hero_id: Optional[str], hero_start_level: Optional[int],
-                 start_money: Optional[int], save_file_name: Optional[str], fullscreen: bool):
+                 start_money: Optional[int], save_file_name: Optional[str], fullscreen: bool,
+                 fixed_timestep: bool = True, max_fps: int = DEFAULT_MAX_FPS):
 
         cmd_flags = CommandlineFlags(map_file_name, chosen_hero_id, hero_start_level, start_money, save_file_name)
 
@@ -98,7 +102,7 @@ class Main:
         pygame.display.set_caption('WANDERER')
         self.fullscreen = False
         self.pygame_screen = self.setup_screen()
-        images_by_sprite = load_images_by_sprite(ENTITY_SPRITE_INITIALIZERS)
+        images_by_sprite = LazyImagesBySprite(ENTITY_SPRITE_INITIALIZERS)
         images_by_ui_sprite = load_images_by_ui_sprite(UI_ICON_SPRITE_PATHS, UI_ICON_SIZE)
         big_images_by_ui_sprite = load_images_by_ui_sprite(UI_ICON_SPRITE_PATHS, UI_ICON_BIG_SIZE)
         self.images_by_portrait_sprite = load_images_by_portrait_sprite(PORTRAIT_ICON_SPRITE_PATHS, PORTRAIT_ICON_SIZE)
@@ -110,6 +114,10 @@ class Main:
         self.save_file_handler = SaveFileHandler()
         init_sound_player()
         self.clock = pygame.time.Clock()
+        # 0 means that the frame rate isn't limited
+        self.max_fps = max_fps
+        # If disabled, the simulation is advanced once per rendered frame, by however long that frame took
+        self.fixed_timestep: Optional[FixedTimestep] = FixedTimestep() if fixed_timestep else None
 
         self.scene_factory = SceneFactory(self.pygame_screen, self.images_by_portrait_sprite, self.save_file_handler,
                                           self.ui_view, self.world_view, self.toggle_fullscreen, CAMERA_SIZE)
@@ -125,13 +133,14 @@ class Main:
                 game_state: GameState = getattr(self.scene, 'game_state', None)
                 print("Saving character to file as backup...")
                 self.save_file_handler.save_to_file(game_state.player_state, None, Millis(0))
+                self.save_file_handler.flush()
             else:
                 print("Failed to save character to file as backup!")
             raise e
 
     def _main_loop(self):
         while True:
-            self.clock.tick()
+            self.clock.tick(self.max_fps)
             time_passed = Millis(self.clock.get_time())
             fps_string = str(int(self.clock.get_fps()))
             self.ui_view.update_fps_string(fps_string)
@@ -149,7 +158,7 @@ class Main:
                 self.change_scene(transition)
                 continue
 
-            transition: Optional[SceneTransition] = self.scene.run_one_frame(time_passed)
+            transition: Optional[SceneTransition] = self._run_simulation(time_passed)
             if transition:
                 self.change_scene(transition)
                 continue
@@ -157,6 +166,17 @@ class Main:
             self.scene.render()
             pygame.display.update()
 
+    def _run_simulation(self, time_passed: Millis) -> Optional[SceneTransition]:
+        if self.fixed_timestep is None:
+            return self.scene.run_one_frame(time_passed)
+        for _ in range(self.fixed_timestep.add_frame_time(time_passed)):
+            transition: Optional[SceneTransition] = self.scene.run_one_frame(self.fixed_timestep.step)
+            if transition:
+                # Any steps that are left belong to the scene that we're leaving
+                return transition
+        self.scene.set_render_interpolation(self.fixed_timestep.get_interpolation())
+        return None
+
     def toggle_fullscreen(self):
         self.fullscreen = not self.fullscreen
         self.pygame_screen = self.setup_screen()
@@ -167,8 +187,11 @@ class Main:
             flags = flags | pygame.FULLSCREEN | pygame.HWSURFACE
         return pygame.display.set_mode(SCREEN_SIZE, flags)
 
-    @staticmethod
-    def quit_game():
+    def quit_game(self):
+        # Saves are written in the background, and would be lost if we exited before they're done
+        self.save_file_handler.flush()
+        # Sprites that were loaded lazily during play haven't been written to the image cache yet
+        save_image_cache()
         pygame.quit()
         sys.exit()
 
@@ -178,6 +201,8 @@ class Main:
 
 
 def start(map_file_name: Optional[str], chosen_hero_id: Optional[str], hero_start_level: Optional[int],
-          start_money: Optional[int], save_file_name: Optional[str], fullscreen: bool):
-    main = Main(map_file_name, chosen_hero_id, hero_start_level, start_money, save_file_name, fullscreen)
+          start_money: Optional[int], save_file_name: Optional[str], fullscreen: bool, fixed_timestep: bool = True,
+          max_fps: int = DEFAULT_MAX_FPS):
+    main = Main(map_file_name, chosen_hero_id, hero_start_level, start_money, save_file_name, fullscreen,
+                fixed_timestep, max_fps)
     main.main_loop()
@@ -15,16 +15,15 @@ from pythongame.core.game_data import ENTITY_SPRITE_INITIALIZERS, UI_ICON_SPRITE
     NON_PLAYER_CHARACTERS, NpcCategory
 from pythongame.core.game_state import GameState, NonPlayerCharacter, GameWorldState
 from pythongame.core.item_data import randomized_item_id
-from pythongame.core.math import sum_of_vectors
 from pythongame.core.view.game_world_view import GameWorldView
-from pythongame.core.view.image_loading import load_images_by_sprite, load_images_by_ui_sprite, \
+from pythongame.core.view.image_loading import LazyImagesBySprite, load_images_by_ui_sprite, \
     load_images_by_portrait_sprite
 from pythongame.dungeon_generator import DungeonGenerator, Grid
 from pythongame.map_editor.map_editor_ui_view import MapEditorView, PORTRAIT_ICON_SIZE, MAP_EDITOR_UI_ICON_SIZE, \
     EntityTab, GenerateRandomMap, SetCameraPosition, AddEntity, DeleteEntities, DeleteDecorations, MapEditorAction, \
     SaveMap, ToggleOutlines, AddSmartFloorTiles, DeleteSmartFloorTiles
 from pythongame.map_editor.map_editor_world_entity import MapEditorWorldEntity
-from pythongame.map_file import save_map_to_json_file, load_map_from_json_file, create_map_from_json, MapData, \
+from pythongame.map_file import save_map_to_file, load_map_from_file, create_map_from_json, MapData, \
     MapEditorConfig
 from pythongame.register_game_data import register_all_game_data
 
@@ -111,7 +110,7 @@ class MapEditor:
 
         if Path(self.map_file_path).exists():
             print("Loading map '%s' from file." % self.map_file_path)
-            map_data = load_map_from_json_file(self.map_file_path)
+            map_data = load_map_from_file(self.map_file_path)
             player_position = map_data.player_position
             self._set_game_world(map_data.game_world, player_position)
             self.config = map_data.map_editor_config
@@ -151,7 +150,7 @@ class MapEditor:
         pygame.mixer.init()
 
         pygame_screen = pygame.display.set_mode(SCREEN_SIZE)
-        images_by_sprite = load_images_by_sprite(ENTITY_SPRITE_INITIALIZERS)
+        images_by_sprite = LazyImagesBySprite(ENTITY_SPRITE_INITIALIZERS)
         images_by_ui_sprite = load_images_by_ui_sprite(UI_ICON_SPRITE_PATHS, MAP_EDITOR_UI_ICON_SIZE)
         images_by_portrait_sprite = load_images_by_portrait_sprite(PORTRAIT_ICON_SPRITE_PATHS, PORTRAIT_ICON_SIZE)
         world_view = GameWorldView(pygame_screen, CAMERA_SIZE, SCREEN_SIZE, images_by_sprite)
@@ -242,8 +241,9 @@ class MapEditor:
             # RENDER
 
             world_view.render_world(
-                all_entities_to_render=self.game_state.get_all_entities_to_render(),
-                decorations_to_render=self.game_state.get_decorations_to_render(),
+                entities_to_render=self.game_state.game_world.get_renderable_non_wall_entities(),
+                walls_state=self.game_state.game_world.walls_state,
+                decorations_state=self.game_state.game_world.decorations_state,
                 player_entity=self.game_state.game_world.player_entity,
                 is_player_invisible=self.game_state.player_state.is_invisible,
                 player_active_buffs=self.game_state.player_state.active_buffs,
@@ -286,7 +286,7 @@ class MapEditor:
         grid_string = self.grid.serialize()
         game_world = self.game_state.game_world
         map_data = MapData(game_world, self.config, grid_string, game_world.player_entity.get_position())
-        save_map_to_json_file(map_data, self.map_file_path)
+        save_map_to_file(map_data, self.map_file_path)
         print("Saved state to " + self.map_file_path)
 
     def _handle_action(self, action: MapEditorAction, grid_cell_size: int):
@@ -392,90 +392,103 @@ class MapEditor:
             return create_npc(npc_type, (x, y))
 
     def _add_smart_floor_tiles(self, tiles: List[Tuple[int, int, int, int]]):
-        floor_cells = [((r[0] - self.game_state.game_world.entire_world_area.x) // GRID_CELL_SIZE,
-                        (r[1] - self.game_state.game_world.entire_world_area.y) // GRID_CELL_SIZE)
-                       for r in tiles]
+        floor_cells = self._get_grid_cells(tiles)
         self.grid.add_floor_cells(floor_cells)
-        xmin = min([cell[0] for cell in floor_cells]) - 1
-        xmax = max([cell[0] for cell in floor_cells]) + 2
-        ymin = min([cell[1] for cell in floor_cells]) - 1
-        ymax = max([cell[1] for cell in floor_cells]) + 2
-
-        for y in range(ymin, ymax):
-            for x in range(xmin, xmax):
-                pos = sum_of_vectors(self.game_state.game_world.entire_world_area.topleft,
-                                     (x * GRID_CELL_SIZE, y * GRID_CELL_SIZE))
-                is_even_cell = x % 2 == 0 and y % 2 == 0  # ground sprite covers 4 cells, so we only need them on even cells
-                if is_even_cell and any(
-                        [self.grid.is_floor(c) for c in [(x, y), (x + 1, y), (x, y + 1), (x + 1, y + 1)]]):
-                    _add_decoration(Sprite.DECORATION_GROUND_STONE, self.game_state, pos)
-                if self.grid.is_wall((x, y)):
-                    wall_type = DungeonGenerator.determine_wall_type(self.grid, (x, y))
-                    self._set_wall(pos, wall_type)
-                if self.grid.is_floor((x, y)):
-                    # print("deleting wall from cell (%i,%i)" % (pos))
-                    self._delete_wall(pos)
+        self._update_smart_floor_tiles_around(floor_cells, floor_was_removed=False)
 
     def _remove_smart_floor_tiles(self, tiles: List[Tuple[int, int, int, int]]):
-        floor_cells = [((r[0] - self.game_state.game_world.entire_world_area.x) // GRID_CELL_SIZE,
-                        (r[1] - self.game_state.game_world.entire_world_area.y) // GRID_CELL_SIZE)
-                       for r in tiles]
+        floor_cells = self._get_grid_cells(tiles)
         self.grid.remove_floor_cells(floor_cells)
-        xmin = min([cell[0] for cell in floor_cells])
-        xmax = max([cell[0] for cell in floor_cells])
-        ymin = min([cell[1] for cell in floor_cells])
-        ymax = max([cell[1] for cell in floor_cells])
-
-        for y in range(ymin - 1, ymax + 2):
-            for x in range(xmin - 1, xmax + 2):
-                pos = sum_of_vectors(self.game_state.game_world.entire_world_area.topleft,
-                                     (x * GRID_CELL_SIZE, y * GRID_CELL_SIZE))
+        self._update_smart_floor_tiles_around(floor_cells, floor_was_removed=True)
+
+    def _get_grid_cells(self, tiles: List[Tuple[int, int, int, int]]) -> List[Tuple[int, int]]:
+        world_area = self.game_state.game_world.entire_world_area
+        return [((r[0] - world_area.x) // GRID_CELL_SIZE, (r[1] - world_area.y) // GRID_CELL_SIZE) for r in tiles]
+
+    # Makes the walls and floor tiles around the given (just edited) cells match the grid. Only the entities that
+    # don't already match are added or removed, so the cost depends on the size of the edit, not the size of the map.
+    def _update_smart_floor_tiles_around(self, cells: List[Tuple[int, int]], floor_was_removed: bool):
+        if not cells:
+            return
+        # The grid may have changed up to one cell away from the edited cells. That in turn may change the type of
+        # walls (and floor tiles) that are one more cell away.
+        xmin = max(min([cell[0] for cell in cells]) - 2, 0)
+        xmax = min(max([cell[0] for cell in cells]) + 3, self.grid.size[0])
+        ymin = max(min([cell[1] for cell in cells]) - 2, 0)
+        ymax = min(max([cell[1] for cell in cells]) + 3, self.grid.size[1])
+        floor_tiles, wall_cells = self.grid.get_floor_tiles_and_walls(xmin, ymin, xmax, ymax)
+        floor_tiles = set(floor_tiles)
+        wall_types = {cell: DungeonGenerator.get_wall_type_for_neighbourhood(neighbourhood, cell)
+                      for (cell, neighbourhood) in wall_cells}
+
+        changed_wall_positions = []
+        world_area = self.game_state.game_world.entire_world_area
+        for y in range(ymin, ymax):
+            for x in range(xmin, xmax):
+                pos = (world_area.x + x * GRID_CELL_SIZE, world_area.y + y * GRID_CELL_SIZE)
                 is_even_cell = x % 2 == 0 and y % 2 == 0  # ground sprite covers 4 cells, so we only need them on even cells
                 if is_even_cell:
-                    if any([self.grid.is_floor(c) for c in [(x, y), (x + 1, y), (x, y + 1), (x + 1, y + 1)]]):
+                    if (x, y) in floor_tiles:
                         _add_decoration(Sprite.DECORATION_GROUND_STONE, self.game_state, pos)
-                    else:
+                    elif floor_was_removed:
                         _delete_map_decorations_from_position(self.game_state, pos)
-                if self.grid.is_wall((x, y)):
-                    wall_type = DungeonGenerator.determine_wall_type(self.grid, (x, y))
-                    self._set_wall(pos, wall_type)
-                else:
-                    self._delete_wall(pos)
-
-    def _delete_wall(self, world_position: Tuple[int, int]):
-        self.game_state.game_world.walls_state.remove_all_from_position(world_position)
-        self._notify_ui_of_new_wall_positions()
+                if (x, y) in wall_types:
+                    if self._replace_walls_at_position(pos, wall_types[(x, y)]):
+                        changed_wall_positions.append(pos)
+                elif floor_was_removed or self.grid.is_floor((x, y)):
+                    # (When floor is added, walls that weren't placed by the grid are left alone)
+                    if self._remove_walls_at_position(pos):
+                        changed_wall_positions.append(pos)
+
+        # Rebuilding the minimap from all the walls on the map would be too slow to do while painting
+        walls_state = self.game_state.game_world.walls_state
+        added_wall_positions = [pos for pos in changed_wall_positions if walls_state.get_walls_at_position(pos)]
+        removed_wall_positions = [pos for pos in changed_wall_positions if not walls_state.get_walls_at_position(pos)]
+        self.ui_view.update_changed_wall_positions(added_wall_positions, removed_wall_positions)
 
     def _set_wall(self, world_pos: Tuple[int, int], wall_type: WallType):
+        if self._replace_walls_at_position(world_pos, wall_type):
+            self._notify_ui_of_new_wall_positions()
+
+    # Returns True if any wall was changed
+    def _replace_walls_at_position(self, world_pos: Tuple[int, int], wall_type: WallType) -> bool:
         existing_walls = self.game_state.game_world.walls_state.get_walls_at_position(world_pos)
         if len(existing_walls) > 0:
             if existing_walls[0].wall_type == wall_type:
-                return
+                return False
             for w in existing_walls:
                 self.game_state.game_world.walls_state.remove_wall(w)
         wall = create_wall(wall_type, world_pos)
         self.game_state.game_world.walls_state.add_wall(wall)
-        self._notify_ui_of_new_wall_positions()
+        return True
+
+    # Returns True if any wall was removed
+    def _remove_walls_at_position(self, world_pos: Tuple[int, int]) -> bool:
+        walls_state = self.game_state.game_world.walls_state
+        existing_walls = walls_state.get_walls_at_position(world_pos)
+        for wall in existing_walls:
+            walls_state.remove_wall(wall)
+        return len(existing_walls) > 0
 
     def _add_shrine(self, world_pos: Tuple[int, int]):
         already_has_shrine = any([x for x in self.game_state.game_world.shrines
                                   if x.world_entity.get_position() == world_pos])
         if not already_has_shrine:
             shrine = create_shrine(world_pos)
-            self.game_state.game_world.shrines.append(shrine)
+            self.game_state.game_world.add_shrine(shrine)
 
     def _add_dungeon_entrance(self, world_pos: Tuple[int, int]):
         already_has = any([x for x in self.game_state.game_world.dungeon_entrances
                            if x.world_entity.get_position() == world_pos])
         if not already_has:
             dungeon_entrance = create_dungeon_entrance(world_pos)
-            self.game_state.game_world.dungeon_entrances.append(dungeon_entrance)
+            self.game_state.game_world.add_dungeon_entrance(dungeon_entrance)
 
     def _delete_map_entities_from_position(self, snapped_mouse_world_position: Tuple[int, int]):
         self.game_state.game_world.walls_state.remove_all_from_position(snapped_mouse_world_position)
         for enemy in [e for e in self.game_state.game_world.non_player_characters if
                       e.world_entity.get_position() == snapped_mouse_world_position]:
-            self.game_state.game_world.non_player_characters.remove(enemy)
+            self.game_state.game_world.remove_non_player_character(enemy)
         for consumable in [p for p in self.game_state.game_world.consumables_on_ground
                            if p.world_entity.get_position() == snapped_mouse_world_position]:
             self.game_state.game_world.consumables_on_ground.remove(consumable)
@@ -487,13 +500,13 @@ class MapEditor:
             self.game_state.game_world.money_piles_on_ground.remove(money_pile)
         for portal in [p for p in self.game_state.game_world.portals
                        if p.world_entity.get_position() == snapped_mouse_world_position]:
-            self.game_state.game_world.portals.remove(portal)
+            self.game_state.game_world.remove_portal(portal)
         for shrine in [s for s in self.game_state.game_world.shrines
                        if s.world_entity.get_position() == snapped_mouse_world_position]:
-            self.game_state.game_world.shrines.remove(shrine)
+            self.game_state.game_world.remove_shrine(shrine)
         for dungeon_entrance in [e for e in self.game_state.game_world.dungeon_entrances
                                  if e.world_entity.get_position() == snapped_mouse_world_position]:
-            self.game_state.game_world.dungeon_entrances.remove(dungeon_entrance)
+            self.game_state.game_world.remove_dungeon_entrance(dungeon_entrance)
 
         self._notify_ui_of_new_wall_positions()
 
@@ -517,7 +530,7 @@ def _add_portal(portal_id: PortalId, game_state: GameState, snapped_mouse_world_
                               if x.world_entity.get_position() == snapped_mouse_world_position])
     if not already_has_portal:
         portal = create_portal(portal_id, snapped_mouse_world_position)
-        game_state.game_world.portals.append(portal)
+        game_state.game_world.add_portal(portal)
 
 
 def _add_chest(game_state: GameState, snapped_mouse_world_position):
@@ -525,7 +538,7 @@ def _add_chest(game_state: GameState, snapped_mouse_world_position):
                              if x.world_entity.get_position() == snapped_mouse_world_position])
     if not already_has_chest:
         chest = create_chest(snapped_mouse_world_position)
-        game_state.game_world.chests.append(chest)
+        game_state.game_world.add_chest(chest)
 
 
 def _add_item(item_id: ItemId, game_state: GameState, snapped_mouse_world_position):
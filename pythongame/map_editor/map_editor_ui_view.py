@@ -531,6 +531,10 @@ class MapEditorView:
     def update_wall_positions(self, wall_positions):
         self._minimap.set_walls(wall_positions)
 
+    def update_changed_wall_positions(self, added_wall_positions: List[Tuple[int, int]],
+                                      removed_wall_positions: List[Tuple[int, int]]):
+        self._minimap.update_walls(added_wall_positions, removed_wall_positions)
+
     def _render_map_editor_world_entity_at_position(self, sprite: Sprite, position: Tuple[int, int]):
         image_with_relative_position = self._get_image_for_sprite(sprite, Direction.DOWN, 0)
         sprite_position = sum_of_vectors(position, image_with_relative_position.position_relative_to_entity)
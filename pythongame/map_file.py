@@ -10,6 +10,11 @@ from pythongame.core.entity_creation import create_npc, create_money_pile_on_gro
 from pythongame.core.game_state import NonPlayerCharacter, Wall, Portal, DecorationEntity, \
     MoneyPileOnGround, ItemOnGround, ConsumableOnGround, Chest, Shrine, DungeonEntrance, GameWorldState
 from pythongame.core.world_entity import WorldEntity
+from pythongame.map_file_binary import BinaryMapFile, is_binary_map_file, write_binary_map_to_file, deserialize_grid, \
+    BinaryMapFormatError
+
+# No maps come anywhere close to this size (in either direction)
+MAX_WORLD_SIZE = 100_000
 
 
 class MapEditorConfig:
@@ -21,13 +26,45 @@ class MapData:
     def __init__(self,
                  game_world: GameWorldState,
                  map_editor_config: MapEditorConfig,
-                 grid_string: str,
+                 grid_string: Optional[str],
                  player_position: Tuple[int, int]):
         self.game_world = game_world
         self.map_editor_config = map_editor_config
-        self.grid_string = grid_string
+        self._grid_string = grid_string
+        # Binary map files store the grid in a compact form, that's only converted if it's used (by the map editor)
+        self._compact_grid: Optional[bytes] = None
         self.player_position = player_position
 
+    @staticmethod
+    def with_compact_grid(game_world: GameWorldState, map_editor_config: MapEditorConfig, compact_grid: Optional[bytes],
+                          player_position: Tuple[int, int]):
+        map_data = MapData(game_world, map_editor_config, None, player_position)
+        map_data._compact_grid = compact_grid
+        return map_data
+
+    @property
+    def grid_string(self) -> Optional[str]:
+        if self._grid_string is None and self._compact_grid is not None:
+            self._grid_string = deserialize_grid(self._compact_grid)
+            self._compact_grid = None
+        return self._grid_string
+
+
+# Loads a map in either of the supported formats: JSON, or the more compact binary format (see map_file_binary.py).
+# The format is determined by the file extension.
+def load_map_from_file(map_file_path: str) -> MapData:
+    if is_binary_map_file(map_file_path):
+        with BinaryMapFile(map_file_path) as binary_map_file:
+            return MapBinary.deserialize(binary_map_file)
+    return load_map_from_json_file(map_file_path)
+
+
+def save_map_to_file(map_data: MapData, map_file_path: str):
+    if is_binary_map_file(map_file_path):
+        write_binary_map_to_file(MapJson.serialize(map_data), map_file_path)
+    else:
+        save_map_to_json_file(map_data, map_file_path)
+
 
 def load_map_from_json_file(map_file_path: str) -> MapData:
     with open(map_file_path) as map_file:
@@ -120,6 +157,62 @@ class MapJson:
         return MapData(game_world, map_editor_config, grid_string, player_position)
 
 
+# Creates the map directly from the entity records in a binary map file, without going through the JSON format
+class MapBinary:
+
+    @staticmethod
+    def deserialize(map_file: BinaryMapFile) -> MapData:
+        entire_world_area = Rect(*map_file.get_entire_world_area())
+        wall_records = map_file.get_records("walls", lambda name: WallType[name])
+        decoration_records = map_file.get_records("decorations", lambda name: Sprite[name])
+        MapBinary._check_world_area(entire_world_area, wall_records + decoration_records)
+        game_world = GameWorldState(
+            non_player_characters=[create_npc(npc_type, position) for npc_type, position in
+                                   map_file.get_records("non_player_characters", lambda name: NpcType[name])],
+            walls=[create_wall(wall_type, position) for wall_type, position in wall_records],
+            entire_world_area=entire_world_area,
+            decoration_entities=[create_decoration_entity(position, sprite) for sprite, position in
+                                 decoration_records],
+            portals=[create_portal(portal_id, position) for portal_id, position in
+                     map_file.get_records("portals", lambda name: PortalId[name])],
+            chests=[create_chest(position) for (position,) in map_file.get_records("chests")],
+            shrines=[create_shrine(position) for (position,) in map_file.get_records("shrines")],
+            dungeon_entrances=[create_dungeon_entrance(position) for (position,) in
+                               map_file.get_records("dungeon_entrances")],
+            consumables_on_ground=[create_consumable_on_ground(consumable_type, position)
+                                   for consumable_type, position in
+                                   map_file.get_records("consumables_on_ground", lambda name: ConsumableType[name])],
+            items_on_ground=[create_item_on_ground(MapBinary._parse_item_id(stats_string, item_name), position)
+                             for stats_string, item_name, position in
+                             map_file.get_records("items_on_ground", str, str)],
+            money_piles_on_ground=[create_money_pile_on_ground(amount, position) for amount, position in
+                                   map_file.get_records("money_piles_on_ground")],
+            player_entity=None,
+        )
+        map_editor_config = MapEditorConfig(disable_smart_grid=map_file.get_disable_smart_grid())
+        return MapData.with_compact_grid(game_world, map_editor_config, map_file.get_grid(),
+                                         map_file.get_player_position())
+
+    # A corrupt file can contain values that are valid on their own, but that don't make up a working map. Walls and
+    # decorations are put in buckets that cover the world area, so they must be inside it, and a huge world area would
+    # take forever to set up.
+    @staticmethod
+    def _check_world_area(entire_world_area: Rect, bucketed_records: List[Tuple]):
+        if not 0 <= entire_world_area.w <= MAX_WORLD_SIZE or not 0 <= entire_world_area.h <= MAX_WORLD_SIZE:
+            raise BinaryMapFormatError("Invalid world area: %s" % entire_world_area)
+        for *_, (x, y) in bucketed_records:
+            if not (entire_world_area.left <= x <= entire_world_area.right
+                    and entire_world_area.top <= y <= entire_world_area.bottom):
+                raise BinaryMapFormatError("Entity outside of the world area: %s" % ((x, y),))
+
+    @staticmethod
+    def _parse_item_id(stats_string: str, item_name: str) -> ItemId:
+        try:
+            return ItemId.from_stats_string(stats_string, item_name)
+        except Exception as e:
+            raise BinaryMapFormatError("Invalid item: %s" % e)
+
+
 class PlayerJson:
     @staticmethod
     def serialize(entity: WorldEntity):
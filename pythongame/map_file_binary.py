@@ -0,0 +1,329 @@
+import mmap
+import struct
+from typing import Dict, List, Optional, Tuple, Callable, Any
+
+from pythongame.grid_encoding import decode_grid, encode_grid
+
+# A compact binary alternative to the JSON map files. The binary file contains exactly the same data as the JSON
+# format (see MapJson), and can be converted to and from it without any loss (see convert_map.py). Compared to JSON,
+# it's much smaller and much faster to parse.
+#
+# Layout (all numbers are little-endian):
+#
+#   header:     magic (4 bytes), format version (u16), number of sections (u16)
+#   directory:  for each section: name (32 bytes, zero-padded ASCII), offset (u32), size (u32)
+#   sections:   raw section data, at the offsets given by the directory
+#
+# Every kind of entity is stored in its own section, as a packed array of fixed-size records. Enum names (sprites,
+# wall types, NPC types, etc) and other strings are interned: they are stored once in the "strings" section and the
+# records only refer to them by index. The grid that is used by the map editor is stored as one byte per cell.
+#
+# The file is memory-mapped when it's read, and a section is only decoded when it's first asked for. Sections that
+# are never used (for instance the grid, when the map is loaded for playing rather than editing) cost nothing.
+
+BINARY_MAP_FILE_EXTENSION = ".wmap"
+
+_MAGIC = b"WMAP"
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sHH")
+_DIRECTORY_ENTRY = struct.Struct("<32sII")
+_STRING_LENGTH = struct.Struct("<H")
+_COUNT = struct.Struct("<I")
+_META = struct.Struct("<?iiiiii")
+_GRID_SIZE = struct.Struct("<II")
+
+_STRINGS_SECTION = "strings"
+_META_SECTION = "meta"
+_GRID_SECTION = "grid"
+
+
+# Describes how the entities of one kind (one list in the JSON format) are stored. Every record consists of the
+# interned string fields, then the integer fields, and then the entity's position.
+class _EntityTable:
+    def __init__(self, key: str, string_fields: List[str], int_fields: List[str]):
+        self.key = key
+        self.string_fields = string_fields
+        self.int_fields = int_fields
+        self.record = struct.Struct("<" + "I" * len(string_fields) + "i" * len(int_fields) + "ii")
+
+
+_ENTITY_TABLES = [
+    _EntityTable("non_player_characters", ["npc_type"], []),
+    _EntityTable("walls", ["wall_type"], []),
+    _EntityTable("decorations", ["sprite"], []),
+    _EntityTable("portals", ["portal_id"], []),
+    _EntityTable("chests", [], []),
+    _EntityTable("shrines", [], []),
+    _EntityTable("dungeon_entrances", [], []),
+    _EntityTable("consumables_on_ground", ["consumable_type"], []),
+    _EntityTable("items_on_ground", ["item_id", "item_name"], []),
+    _EntityTable("money_piles_on_ground", [], ["amount"]),
+]
+_ENTITY_TABLES_BY_KEY = {table.key: table for table in _ENTITY_TABLES}
+
+
+# Raised for any file that can't be read as a binary map: files in some other format, files written by another version
+# of the game, and files that are truncated or corrupt
+class BinaryMapFormatError(Exception):
+    pass
+
+
+def is_binary_map_file(map_file_path: str) -> bool:
+    return map_file_path.endswith(BINARY_MAP_FILE_EXTENSION)
+
+
+# Takes map data in the JSON format (as produced by MapJson.serialize) and returns the binary representation of it
+def serialize_binary_map(json_data) -> bytes:
+    strings: List[str] = []
+    string_indices: Dict[str, int] = {}
+
+    def intern(string: str) -> int:
+        if string not in string_indices:
+            string_indices[string] = len(strings)
+            strings.append(string)
+        return string_indices[string]
+
+    sections: List[Tuple[str, bytes]] = []
+    for table in _ENTITY_TABLES:
+        entities = json_data.get(table.key, [])
+        data = bytearray(_COUNT.pack(len(entities)))
+        for entity in entities:
+            values = [intern(entity[field]) for field in table.string_fields]
+            values += [entity[field] for field in table.int_fields]
+            # Some positions in older map files have been stored as floats (like 425.0). Entities are always placed
+            # on whole pixels, so nothing is lost by storing them as integers.
+            values += [int(coordinate) for coordinate in entity["position"]]
+            data += table.record.pack(*values)
+        sections.append((table.key, bytes(data)))
+
+    player_position = json_data["player"]["position"]
+    world_area = json_data["entire_world_area"]
+    sections.append((_META_SECTION, _META.pack(json_data.get("disable_smart_grid", False), *player_position,
+                                               *world_area)))
+
+    grid_string = json_data.get("grid", None)
+    if grid_string:
+        sections.append((_GRID_SECTION, _serialize_grid(grid_string)))
+
+    string_data = bytearray(_COUNT.pack(len(strings)))
+    for string in strings:
+        encoded = string.encode("utf-8")
+        string_data += _STRING_LENGTH.pack(len(encoded)) + encoded
+    sections.insert(0, (_STRINGS_SECTION, bytes(string_data)))
+
+    header = _HEADER.pack(_MAGIC, _FORMAT_VERSION, len(sections))
+    offset = _HEADER.size + _DIRECTORY_ENTRY.size * len(sections)
+    directory = bytearray()
+    for name, data in sections:
+        directory += _DIRECTORY_ENTRY.pack(name.encode("ascii"), offset, len(data))
+        offset += len(data)
+    return header + bytes(directory) + b"".join(data for _, data in sections)
+
+
+def write_binary_map_to_file(json_data, map_file_path: str):
+    data = serialize_binary_map(json_data)
+    with open(map_file_path, "wb") as map_file:
+        map_file.write(data)
+
+
+# The grid is stored as a width, a height and then one byte per cell (see grid_encoding.py)
+def _serialize_grid(grid_string: str) -> bytes:
+    cells, size = decode_grid(grid_string)
+    return _GRID_SIZE.pack(*size) + bytes(cells)
+
+
+def deserialize_grid(data: bytes) -> str:
+    width, height = _get_grid_size(data)
+    return encode_grid(data[_GRID_SIZE.size:], (width, height))
+
+
+def _get_grid_size(data: bytes) -> Tuple[int, int]:
+    if len(data) < _GRID_SIZE.size:
+        raise BinaryMapFormatError("Truncated grid section")
+    width, height = _GRID_SIZE.unpack_from(data)
+    if len(data) - _GRID_SIZE.size != width * height:
+        raise BinaryMapFormatError("Grid section doesn't match the grid size (%i, %i)" % (width, height))
+    return width, height
+
+
+# Maps string indices to converted strings, converting each string the first time it's looked up
+class _ConvertedStrings(dict):
+    def __init__(self, strings: List[str], converter: Callable[[str], Any]):
+        super().__init__()
+        self._strings = strings
+        self._converter = converter
+
+    def __missing__(self, string_index: int):
+        if string_index >= len(self._strings):
+            raise BinaryMapFormatError("String index out of range: %i" % string_index)
+        try:
+            value = self._converter(self._strings[string_index])
+        except (KeyError, ValueError) as e:
+            # Most likely the name of an enum member that doesn't exist (any more)
+            raise BinaryMapFormatError("Unknown value %r (%s)" % (self._strings[string_index], e))
+        self[string_index] = value
+        return value
+
+
+# A read-only view of a binary map file. Sections are decoded lazily, and the file is kept open (memory-mapped) until
+# close() is called.
+class BinaryMapFile:
+    def __init__(self, map_file_path: str):
+        self._file = open(map_file_path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be memory-mapped
+            self._file.close()
+            raise BinaryMapFormatError("Empty map file: " + map_file_path)
+        self._data = memoryview(self._mmap)
+        self._sections: Dict[str, memoryview] = {}
+        try:
+            self._sections = self._read_directory(map_file_path)
+        except BinaryMapFormatError:
+            self.close()
+            raise
+        self._strings: Optional[List[str]] = None
+
+    def _read_directory(self, map_file_path: str) -> Dict[str, memoryview]:
+        if len(self._data) < _HEADER.size:
+            raise BinaryMapFormatError("Not a binary map file: " + map_file_path)
+        magic, version, num_sections = _HEADER.unpack_from(self._data)
+        if magic != _MAGIC:
+            raise BinaryMapFormatError("Not a binary map file: " + map_file_path)
+        if version != _FORMAT_VERSION:
+            raise BinaryMapFormatError("Unsupported map format version %i in %s" % (version, map_file_path))
+        file_size = len(self._data)
+        if _HEADER.size + num_sections * _DIRECTORY_ENTRY.size > file_size:
+            raise BinaryMapFormatError("Truncated map file: " + map_file_path)
+        # Everything is checked before any section is sliced out of the mapped memory, as the file couldn't be closed
+        # while there are slices of it around
+        section_bounds = {}
+        for i in range(num_sections):
+            name, offset, size = _DIRECTORY_ENTRY.unpack_from(self._data, _HEADER.size + i * _DIRECTORY_ENTRY.size)
+            if offset + size > file_size:
+                raise BinaryMapFormatError("Truncated map file: " + map_file_path)
+            try:
+                section_bounds[name.rstrip(b"\0").decode("ascii")] = (offset, size)
+            except UnicodeDecodeError:
+                raise BinaryMapFormatError("Corrupt section name in " + map_file_path)
+        for section_name in [_STRINGS_SECTION, _META_SECTION]:
+            if section_name not in section_bounds:
+                raise BinaryMapFormatError("Missing section '%s' in %s" % (section_name, map_file_path))
+        if section_bounds[_META_SECTION][1] < _META.size:
+            raise BinaryMapFormatError("Truncated map file: " + map_file_path)
+        return {name: self._data[offset: offset + size] for name, (offset, size) in section_bounds.items()}
+
+    def close(self):
+        # All views of the mapped memory must be released before it can be unmapped
+        for section in self._sections.values():
+            section.release()
+        self._sections = {}
+        self._data.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    # Returns one tuple per entity of the given kind (using the same keys as the JSON format, like "walls"). A tuple
+    # contains the entity's string fields, then its integer fields, and last its position. The string fields are
+    # passed through the given converters (like lambda name: WallType[name]). As the strings are interned, every
+    # converter is only called once per distinct string rather than once per entity.
+    def get_records(self, key: str, *string_converters: Callable[[str], Any]) -> List[Tuple]:
+        table = _ENTITY_TABLES_BY_KEY[key]
+        if len(string_converters) != len(table.string_fields):
+            raise ValueError("Expected %i string converters for %s" % (len(table.string_fields), key))
+        section = self._sections.get(key)
+        if section is None:
+            return []
+        strings = self._get_strings()
+        converted = [_ConvertedStrings(strings, converter) for converter in string_converters]
+        count = _get_count(section, table.record.size)
+        # The records are copied out of the mapped file, so that the file can still be closed if a record turns out
+        # to be invalid (while the records are being unpacked, they hold on to the memory they're unpacked from)
+        records = table.record.iter_unpack(bytes(section[_COUNT.size: _COUNT.size + count * table.record.size]))
+        num_strings = len(string_converters)
+        if num_strings == 0:
+            return [(*values[:-2], (values[-2], values[-1])) for values in records]
+        if num_strings == 1 and not table.int_fields:
+            # The common case (walls, decorations, NPCs, ...)
+            converted_strings = converted[0]
+            return [(converted_strings[string_index], (x, y)) for string_index, x, y in records]
+        return [(*[converted[i][values[i]] for i in range(num_strings)], *values[num_strings:-2],
+                 (values[-2], values[-1])) for values in records]
+
+    def get_player_position(self) -> Tuple[int, int]:
+        _, player_x, player_y, *_ = _META.unpack_from(self._sections[_META_SECTION])
+        return player_x, player_y
+
+    # (x, y, w, h)
+    def get_entire_world_area(self) -> Tuple[int, int, int, int]:
+        _, _, _, x, y, w, h = _META.unpack_from(self._sections[_META_SECTION])
+        return x, y, w, h
+
+    def get_disable_smart_grid(self) -> bool:
+        return _META.unpack_from(self._sections[_META_SECTION])[0]
+
+    # The grid is returned in its compact form, and can be converted to the format that's used by the map editor
+    # with deserialize_grid(). Unlike the other sections, it doesn't refer to the mapped file, so it can be kept
+    # around after the file is closed.
+    def get_grid(self) -> Optional[bytes]:
+        section = self._sections.get(_GRID_SECTION)
+        if section is None:
+            return None
+        _get_grid_size(section)
+        return bytes(section)
+
+    # Decodes all sections, and returns the same data as the corresponding JSON file would contain
+    def to_json(self):
+        grid = self.get_grid()
+        json_data = {
+            "grid": deserialize_grid(grid) if grid is not None else None,
+            "disable_smart_grid": self.get_disable_smart_grid(),
+            "player": {"position": list(self.get_player_position())},
+            "entire_world_area": list(self.get_entire_world_area()),
+        }
+        for table in _ENTITY_TABLES:
+            entities = []
+            for record in self.get_records(table.key, *[str for _ in table.string_fields]):
+                entity = dict(zip(table.string_fields + table.int_fields, record))
+                entity["position"] = list(record[-1])
+                entities.append(entity)
+            json_data[table.key] = entities
+        return json_data
+
+    def _get_strings(self) -> List[str]:
+        if self._strings is None:
+            section = self._sections[_STRINGS_SECTION]
+            count = _get_count(section, _STRING_LENGTH.size)
+            offset = _COUNT.size
+            strings = []
+            for _ in range(count):
+                if offset + _STRING_LENGTH.size > len(section):
+                    raise BinaryMapFormatError("Truncated strings section")
+                (length,) = _STRING_LENGTH.unpack_from(section, offset)
+                offset += _STRING_LENGTH.size
+                if offset + length > len(section):
+                    raise BinaryMapFormatError("Truncated strings section")
+                try:
+                    strings.append(bytes(section[offset: offset + length]).decode("utf-8"))
+                except UnicodeDecodeError:
+                    raise BinaryMapFormatError("Corrupt string in strings section")
+                offset += length
+            self._strings = strings
+        return self._strings
+
+
+# Returns the number of records in a section that starts with a count, after checking that (at least) that many
+# records of the given size fit in it
+def _get_count(section: memoryview, record_size: int) -> int:
+    if len(section) < _COUNT.size:
+        raise BinaryMapFormatError("Truncated section")
+    (count,) = _COUNT.unpack_from(section)
+    if _COUNT.size + count * record_size > len(section):
+        raise BinaryMapFormatError("Truncated section")
+    return count
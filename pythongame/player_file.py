@@ -1,10 +1,14 @@
 import json
 import os
-from typing import Dict, List, Optional
+import threading
+from typing import Dict, List, Optional, Any, Callable
 
 from pythongame.core.common import Millis
 from pythongame.core.game_state import PlayerState
 
+# Not a character, but keeps track of the save files (see SaveFileHandler)
+SAVE_INDEX_FILE = "index.json"
+
 
 class SavedPlayerState:
     def __init__(self, hero_id: str, level: int, exp: int, consumables_in_slots: Dict[str, List[str]],
@@ -23,6 +27,25 @@ class SavedPlayerState:
         self.completed_quests = completed_quests
 
 
+# The little information about a saved character that's shown in the main menu. These are kept in the save index, so
+# that the menu doesn't need to load every save file.
+class SavedCharacterSummary:
+    def __init__(self, filename: str, hero_id: str, level: int, total_time_played_on_character: Millis,
+                 modified_time: Optional[int]):
+        self.filename = filename
+        self.hero_id = hero_id
+        self.level = level
+        self.total_time_played_on_character = total_time_played_on_character
+        # The save file's modification time (in nanoseconds), when the summary was last updated. If the file has been
+        # modified since then, the summary is out of date. None if the file hasn't been written yet.
+        self.modified_time = modified_time
+
+    @staticmethod
+    def from_saved_player_state(filename: str, player_state: SavedPlayerState, modified_time: Optional[int]):
+        return SavedCharacterSummary(filename, player_state.hero_id, player_state.level,
+                                     player_state.total_time_played_on_character, modified_time)
+
+
 class PlayerStateJson:
     @staticmethod
     def serialize(player_state: SavedPlayerState):
@@ -57,6 +80,70 @@ class PlayerStateJson:
         )
 
 
+# Writes save files on a worker thread, so that saving never stalls a frame. Every file is written to a temporary file
+# that is then renamed over the real one, so a crash in the middle of a save can't leave a corrupt character behind.
+#
+# If a file is saved again before its previous save has been written (for instance if the player spams the save
+# button), only the latest state is written.
+#
+# on_file_written is called on the worker thread, after a file has been written.
+class _SaveFileWriter:
+    def __init__(self, on_file_written: Callable[[str], None]):
+        self._on_file_written = on_file_written
+        self._pending: Dict[str, Any] = {}
+        self._is_writing = False
+        self._condition = threading.Condition()
+        # Daemon thread, so that it doesn't keep the program alive. Pending saves are written by flush() on exit.
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # The json_data is serialized on the worker thread, so it must not be modified after it has been passed here
+    def write(self, file_path: str, json_data: Any):
+        with self._condition:
+            self._pending[file_path] = json_data
+            self._condition.notify_all()
+
+    # Blocks until all pending saves have been written
+    def flush(self):
+        with self._condition:
+            self._condition.wait_for(lambda: not self._pending and not self._is_writing)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending)
+                pending = self._pending
+                self._pending = {}
+                self._is_writing = True
+            for file_path, json_data in pending.items():
+                try:
+                    _write_file_atomically(file_path, json.dumps(json_data, indent=2))
+                    self._on_file_written(file_path)
+                except (OSError, TypeError, ValueError) as e:
+                    print("WARN: Failed to save %s: %s" % (file_path, e))
+            with self._condition:
+                self._is_writing = False
+                self._condition.notify_all()
+
+
+def _write_file_atomically(file_path: str, contents: str):
+    tmp_file_path = file_path + ".tmp"
+    try:
+        with open(tmp_file_path, 'w') as file:
+            file.write(contents)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_file_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_file_path):
+            os.remove(tmp_file_path)
+        raise
+
+
+# Keeps track of the save files. Besides the characters themselves, there's an index file in the save directory, which
+# contains the ID of the next new character, and a summary of every character (see SavedCharacterSummary). The index is
+# only a cache: it's brought up to date with the save files when the handler is created, if it's out of date (or
+# missing).
 class SaveFileHandler:
 
     def __init__(self):
@@ -64,17 +151,23 @@ class SaveFileHandler:
         if not os.path.exists(self.directory):
             print("Save directory not found. Creating new directory: " + self.directory)
             os.makedirs(self.directory)
+        self._index_file_path = self.directory + "/" + SAVE_INDEX_FILE
+        # The summaries are updated from the worker thread, when the modification time of a file becomes known
+        self._index_lock = threading.Lock()
+        self._next_character_id = 1
+        self._summaries: Dict[str, SavedCharacterSummary] = {}
+        self._writer = _SaveFileWriter(self._on_file_written)
+        self._load_index()
 
     def load_player_state_from_json_file(self, filename: str) -> SavedPlayerState:
+        # The file may have been saved recently, and not have been written yet
+        self._writer.flush()
         with open(self.directory + "/" + filename) as file:
             json_data = json.loads(file.read())
             return PlayerStateJson.deserialize(json_data)
 
-    def _save_player_state_to_json_file(self, player_state: SavedPlayerState, filename: str):
-        json_data = PlayerStateJson.serialize(player_state)
-        with open(self.directory + "/" + filename, 'w') as file:
-            file.write(json.dumps(json_data, indent=2))
-
+    # Only the snapshot of the player state is taken here (on the calling thread). The file is written in the
+    # background, see _SaveFileWriter.
     def save_to_file(self, player_state: PlayerState, existing_save_file: Optional[str],
                      total_time_played_on_character: Millis) -> str:
         if existing_save_file:
@@ -97,19 +190,109 @@ class SaveFileHandler:
             active_quests=[q.quest_id.name for q in player_state.active_quests],
             completed_quests=[q.quest_id.name for q in player_state.completed_quests]
         )
-        self._save_player_state_to_json_file(saved_player_state, filename)
+        with self._index_lock:
+            self._summaries[filename] = SavedCharacterSummary.from_saved_player_state(
+                filename, saved_player_state, None)
+        self._writer.write(self.directory + "/" + filename, PlayerStateJson.serialize(saved_player_state))
         print("Saved to file: " + filename)
         return filename
 
-    def list_save_files(self):
-        return os.listdir(self.directory)
+    # Blocks until all saves have been written to disk. This must be called before the program exits.
+    def flush(self):
+        self._writer.flush()
+
+    # Returns the summaries of all saved characters, oldest character first. No save files are read.
+    def list_saved_characters(self) -> List[SavedCharacterSummary]:
+        with self._index_lock:
+            summaries = list(self._summaries.values())
+        summaries.sort(key=lambda summary: _get_character_id(summary.filename))
+        return summaries
 
     def _generate_filename_for_new_character(self):
-        existing_files = self.list_save_files()
-        if existing_files:
-            id_from_filename = lambda f: int(f.split(".json")[0])
-            existing_character_ids = [id_from_filename(f) for f in existing_files]
-            next_available_id = max(existing_character_ids) + 1
-        else:
-            next_available_id = 1
-        return str(next_available_id) + ".json"
+        character_id = self._next_character_id
+        # The index may be out of date, if save files have been copied into the directory by hand
+        while os.path.exists(self.directory + "/" + str(character_id) + ".json"):
+            character_id += 1
+        self._next_character_id = character_id + 1
+        return str(character_id) + ".json"
+
+    # Called on the worker thread. Once a character has been written, the index is updated to match it.
+    def _on_file_written(self, file_path: str):
+        filename = os.path.basename(file_path)
+        if not _is_save_file(filename):
+            return
+        modified_time = os.stat(file_path).st_mtime_ns
+        with self._index_lock:
+            summary = self._summaries.get(filename)
+            if summary is not None:
+                summary.modified_time = modified_time
+        self._write_index()
+
+    def _write_index(self):
+        with self._index_lock:
+            json_data = {
+                "next_character_id": self._next_character_id,
+                "characters": {filename: _serialize_summary(summary) for filename, summary in self._summaries.items()}
+            }
+        self._writer.write(self._index_file_path, json_data)
+
+    def _load_index(self):
+        try:
+            with open(self._index_file_path) as file:
+                json_data = json.loads(file.read())
+            self._next_character_id = int(json_data["next_character_id"])
+            summaries = {filename: _deserialize_summary(filename, data)
+                         for filename, data in json_data.get("characters", {}).items()}
+        except FileNotFoundError:
+            # For instance if the characters were saved by an older version of the game
+            summaries = {}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            print("WARN: Invalid save index file %s (%s). Rebuilding it." % (self._index_file_path, e))
+            summaries = {}
+
+        # Only the save files that have been modified since the index was written need to be read
+        is_index_out_of_date = False
+        with os.scandir(self.directory) as entries:
+            save_files = {entry.name: entry.stat().st_mtime_ns for entry in entries if _is_save_file(entry.name)}
+        for filename in list(summaries):
+            if filename not in save_files:
+                del summaries[filename]
+                is_index_out_of_date = True
+        for filename, modified_time in save_files.items():
+            summary = summaries.get(filename)
+            if summary is None or summary.modified_time != modified_time:
+                try:
+                    player_state = self.load_player_state_from_json_file(filename)
+                except (OSError, ValueError, KeyError) as e:
+                    print("WARN: Skipping invalid save file %s: %s" % (filename, e))
+                    continue
+                summaries[filename] = SavedCharacterSummary.from_saved_player_state(
+                    filename, player_state, modified_time)
+                is_index_out_of_date = True
+
+        if save_files:
+            self._next_character_id = max(self._next_character_id, max(map(_get_character_id, save_files)) + 1)
+        self._summaries = summaries
+        if is_index_out_of_date:
+            self._write_index()
+
+
+def _serialize_summary(summary: SavedCharacterSummary):
+    return {
+        "hero": summary.hero_id,
+        "level": summary.level,
+        "total_time_played": summary.total_time_played_on_character,
+        "modified": summary.modified_time
+    }
+
+
+def _deserialize_summary(filename: str, data) -> SavedCharacterSummary:
+    return SavedCharacterSummary(filename, data["hero"], data["level"], data["total_time_played"], data["modified"])
+
+
+def _is_save_file(filename: str) -> bool:
+    return filename.endswith(".json") and filename.split(".json")[0].isdigit()
+
+
+def _get_character_id(filename: str) -> int:
+    return int(filename.split(".json")[0])
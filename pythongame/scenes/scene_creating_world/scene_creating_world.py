@@ -1,16 +1,17 @@
 from typing import Optional
 from typing import Tuple
 
+from pythongame.core.background_task import BackgroundTask
 from pythongame.core.common import ConsumableType, Sprite, ItemId
 from pythongame.core.common import Millis, HeroId, AbstractScene, SceneTransition
 from pythongame.core.entity_creation import create_player_state_as_initial, create_hero_world_entity
 from pythongame.core.game_state import GameState
-from pythongame.core.global_path_finder import init_global_path_finder
+from pythongame.core.global_path_finder import init_global_path_finder, get_global_path_finder
 from pythongame.core.hero_upgrades import pick_talent
 from pythongame.core.npc_behaviors import get_quest
 from pythongame.core.quests import QuestId
 from pythongame.core.world_behavior import ChallengeBehavior, StoryBehavior
-from pythongame.map_file import load_map_from_json_file
+from pythongame.map_file import load_map_from_file
 from pythongame.player_file import SavedPlayerState
 from pythongame.scenes.scene_factory import AbstractSceneFactory
 from pythongame.scenes.scenes_game.game_engine import GameEngine
@@ -52,27 +53,54 @@ class CreatingWorldScene(AbstractScene):
         # map hero money level saved
         self.flags: InitFlags = flags
 
-    def run_one_frame(self, _time_passed: Millis) -> Optional[SceneTransition]:
+        # The map is loaded on a worker thread, while this scene keeps rendering a loading screen
+        self.loading_task: Optional[BackgroundTask[GameState]] = None
+        self.time_spent_loading = Millis(0)
 
+    def run_one_frame(self, time_passed: Millis) -> Optional[SceneTransition]:
+        self.time_spent_loading += time_passed
+        if self.loading_task is None:
+            self._start_loading()
+            return None
+        if not self.loading_task.is_done():
+            return None
+        return self._finish_loading(self.loading_task.get_result())
+
+    def render(self):
+        self.ui_view.render_loading_screen(self.time_spent_loading)
+
+    def _get_picked_hero_id(self) -> HeroId:
         saved_player_state = self.flags.saved_player_state
-        hero_start_level = self.flags.hero_start_level
-        start_money = self.flags.start_money
         picked_hero_id = self.flags.picked_hero
-        map_file_path = self.flags.map_file_path
-        character_file = self.flags.character_file
         if saved_player_state:
             hero_from_saved_state = HeroId[saved_player_state.hero_id]
             if picked_hero_id is not None and picked_hero_id != hero_from_saved_state:
                 raise Exception("Mismatch! Hero from saved state: " + str(hero_from_saved_state) + ", but picked hero: "
                                 + str(picked_hero_id))
             picked_hero_id = hero_from_saved_state
-        total_time_played_on_character = saved_player_state.total_time_played_on_character if saved_player_state else 0
+        return picked_hero_id
+
+    def _start_loading(self):
+        picked_hero_id = self._get_picked_hero_id()
+        map_file_path = self.flags.map_file_path
 
         # NPC's share a "global path finder" that needs to be initialized before we start creating NPCs.
         # TODO This is very messy
-        path_finder = init_global_path_finder()
-        game_state = self._load_map_and_setup_game_state(map_file_path, picked_hero_id)
-        path_finder.set_grid(game_state.pathfinder_wall_grid)
+        init_global_path_finder()
+
+        # Parsing the map file and creating all the entities doesn't depend on pygame's display, so it can be done in
+        # the background
+        self.loading_task = BackgroundTask(lambda: self._load_map_and_setup_game_state(map_file_path, picked_hero_id))
+
+    def _finish_loading(self, game_state: GameState) -> SceneTransition:
+        saved_player_state = self.flags.saved_player_state
+        hero_start_level = self.flags.hero_start_level
+        start_money = self.flags.start_money
+        map_file_path = self.flags.map_file_path
+        character_file = self.flags.character_file
+        total_time_played_on_character = saved_player_state.total_time_played_on_character if saved_player_state else 0
+
+        get_global_path_finder().set_grid(game_state.pathfinder_wall_grid)
 
         # Must center camera before notifying player position as it affects which walls are shown on the minimap
         game_state.center_camera_on_player()
@@ -140,7 +168,7 @@ class CreatingWorldScene(AbstractScene):
         return SceneTransition(playing_scene)
 
     def _load_map_and_setup_game_state(self, map_file_path: str, picked_hero_id: HeroId) -> GameState:
-        map_data = load_map_from_json_file(map_file_path)
+        map_data = load_map_from_file(map_file_path)
         game_world = map_data.game_world
         game_world.player_entity = create_hero_world_entity(picked_hero_id, map_data.player_position)
         enabled_portals = {portal.portal_id: portal.world_entity.sprite for portal in game_world.portals
@@ -4,7 +4,7 @@ import pygame
 
 from pythongame.core.common import AbstractScene, SceneTransition, Millis, SoundId
 from pythongame.core.sound_player import play_sound
-from pythongame.player_file import SavedPlayerState, SaveFileHandler
+from pythongame.player_file import SaveFileHandler, SavedCharacterSummary
 from pythongame.scenes.scene_creating_world.scene_creating_world import InitFlags
 from pythongame.scenes.scene_factory import AbstractSceneFactory
 from pythongame.scenes.scene_main_menu.view_main_menu import MainMenuView, NUM_SHOWN_SAVE_FILES
@@ -24,10 +24,9 @@ class MainMenuScene(AbstractScene):
         self._first_shown_option_index = 0
         self.scene_factory = scene_factory
         self.flags = flags
-        self._files = save_file_handler.list_save_files()
-        self._files.sort(key=lambda file: int(file.split(".")[0]))
-        self._saved_characters: List[SavedPlayerState] = [
-            save_file_handler.load_player_state_from_json_file(file) for file in self._files]
+        self._save_file_handler = save_file_handler
+        # Only the summaries are shown in the menu. The character's save file is loaded when it's picked.
+        self._saved_characters: List[SavedCharacterSummary] = save_file_handler.list_saved_characters()
         self._view = view
 
     def handle_user_input(self, events: List[Any]):
@@ -54,8 +53,9 @@ class MainMenuScene(AbstractScene):
 
     def _confirm_option(self) -> Optional[SceneTransition]:
         if self._selected_option_index < len(self._saved_characters):
-            self.flags.saved_player_state = self._saved_characters[self._selected_option_index]
-            self.flags.character_file = self._files[self._selected_option_index]
+            character_file = self._saved_characters[self._selected_option_index].filename
+            self.flags.saved_player_state = self._save_file_handler.load_player_state_from_json_file(character_file)
+            self.flags.character_file = character_file
             return SceneTransition(self.scene_factory.creating_world_scene(self.flags))
         else:
             return SceneTransition(self.scene_factory.picking_hero_scene(self.flags))
@@ -6,7 +6,7 @@ from pygame.rect import Rect
 from pythongame.core.common import PortraitIconSprite, HeroId
 from pythongame.core.game_data import HEROES, HeroData
 from pythongame.core.view.render_util import DrawableArea
-from pythongame.player_file import SavedPlayerState
+from pythongame.player_file import SavedCharacterSummary
 
 NUM_SHOWN_SAVE_FILES = 3
 
@@ -28,7 +28,7 @@ class MainMenuView:
         self._font = pygame.font.Font(DIR_FONTS + 'Merchant Copy.ttf', 24)
         self._images_by_portrait_sprite = images_by_portrait_sprite
 
-    def render(self, saved_characters: List[SavedPlayerState], selected_option_index: int, first_shown_index: int):
+    def render(self, saved_characters: List[SavedCharacterSummary], selected_option_index: int, first_shown_index: int):
         self._screen_render.fill(COLOR_BLACK)
         self._screen_render.rect(COLOR_WHITE, Rect(0, 0, self._screen_size[0], self._screen_size[1]), 1)
         x_mid = self._screen_size[0] // 2
@@ -47,17 +47,17 @@ class MainMenuView:
         h_rect = 80
         padding = 5
         for i in range(first_shown_index, min(len(saved_characters), first_shown_index + NUM_SHOWN_SAVE_FILES)):
-            saved_player_state = saved_characters[i]
+            saved_character = saved_characters[i]
             color = COLOR_HIGHLIGHTED_RECT if i == selected_option_index else COLOR_RECT
             self._screen_render.rect(color, Rect(x, y, w_rect, h_rect), 2)
-            image = self._get_portrait_image(saved_player_state)
+            image = self._get_portrait_image(saved_character)
             self._screen_render.image(image, (x + padding, y + padding))
             self._screen_render.rect(
                 COLOR_WHITE, Rect(x + padding, y + padding, PORTRAIT_ICON_SIZE[0], PORTRAIT_ICON_SIZE[1]), 1)
-            text_1 = saved_player_state.hero_id + " LEVEL " + str(saved_player_state.level)
+            text_1 = saved_character.hero_id + " LEVEL " + str(saved_character.level)
 
             self._screen_render.text(self._font, text_1, (x_text, y + 20))
-            text_2 = "played time: " + _get_time_str(saved_player_state.total_time_played_on_character)
+            text_2 = "played time: " + _get_time_str(saved_character.total_time_played_on_character)
             self._screen_render.text(self._font, text_2, (x_text, y + 45))
             y += 90
 
@@ -66,8 +66,8 @@ class MainMenuView:
         self._screen_render.rect(color, Rect(x, y, w_rect, h_rect), 2)
         self._screen_render.text_centered(self._font, "CREATE NEW CHARACTER", (x_mid, y + 32))
 
-    def _get_portrait_image(self, saved_player_state):
-        hero_data: HeroData = HEROES[HeroId[saved_player_state.hero_id]]
+    def _get_portrait_image(self, saved_character: SavedCharacterSummary):
+        hero_data: HeroData = HEROES[HeroId[saved_character.hero_id]]
         sprite = hero_data.portrait_icon_sprite
         image = self._images_by_portrait_sprite[sprite]
         return image
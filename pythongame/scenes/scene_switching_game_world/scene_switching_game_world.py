@@ -1,7 +1,8 @@
 from typing import Optional, Callable, Tuple
 
+from pythongame.core.background_task import BackgroundTask
 from pythongame.core.common import Millis, AbstractScene, SceneTransition, AbstractWorldBehavior
-from pythongame.core.global_path_finder import init_global_path_finder
+from pythongame.core.global_path_finder import init_global_path_finder, get_global_path_finder
 from pythongame.scenes.scene_factory import AbstractSceneFactory
 from pythongame.scenes.scenes_game.game_engine import GameEngine
 from pythongame.scenes.scenes_game.game_ui_view import GameUiView
@@ -24,16 +25,35 @@ class SwitchingGameWorldScene(AbstractScene):
         self.total_time_played_on_character = total_time_played_on_character
         self.create_new_game_engine_and_behavior = create_new_game_engine_and_behavior
 
-    def run_one_frame(self, _time_passed: Millis) -> Optional[SceneTransition]:
+        # The new game world (for instance a generated dungeon) is created on a worker thread, while this scene keeps
+        # rendering a loading screen
+        self.loading_task: Optional[BackgroundTask[Tuple[GameEngine, AbstractWorldBehavior]]] = None
+        self.time_spent_loading = Millis(0)
+
+    def run_one_frame(self, time_passed: Millis) -> Optional[SceneTransition]:
+        self.time_spent_loading += time_passed
+        if self.loading_task is None:
+            # NPC's share a "global path finder" that needs to be initialized before we start creating NPCs.
+            # TODO This is very messy
+            init_global_path_finder()
+            self.loading_task = BackgroundTask(
+                lambda: self.create_new_game_engine_and_behavior(self.previous_game_engine))
+            return None
+        if not self.loading_task.is_done():
+            return None
+        new_game_engine, new_world_behavior = self.loading_task.get_result()
+        return self._finish_loading(new_game_engine, new_world_behavior)
+
+    def render(self):
+        self.ui_view.render_loading_screen(self.time_spent_loading)
+
+    def _finish_loading(self, new_game_engine: GameEngine, new_world_behavior: AbstractWorldBehavior) \
+            -> SceneTransition:
         # movement speed affects the hero entity in the game state (in contrast to other stats)
         player_speed_multiplier = self.previous_game_engine.game_state.game_world.player_entity.get_speed_multiplier()
 
-        # NPC's share a "global path finder" that needs to be initialized before we start creating NPCs.
-        # TODO This is very messy
-        path_finder = init_global_path_finder()
-        new_game_engine, new_world_behavior = self.create_new_game_engine_and_behavior(self.previous_game_engine)
         new_game_state = new_game_engine.game_state
-        path_finder.set_grid(new_game_state.pathfinder_wall_grid)
+        get_global_path_finder().set_grid(new_game_state.pathfinder_wall_grid)
 
         # Must center camera before notifying player position as it affects which walls are shown on the minimap
         new_game_state.center_camera_on_player()
@@ -6,23 +6,25 @@ from pythongame.core.common import *
 from pythongame.core.common import EngineEvent
 from pythongame.core.entity_creation import create_money_pile_on_ground, create_item_on_ground, \
     create_consumable_on_ground
-from pythongame.core.game_data import CONSUMABLES, NON_PLAYER_CHARACTERS, NpcCategory, PORTALS
+from pythongame.core.frame_timings import FrameTimings
+from pythongame.core.game_data import CONSUMABLES, NON_PLAYER_CHARACTERS, PORTALS
 from pythongame.core.game_state import GameState, ItemOnGround, ConsumableOnGround, LootableOnGround, BuffWithDuration, \
     EnemyDiedEvent, NonPlayerCharacter, Portal, PlayerLeveledUp, PlayerLearnedNewAbility, WarpPoint, Chest, \
     PlayerUnlockedNewTalent, AgentBuffsUpdate, Shrine
+from pythongame.core.global_path_finder import get_global_path_finder
 from pythongame.core.item_data import ITEM_ENTITY_SIZE, get_item_data_by_type
 from pythongame.core.item_data import randomized_item_id, get_item_data
 from pythongame.core.item_effects import create_item_effect
 from pythongame.core.item_inventory import ItemWasDeactivated, ItemWasActivated, ItemActivationEvent
 from pythongame.core.loot import LootEntry, MoneyLootEntry, ItemLootEntry, ConsumableLootEntry, AffixedItemLootEntry
-from pythongame.core.math import boxes_intersect, rects_intersect, sum_of_vectors, \
-    get_rect_with_increased_size_in_all_directions, translate_in_direction
+from pythongame.core.math import boxes_intersect, sum_of_vectors, translate_in_direction
 from pythongame.core.sound_player import play_sound
 from pythongame.core.visual_effects import create_visual_exp_text, create_teleport_effects, VisualRect, VisualCircle
 from pythongame.game_data.loot_tables import get_loot_table
 from pythongame.game_data.portals import PORTAL_DELAY
 from pythongame.game_data.shrines import apply_shrine_buff_to_player
 from pythongame.scenes.scenes_game.game_ui_view import InfoMessage
+from pythongame.scenes.scenes_game.npc_ai_scheduler import NpcAiScheduler
 from pythongame.scenes.scenes_game.player_controls import PlayerControls
 
 
@@ -35,6 +37,9 @@ class GameEngine:
         self.ability_was_clicked = Observable()
         self.abilities_were_updated = Observable()
         self.consumable_was_clicked = Observable()
+        self.npc_ai_scheduler = NpcAiScheduler()
+        # Only set when benchmarking
+        self.frame_timings: Optional[FrameTimings] = None
 
     def try_use_ability(self, ability_type: AbilityType):
         PlayerControls.try_use_ability(ability_type, self.game_state, self.info_message)
@@ -226,16 +231,24 @@ class GameEngine:
     def run_one_frame(self, time_passed: Millis) -> List[EngineEvent]:
 
         events = []
+        timings = self.frame_timings
+        if timings:
+            timings.start_section()
 
-        for npc in self.game_state.game_world.non_player_characters:
-            # NonPlayerCharacter AI shouldn't run if enemy is too far out of sight
-            if self._is_npc_close_to_camera(npc):
-                npc.npc_mind.control_npc(self.game_state, npc, self.game_state.game_world.player_entity,
-                                         self.game_state.player_state.is_invisible, time_passed)
+        # NPCs that are far away from the player run their AI less often, or not at all
+        self.npc_ai_scheduler.control_npcs(self.game_state, time_passed)
+
+        # Paths that were requested by NPCs are computed in batches, and may be spread out over several frames
+        path_finder = get_global_path_finder()
+        if path_finder.has_queued_requests():
+            path_finder.run_queued_requests()
 
         for projectile in self.game_state.game_world.projectile_entities:
             projectile.projectile_controller.notify_time_passed(self.game_state, projectile, time_passed)
 
+        if timings:
+            timings.end_section("ai")
+
         for visual_effect in self.game_state.game_world.visual_effects:
             visual_effect.notify_time_passed(time_passed)
 
@@ -269,6 +282,9 @@ class GameEngine:
         self.game_state.game_world.remove_expired_visual_effects()
         self.game_state.game_world.remove_opened_chests()
 
+        if timings:
+            timings.end_section("world_updates")
+
         player_buffs_update = self.game_state.player_state.handle_buffs(time_passed)
         for buff in player_buffs_update.buffs_that_started:
             buff.buff_effect.apply_start_effect(self.game_state, self.game_state.game_world.player_entity, None)
@@ -298,6 +314,9 @@ class GameEngine:
         self.game_state.player_state.mana_resource.regenerate(time_passed)
         self.game_state.player_state.recharge_ability_cooldowns(time_passed)
 
+        if timings:
+            timings.end_section("buffs")
+
         self.game_state.game_world.player_entity.update_movement_animation(time_passed)
         for npc in self.game_state.game_world.non_player_characters:
             npc.world_entity.update_movement_animation(time_passed)
@@ -306,16 +325,11 @@ class GameEngine:
         for warp_point in self.game_state.game_world.warp_points:
             warp_point.world_entity.update_animation(time_passed)
 
-        for npc in self.game_state.game_world.non_player_characters:
-            # Enemies shouldn't move towards player when they are out of sight
-            if self._is_npc_close_to_camera(npc):
-                self.game_state.game_world.update_npc_position_within_game_world(npc, time_passed)
+        self.npc_ai_scheduler.move_npcs(self.game_state)
         # player can still move when stunned (could be charging)
         self.game_state.game_world.update_world_entity_position_within_game_world(
             self.game_state.game_world.player_entity, time_passed)
-        for projectile in self.game_state.game_world.projectile_entities:
-            new_pos = projectile.world_entity.get_new_position_according_to_dir_and_speed(time_passed)
-            projectile.world_entity.set_position(new_pos)
+        self.game_state.game_world.move_projectiles(time_passed)
 
         for visual_effect in self.game_state.game_world.visual_effects:
             visual_effect.update_position_if_attached_to_entity()
@@ -326,6 +340,9 @@ class GameEngine:
                     self.game_state.game_world.player_entity]:
                     visual_effect.has_expired = True
 
+        if timings:
+            timings.end_section("movement")
+
         # ------------------------------------
         #          HANDLE COLLISIONS
         # ------------------------------------
@@ -336,27 +353,24 @@ class GameEngine:
                 money_pile.has_been_picked_up_and_should_be_removed = True
                 self.game_state.player_state.modify_money(money_pile.amount)
 
-        for enemy in [e for e in self.game_state.game_world.non_player_characters if e.is_enemy]:
-            for projectile in self.game_state.game_world.get_projectiles_intersecting_with(enemy.world_entity):
-                if not projectile.has_collided_and_should_be_removed:
-                    projectile.projectile_controller.apply_enemy_collision(enemy, self.game_state, projectile)
+        projectile_collisions = self.game_state.game_world.get_projectile_collisions()
+
+        for enemy, projectile in projectile_collisions.enemy_collisions:
+            if not projectile.has_collided_and_should_be_removed:
+                projectile.projectile_controller.apply_enemy_collision(enemy, self.game_state, projectile)
 
-        for player_summon in [npc for npc in self.game_state.game_world.non_player_characters
-                              if npc.npc_category == NpcCategory.PLAYER_SUMMON]:
-            for projectile in self.game_state.game_world.get_projectiles_intersecting_with(player_summon.world_entity):
-                if not projectile.has_collided_and_should_be_removed:
-                    projectile.projectile_controller.apply_player_summon_collision(player_summon, self.game_state,
-                                                                                   projectile)
+        for player_summon, projectile in projectile_collisions.player_summon_collisions:
+            if not projectile.has_collided_and_should_be_removed:
+                projectile.projectile_controller.apply_player_summon_collision(player_summon, self.game_state,
+                                                                               projectile)
 
-        for projectile in self.game_state.game_world.get_projectiles_intersecting_with(
-                self.game_state.game_world.player_entity):
+        for projectile in projectile_collisions.player_collisions:
             if not projectile.has_collided_and_should_be_removed:
                 projectile.projectile_controller.apply_player_collision(self.game_state, projectile)
 
-        for projectile in self.game_state.game_world.projectile_entities:
+        for projectile in projectile_collisions.wall_collisions:
             if not projectile.has_collided_and_should_be_removed:
-                if self.game_state.game_world.walls_state.does_entity_intersect_with_wall(projectile.world_entity):
-                    projectile.projectile_controller.apply_wall_collision(self.game_state, projectile)
+                projectile.projectile_controller.apply_wall_collision(self.game_state, projectile)
 
         self.game_state.game_world.remove_money_piles_that_have_been_picked_up()
         self.game_state.game_world.remove_projectiles_that_have_been_destroyed()
@@ -367,6 +381,9 @@ class GameEngine:
 
         self.game_state.center_camera_on_player()
 
+        if timings:
+            timings.end_section("collisions")
+
         if self.game_state.player_state.health_resource.is_at_or_below_zero():
             events.append(EngineEvent.PLAYER_DIED)
 
@@ -407,11 +424,6 @@ class GameEngine:
             KEYS_BY_ABILITY_TYPE[ability_type].key_string: ability_type for ability_type in abilities}
         self.abilities_were_updated.notify(ability_types_by_key_string)
 
-    def _is_npc_close_to_camera(self, npc: NonPlayerCharacter):
-        camera_rect_with_margin = get_rect_with_increased_size_in_all_directions(
-            self.game_state.camera_world_area, 100)
-        return rects_intersect(npc.world_entity.rect(), camera_rect_with_margin)
-
     def _put_loot_on_ground(self, enemy_death_position: Tuple[int, int], loot: List[LootEntry]):
         for loot_entry in loot:
             if len(loot) > 1:
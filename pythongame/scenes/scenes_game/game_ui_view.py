@@ -35,6 +35,7 @@ DIR_FONTS = './resources/fonts/'
 
 HIGHLIGHT_CONSUMABLE_ACTION_DURATION = 120
 HIGHLIGHT_ABILITY_ACTION_DURATION = 120
+LOADING_DOT_INTERVAL = 300
 
 
 class DialogState:
@@ -710,6 +711,16 @@ class GameUiView:
                     mouse_screen_position[1] - relative_mouse_pos[1] - (UI_ICON_BIG_SIZE[1] - UI_ICON_SIZE[1]) // 2)
         self.screen_render.image(big_image, position)
 
+    # Shown while a new game world is being loaded in the background. The dots keep moving, to show that the game
+    # hasn't frozen.
+    def render_loading_screen(self, time_spent_loading: Millis):
+        self.screen_render.fill(COLOR_BLACK)
+        num_dots = (time_spent_loading // LOADING_DOT_INTERVAL) % 4
+        # The text is padded so that it doesn't move sideways as dots are added
+        text = ("Loading" + "." * num_dots).ljust(len("Loading..."))
+        self.screen_render.text_centered(self.font_message, text,
+                                         (self.screen_size[0] // 2, self.screen_size[1] // 2 - 7))
+
     def render(self):
 
         self.screen_render.rect(COLOR_BORDER, Rect(0, 0, self.camera_size[0], self.camera_size[1]), 1)
@@ -0,0 +1,146 @@
+from typing import List, Tuple, Optional, Dict
+
+from pygame.rect import Rect
+
+from pythongame.core.common import Millis
+from pythongame.core.game_data import NpcCategory
+from pythongame.core.game_state import GameState, NonPlayerCharacter
+from pythongame.core.math import get_rect_with_increased_size_in_all_directions
+
+# Used to spread out NPCs that run at the same rate over different frames (see _NpcAiState). Being irrational, it
+# spreads out any number of NPCs evenly.
+_GOLDEN_RATIO_FRACTION = 0.6180339887
+
+
+# How often the AI of an NPC runs, depending on its "level of detail"
+class NpcAiSettings:
+    def __init__(self,
+                 engaged_distance: int = 200,
+                 active_margin: int = 100,
+                 dormant_margin: int = 400,
+                 reduced_interval: Millis = Millis(100),
+                 dormant_interval: Millis = Millis(500),
+                 max_dormant_movement_step: Millis = Millis(100)):
+        # Enemies this close to the player (and all player summons) are "engaged", and run their AI every frame
+        self.engaged_distance = engaged_distance
+        # Other NPCs within this distance of the camera are "active". Their AI runs every reduced_interval, but they
+        # move every frame.
+        self.active_margin = active_margin
+        self.reduced_interval = reduced_interval
+        # NPCs further away, but within this distance of the camera, are "dormant". Their AI runs every
+        # dormant_interval, and they only move when it does. NPCs even further away aren't updated at all.
+        self.dormant_margin = dormant_margin
+        self.dormant_interval = dormant_interval
+        # Dormant NPCs cover a lot of distance in one go. They are moved in steps, so that they don't skip through
+        # walls.
+        self.max_dormant_movement_step = max_dormant_movement_step
+
+
+# The scheduling of one NPC
+class _NpcAiState:
+    def __init__(self, phase: float):
+        # Where in its update interval the NPC starts out (between 0 and 1), so that NPCs that are seen at the same
+        # time don't all run on the same frame
+        self.phase = phase
+        self.time_since_update = Millis(0)
+        self.time_until_update: Optional[Millis] = None
+        # Only used while the NPC is dormant
+        self.time_since_moved = Millis(0)
+
+    # Returns the time that has passed since the NPC's mind last ran, if it's time for it to run again
+    def update(self, interval: Millis, time_passed: Millis) -> Optional[Millis]:
+        if self.time_until_update is None:
+            self.time_until_update = Millis(int(interval * self.phase))
+        # The interval may have become shorter, if the NPC has come closer to the player
+        self.time_until_update = min(self.time_until_update, interval) - time_passed
+        self.time_since_update += time_passed
+        if self.time_until_update > 0:
+            return None
+        self.time_until_update = interval
+        npc_time_passed = self.time_since_update
+        self.time_since_update = Millis(0)
+        return npc_time_passed
+
+
+# Decides which NPCs' AI ("minds") should run each frame, so that the AI workload doesn't grow with the number of NPCs
+# in the world. The NPCs that the player is interacting with run at full rate, while NPCs that are further away run at
+# a reduced rate (see NpcAiSettings). NPCs that run at the same rate are spread out over different frames, so that
+# the amount of work stays about the same from frame to frame.
+#
+# A mind that runs less often is given all the time that has passed since it last ran, so timers and cooldowns work
+# the same regardless of rate.
+class NpcAiScheduler:
+    def __init__(self, settings: Optional[NpcAiSettings] = None):
+        self.settings = settings or NpcAiSettings()
+        # When disabled, all NPCs close to the camera run their AI every frame, and all other NPCs are frozen
+        self.is_level_of_detail_enabled = True
+        self._states: Dict[NonPlayerCharacter, _NpcAiState] = {}
+        self._num_npcs_seen = 0
+        self._npcs_to_move: List[Tuple[NonPlayerCharacter, Millis]] = []
+
+    # Runs the minds of the NPCs that are due to be updated this frame
+    def control_npcs(self, game_state: GameState, time_passed: Millis):
+        game_world = game_state.game_world
+        player_entity = game_world.player_entity
+        is_player_invisible = game_state.player_state.is_invisible
+        settings = self.settings
+        is_level_of_detail_enabled = self.is_level_of_detail_enabled
+        active_area = Rect(get_rect_with_increased_size_in_all_directions(
+            game_state.camera_world_area, settings.active_margin))
+        dormant_area = Rect(get_rect_with_increased_size_in_all_directions(
+            game_state.camera_world_area, settings.dormant_margin))
+        player_x, player_y = player_entity.get_center_position()
+        engaged_distance = settings.engaged_distance
+        self._npcs_to_move = []
+
+        for npc in game_world.non_player_characters:
+            npc_rect = npc.world_entity.pygame_collision_rect
+            if active_area.colliderect(npc_rect):
+                if not is_level_of_detail_enabled or npc.npc_category == NpcCategory.PLAYER_SUMMON \
+                        or (npc.is_enemy and abs(npc_rect.centerx - player_x) < engaged_distance
+                            and abs(npc_rect.centery - player_y) < engaged_distance):
+                    interval = Millis(0)
+                else:
+                    interval = settings.reduced_interval
+                state = self._get_state(npc)
+                state.time_since_moved = Millis(0)
+                self._npcs_to_move.append((npc, time_passed))
+                npc_time_passed = state.update(interval, time_passed)
+            elif is_level_of_detail_enabled and dormant_area.colliderect(npc_rect):
+                state = self._get_state(npc)
+                state.time_since_moved += time_passed
+                npc_time_passed = state.update(settings.dormant_interval, time_passed)
+                if npc_time_passed is not None:
+                    self._npcs_to_move.append((npc, state.time_since_moved))
+                    state.time_since_moved = Millis(0)
+            else:
+                continue
+            if npc_time_passed is not None:
+                npc.npc_mind.control_npc(game_state, npc, player_entity, is_player_invisible, npc_time_passed)
+
+        # Forget about NPCs that are no longer in the world, every now and then
+        if len(self._states) > 2 * len(game_world.non_player_characters) + 100:
+            self._states = {npc: state for npc, state in self._states.items()
+                            if game_world.contains_non_player_character(npc)}
+
+    # Moves the NPCs that were updated by control_npcs() this frame. Active NPCs move every frame, while dormant NPCs
+    # move only when their AI has run.
+    def move_npcs(self, game_state: GameState):
+        game_world = game_state.game_world
+        max_step = self.settings.max_dormant_movement_step
+        for npc, time_passed in self._npcs_to_move:
+            # The NPC may have died since its AI ran
+            if not game_world.contains_non_player_character(npc):
+                continue
+            while time_passed > max_step:
+                game_world.update_npc_position_within_game_world(npc, max_step)
+                time_passed -= max_step
+            game_world.update_npc_position_within_game_world(npc, time_passed)
+
+    def _get_state(self, npc: NonPlayerCharacter) -> _NpcAiState:
+        state = self._states.get(npc)
+        if state is None:
+            state = _NpcAiState((self._num_npcs_seen * _GOLDEN_RATIO_FRACTION) % 1)
+            self._num_npcs_seen += 1
+            self._states[npc] = state
+        return state
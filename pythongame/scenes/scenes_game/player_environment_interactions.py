@@ -22,7 +22,8 @@ class PlayerInteractionsState:
         player_position = player_entity.get_position()
         distance_to_closest_entity = sys.maxsize
 
-        for npc in game_state.game_world.non_player_characters:
+        # Only neutral NPCs have dialogs
+        for npc in game_state.game_world.neutral_npcs:
             if has_npc_dialog(npc.npc_type):
                 close_to_player = is_x_and_y_within_distance(player_position, npc.world_entity.get_position(), 75)
                 distance = get_manhattan_distance_between_rects(player_entity.rect(), npc.world_entity.rect())
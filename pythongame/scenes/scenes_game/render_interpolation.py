@@ -0,0 +1,80 @@
+from typing import Dict, Tuple, Optional, List
+
+from pythongame.core.game_state import GameState
+from pythongame.core.world_entity import WorldEntity
+
+# Entities that move further than this in one simulation step have been teleported (or warped, knocked back, etc),
+# and are rendered at their new position right away rather than sliding there
+MAX_INTERPOLATED_DISTANCE = 50
+
+
+# With a fixed timestep (see FixedTimestep), the world is usually rendered at a point in time that is in between two
+# simulation steps. If moving things were rendered where they are after the last step, they would move a whole step on
+# some frames and not at all on others, which looks jittery. Instead, the player, NPCs, projectiles and the camera are
+# rendered in between where they were before and after the last step.
+#
+# This is done by moving the entities while rendering, and moving them back right after. Only the values that are used
+# for rendering are changed, so the entities don't notify any observers and aren't moved in any spatial hash.
+class RenderInterpolation:
+    def __init__(self):
+        # 1 means that the world is rendered exactly as it is, which is always the case with a variable timestep
+        self.interpolation = 1.0
+        self._previous_positions: Dict[WorldEntity, Tuple[float, float]] = {}
+        self._previous_camera_position: Optional[Tuple[int, int]] = None
+        # Positions to restore once the rendering is done
+        self._saved_positions: List[Tuple[WorldEntity, float, float, Tuple[int, int]]] = []
+        self._saved_camera_position: Optional[Tuple[int, int]] = None
+
+    # Must be called right before each simulation step
+    def save_positions(self, game_state: GameState):
+        game_world = game_state.game_world
+        player_entity = game_world.player_entity
+        positions = {player_entity: (player_entity.x, player_entity.y)}
+        for npc in game_world.non_player_characters:
+            entity = npc.world_entity
+            positions[entity] = (entity.x, entity.y)
+        for projectile in game_world.projectile_entities:
+            entity = projectile.world_entity
+            positions[entity] = (entity.x, entity.y)
+        self._previous_positions = positions
+        self._previous_camera_position = game_state.camera_world_area.topleft
+
+    # Moves entities and the camera to where they should be rendered. Must be followed by restore_positions().
+    def apply(self, game_state: GameState):
+        self._saved_positions = []
+        self._saved_camera_position = None
+        interpolation = self.interpolation
+        if interpolation >= 1 or self._previous_camera_position is None:
+            return
+        for entity, (previous_x, previous_y) in self._previous_positions.items():
+            x, y = entity.x, entity.y
+            if x == previous_x and y == previous_y:
+                continue
+            if abs(x - previous_x) > MAX_INTERPOLATED_DISTANCE or abs(y - previous_y) > MAX_INTERPOLATED_DISTANCE:
+                continue
+            self._saved_positions.append((entity, x, y, entity.pygame_collision_rect.topleft))
+            x = previous_x + (x - previous_x) * interpolation
+            y = previous_y + (y - previous_y) * interpolation
+            entity.x = x
+            entity.y = y
+            entity.pygame_collision_rect.topleft = (int(x), int(y))
+
+        camera_world_area = game_state.camera_world_area
+        camera_x, camera_y = camera_world_area.topleft
+        previous_camera_x, previous_camera_y = self._previous_camera_position
+        if abs(camera_x - previous_camera_x) <= MAX_INTERPOLATED_DISTANCE \
+                and abs(camera_y - previous_camera_y) <= MAX_INTERPOLATED_DISTANCE:
+            self._saved_camera_position = (camera_x, camera_y)
+            camera_world_area.topleft = (int(previous_camera_x + (camera_x - previous_camera_x) * interpolation),
+                                         int(previous_camera_y + (camera_y - previous_camera_y) * interpolation))
+
+    def restore_positions(self, game_state: GameState):
+        for entity, x, y, rect_position in self._saved_positions:
+            entity.x = x
+            entity.y = y
+            entity.pygame_collision_rect.topleft = rect_position
+        self._saved_positions = []
+        if self._saved_camera_position is not None:
+            game_state.camera_world_area.topleft = self._saved_camera_position
+            self._saved_camera_position = None
+
@@ -31,8 +31,9 @@ class PausedScene(AbstractScene):
 
     def render(self):
         self.world_view.render_world(
-            all_entities_to_render=self.game_state.get_all_entities_to_render(),
-            decorations_to_render=self.game_state.get_decorations_to_render(),
+            entities_to_render=self.game_state.game_world.get_renderable_non_wall_entities(),
+            walls_state=self.game_state.game_world.walls_state,
+            decorations_state=self.game_state.game_world.decorations_state,
             player_entity=self.game_state.game_world.player_entity,
             is_player_invisible=self.game_state.player_state.is_invisible,
             player_active_buffs=self.game_state.player_state.active_buffs,
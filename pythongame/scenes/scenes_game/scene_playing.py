@@ -5,6 +5,7 @@ import pythongame.core.pathfinding.npc_pathfinding
 import pythongame.core.pathfinding.npc_pathfinding
 from pythongame.core.common import AbstractWorldBehavior
 from pythongame.core.common import Millis, SoundId, AbstractScene, SceneTransition, NpcType, ItemType
+from pythongame.core.game_data import get_sprites_that_can_be_spawned
 from pythongame.core.game_state import GameState, NonPlayerCharacter, LootableOnGround, Portal, WarpPoint, \
     Chest, Shrine, DungeonEntrance
 from pythongame.core.hero_upgrades import pick_talent
@@ -28,6 +29,7 @@ from pythongame.scenes.scenes_game.game_ui_view import DragItemBetweenInventoryS
     PickTalent, StartDraggingItemOrConsumable, TrySwitchItemInInventory, ToggleSound, SaveGame, EventTriggeredFromUi
 from pythongame.scenes.scenes_game.game_ui_view import GameUiView
 from pythongame.scenes.scenes_game.player_environment_interactions import PlayerInteractionsState
+from pythongame.scenes.scenes_game.render_interpolation import RenderInterpolation
 from pythongame.scenes.scenes_game.scene_paused import PausedScene
 from pythongame.scenes.scenes_game.ui_events import ToggleFullscreen, ToggleWindow
 
@@ -60,9 +62,20 @@ class PlayingScene(AbstractScene):
         self.save_file_handler = save_file_handler
         self.total_time_played_on_character = total_time_played_on_character
         self.toggle_fullscreen_callback = toggle_fullscreen_callback
+        self.render_interpolation = RenderInterpolation()
 
     def on_enter(self):
         self.ui_view.set_paused(False)
+        game_world = self.game_state.game_world
+        # Projectiles, effects and summons are created mid-game, so their sprites are loaded up front too, rather than
+        # on the first frame they're rendered
+        player_state = self.game_state.player_state
+        ability_types = player_state.abilities + list(player_state.new_level_abilities.values())
+        npc_types = {npc.npc_type for npc in game_world.non_player_characters}
+        self.world_view.preload_sprites(
+            game_world.get_sprites_in_use() | get_sprites_that_can_be_spawned(ability_types, npc_types))
+        self.world_view.prepare_static_layer(game_world.walls_state, game_world.decorations_state,
+                                             game_world.entire_world_area, self.game_state.camera_world_area)
 
         # User may have been holding down a key when pausing, and then releasing it while paused. It's safer then to
         # treat all keys as released when we re-enter this state.
@@ -238,6 +251,7 @@ class PlayingScene(AbstractScene):
 
     def run_one_frame(self, time_passed: Millis) -> Optional[SceneTransition]:
 
+        self.render_interpolation.save_positions(self.game_state)
         self.total_time_played_on_character += time_passed
 
         if not self.ui_view.has_open_dialog():
@@ -259,7 +273,17 @@ class PlayingScene(AbstractScene):
 
         return None
 
+    def set_render_interpolation(self, interpolation: float):
+        self.render_interpolation.interpolation = interpolation
+
     def render(self):
+        self.render_interpolation.apply(self.game_state)
+        try:
+            self._render()
+        finally:
+            self.render_interpolation.restore_positions(self.game_state)
+
+    def _render(self):
 
         entity_action_text = None
         # Don't display any actions on screen if player is stunned. It would look weird when using warp stones
@@ -270,8 +294,9 @@ class PlayingScene(AbstractScene):
 
         game_world = self.game_state.game_world
         self.world_view.render_world(
-            all_entities_to_render=self.game_state.get_all_entities_to_render(),
-            decorations_to_render=self.game_state.get_decorations_to_render(),
+            entities_to_render=game_world.get_renderable_non_wall_entities(),
+            walls_state=game_world.walls_state,
+            decorations_state=game_world.decorations_state,
             player_entity=game_world.player_entity,
             is_player_invisible=player_state.is_invisible,
             player_active_buffs=player_state.active_buffs,
@@ -1,3 +1,4 @@
+from collections import Counter
 from enum import Enum
 from math import floor
 from typing import List, Tuple, Optional, Any, Iterable, Set, Callable, Union
@@ -1012,7 +1013,8 @@ class Minimap(UiComponent):
         self._player_position = player_position
         self._world_area = None
         self._seen_wall_positions: Set[Tuple[int, int]] = set()
-        self._wall_pixel_positions: List[Tuple[int, int]] = []
+        # Several walls can end up on the same pixel, so we keep track of how many there are on each
+        self._wall_pixel_positions: Counter = Counter()
         self._timer = PeriodicTimer(Millis(2_000))
         self._highlight_pos_ratio = None
         self.camera_rect_ratio = None
@@ -1042,13 +1044,27 @@ class Minimap(UiComponent):
         self._seen_wall_positions = set(wall_positions)
         self._update_wall_pixel_positions()
 
+    # Much cheaper than set_walls() when only a few walls have been added or removed. Only use from map editor
+    def update_walls(self, added_wall_positions: List[Tuple[int, int]], removed_wall_positions: List[Tuple[int, int]]):
+        for pos in removed_wall_positions:
+            if pos in self._seen_wall_positions:
+                self._seen_wall_positions.remove(pos)
+                pixel_position = self._get_wall_pixel_position(pos)
+                self._wall_pixel_positions[pixel_position] -= 1
+                if self._wall_pixel_positions[pixel_position] == 0:
+                    del self._wall_pixel_positions[pixel_position]
+        for pos in added_wall_positions:
+            if pos not in self._seen_wall_positions:
+                self._seen_wall_positions.add(pos)
+                self._wall_pixel_positions[self._get_wall_pixel_position(pos)] += 1
+
     def _update_wall_pixel_positions(self):
-        wall_positions_ratio = [get_relative_pos_within_rect(pos, self._world_area)
-                                for pos in self._seen_wall_positions]
+        self._wall_pixel_positions = Counter(self._get_wall_pixel_position(pos) for pos in self._seen_wall_positions)
 
-        self._wall_pixel_positions = set([(int(self._rect_inner.x + pos[0] * self._rect_inner.w),
-                                           int(self._rect_inner.y + pos[1] * self._rect_inner.h))
-                                          for pos in wall_positions_ratio])
+    def _get_wall_pixel_position(self, wall_position: Tuple[int, int]) -> Tuple[int, int]:
+        ratio = get_relative_pos_within_rect(wall_position, self._world_area)
+        return (int(self._rect_inner.x + ratio[0] * self._rect_inner.w),
+                int(self._rect_inner.y + ratio[1] * self._rect_inner.h))
 
     def get_position_ratio(self, point: Tuple[int, int]) -> Tuple[float, float]:
         return (point[0] - self.rect.x) / self.rect.w, (point[1] - self.rect.y) / self.rect.h
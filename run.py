@@ -12,6 +12,10 @@ parser.add_argument('--level')
 parser.add_argument('--money')
 parser.add_argument('--file')
 parser.add_argument('--disable_fullscreen', action='store_true')
+parser.add_argument('--variable_timestep', action='store_true',
+                    help="Advance the game once per rendered frame, instead of in fixed steps")
+parser.add_argument('--max_fps', type=int, default=main.DEFAULT_MAX_FPS, help="0 means no limit")
 args = parser.parse_args()
 
-main.start(args.map, args.hero, args.level, args.money, args.file, not args.disable_fullscreen)
+main.start(args.map, args.hero, args.level, args.money, args.file, not args.disable_fullscreen,
+           not args.variable_timestep, args.max_fps)